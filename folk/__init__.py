@@ -1,19 +1,44 @@
 """Utilities for pandas."""
 
+import importlib
+
 from .model import (  # noqa: F401
     ParameterizedModel,
     ConstrainedParameterizedModel,
 )
 from .pipe import ParameterizedPipeline  # noqa: F401
-from .metricsdb import MetricKey  # noqa: F401
-from .evaluate import (  # noqa: F401
-    eval_param_pipeline_n_model,
-)
 
-from ._version import get_versions
-__version__ = get_versions()['version']
+# attributes whose modules pull in heavy dependencies - like scikit-learn,
+# pandas and the metrics db configuration - are only imported on first access
+_LAZY_ATTRS = {
+    'MetricKey': 'metricsdb',
+    'eval_param_pipeline_n_model': 'evaluate',
+    'recompute_metric': 'oof',
+    'ChunkedSource': 'chunked',
+}
+
+
+def __getattr__(name):
+    if name == '__version__':
+        from ._version import get_versions
+        val = get_versions()['version']
+    else:
+        try:
+            module_name = _LAZY_ATTRS[name]
+        except KeyError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                __name__, name))
+        module = importlib.import_module('.' + module_name, __name__)
+        val = getattr(module, name)
+    globals()[name] = val
+    return val
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRS) + ['__version__'])
+
 
-for name in ['get_versions', '_version', 'model', 'pipe', 'name']:
+for name in ['model', 'pipe', 'name']:
     try:
         globals().pop(name)
     except KeyError:
@@ -0,0 +1,98 @@
+"""A local, content-addressed store of numpy arrays."""
+
+import os
+import hashlib
+
+
+class ArrayStore(object):
+    """A local, content-addressed store of numpy arrays.
+
+    Every array is stored in its own .npy file, named by a digest of its
+    dtype, shape and contents, so storing the same array twice stores it
+    once. Arrays are read back memory-mapped by default.
+
+    Parameters
+    ----------
+    root : str
+        The directory arrays are stored in. Created if missing.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key_of(arr):
+        """Returns the key the given array is stored under.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            An array.
+
+        Returns
+        -------
+        str
+            A hex digest of the dtype, shape and contents of the array.
+        """
+        import numpy as np
+        arr = np.ascontiguousarray(arr)
+        hasher = hashlib.sha1()
+        hasher.update(str(arr.dtype).encode('utf-8'))
+        hasher.update(repr(arr.shape).encode('utf-8'))
+        hasher.update(arr.data)
+        return hasher.hexdigest()
+
+    def path(self, key):
+        """Returns the path of the file storing the array of the given key."""
+        return os.path.join(self.root, key[:2], key + '.npy')
+
+    def __contains__(self, key):
+        return os.path.isfile(self.path(key))
+
+    def put(self, arr):
+        """Stores the given array.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The array to store. Object arrays are not supported.
+
+        Returns
+        -------
+        str
+            The key the array is stored under.
+        """
+        import numpy as np
+        arr = np.ascontiguousarray(arr)
+        key = ArrayStore.key_of(arr)
+        path = self.path(key)
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                np.save(f, arr, allow_pickle=False)
+            os.replace(tmp_path, path)
+        return key
+
+    def get(self, key, mmap=True):
+        """Returns the array stored under the given key.
+
+        Parameters
+        ----------
+        key : str
+            The key of a stored array.
+        mmap : bool, optional
+            If True, the default, the array is memory-mapped in read-only
+            mode rather than read into memory.
+
+        Returns
+        -------
+        numpy.ndarray
+            The stored array.
+        """
+        import numpy as np
+        path = self.path(key)
+        if not os.path.isfile(path):
+            raise KeyError(key)
+        return np.load(path, mmap_mode='r' if mmap else None)
@@ -0,0 +1,164 @@
+"""A single CPU budget, split between the levels of parallelism of a run."""
+
+import os
+import warnings
+import contextlib
+from importlib import import_module
+
+
+# environment variables read by native thread pools when they are loaded
+_THREAD_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+)
+
+
+class CPUSplit(object):
+    """A split of a CPU budget between experiment-level workers, fold-level
+    jobs and the native threads - BLAS, OpenMP and the like - of each job.
+
+    Parameters
+    ----------
+    cpu_budget : int
+        The total number of CPUs to use.
+    n_workers : int
+        The number of experiments evaluated in parallel.
+    n_jobs : int
+        The number of folds of each experiment fitted in parallel.
+    n_threads : int
+        The number of native threads each fold job may use.
+    """
+
+    __slots__ = ['cpu_budget', 'n_workers', 'n_jobs', 'n_threads']
+
+    def __init__(self, cpu_budget, n_workers, n_jobs, n_threads):
+        self.cpu_budget = cpu_budget
+        self.n_workers = n_workers
+        self.n_jobs = n_jobs
+        self.n_threads = n_threads
+
+    def __repr__(self):
+        return (
+            'CPUSplit(cpu_budget={}, n_workers={}, n_jobs={}, '
+            'n_threads={})').format(
+                self.cpu_budget, self.n_workers, self.n_jobs, self.n_threads)
+
+
+def available_cpus():
+    """Returns the number of CPUs available to this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover
+        return os.cpu_count() or 1
+
+
+def split_cpu_budget(
+        cpu_budget, n_folds, parallel_experiments=True, n_workers=None,
+        n_jobs=None):
+    """Splits a CPU budget between experiment-level workers, fold-level jobs
+    and native threads, so that their product never exceeds it.
+
+    Coarse-grained parallelism is preferred: unless set, experiment workers
+    get the whole budget - or what is left of it by a fixed number of fold
+    jobs - fold jobs get what is left by workers, up to one per fold, and
+    every fold job gets the remaining CPUs as native threads.
+
+    Parameters
+    ----------
+    cpu_budget : int
+        The total number of CPUs to use; -1 stands for all available CPUs.
+    n_folds : int
+        The number of cross validation folds of every experiment.
+    parallel_experiments : bool, optional
+        Whether experiments are evaluated in parallel. If False, a single
+        experiment worker is used. Defaults to True.
+    n_workers : int, optional
+        A fixed number of experiment workers.
+    n_jobs : int, optional
+        A fixed number of fold jobs per experiment.
+
+    Returns
+    -------
+    CPUSplit
+        The split of the budget.
+
+    Example
+    -------
+    >>> split_cpu_budget(16, n_folds=5)
+    CPUSplit(cpu_budget=16, n_workers=16, n_jobs=1, n_threads=1)
+    >>> split_cpu_budget(16, n_folds=5, n_workers=2)
+    CPUSplit(cpu_budget=16, n_workers=2, n_jobs=5, n_threads=1)
+    >>> split_cpu_budget(16, n_folds=5, n_jobs=4)
+    CPUSplit(cpu_budget=16, n_workers=4, n_jobs=4, n_threads=1)
+    >>> split_cpu_budget(16, n_folds=5, parallel_experiments=False, n_jobs=4)
+    CPUSplit(cpu_budget=16, n_workers=1, n_jobs=4, n_threads=4)
+    """
+    if cpu_budget == -1:
+        cpu_budget = available_cpus()
+    if cpu_budget < 1:
+        raise ValueError("cpu_budget must be positive, or -1.")
+    if not parallel_experiments:
+        n_workers = 1
+    elif n_workers is None:
+        n_workers = cpu_budget if n_jobs is None else max(
+            1, cpu_budget // n_jobs)
+    if n_jobs is None:
+        n_jobs = max(1, min(n_folds, cpu_budget // n_workers))
+    if n_workers * n_jobs > cpu_budget:
+        raise ValueError((
+            "{} experiment workers with {} fold jobs each exceed a CPU "
+            "budget of {}.").format(n_workers, n_jobs, cpu_budget))
+    n_threads = max(1, cpu_budget // (n_workers * n_jobs))
+    return CPUSplit(
+        cpu_budget=cpu_budget,
+        n_workers=n_workers,
+        n_jobs=n_jobs,
+        n_threads=n_threads,
+    )
+
+
+def limit_native_threads(n_threads):
+    """Limits the native thread pools of this process to n_threads threads.
+
+    Pools of libraries already loaded are limited with threadpoolctl;
+    libraries loaded later read the limit from environment variables. Meant
+    to be called once, in a worker process, as limits are never lifted.
+
+    Parameters
+    ----------
+    n_threads : int
+        The maximal number of threads of every native thread pool.
+    """
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+    try:
+        threadpoolctl = import_module('threadpoolctl')
+    except ImportError:  # pragma: no cover
+        warnings.warn(
+            "Folk: threadpoolctl is not installed; native thread pools that "
+            "are already loaded are not limited.")
+        return
+    threadpoolctl.threadpool_limits(limits=n_threads)
+
+
+@contextlib.contextmanager
+def native_thread_limits(n_threads):
+    """A context manager limiting the native thread pools of this process to
+    n_threads threads, restoring them on exit. Does nothing if n_threads is
+    None."""
+    if n_threads is None:
+        yield
+        return
+    try:
+        threadpoolctl = import_module('threadpoolctl')
+    except ImportError:  # pragma: no cover
+        warnings.warn(
+            "Folk: threadpoolctl is not installed; native thread pools are "
+            "not limited.")
+        yield
+        return
+    with threadpoolctl.threadpool_limits(limits=n_threads):
+        yield
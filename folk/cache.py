@@ -0,0 +1,205 @@
+"""On-disk caching of transformed datasets."""
+
+import os
+import pickle
+import warnings
+from importlib import import_module
+
+from .hashing import (
+    params_digest,
+    df_fingerprint,
+)
+
+
+class TransformCache(object):
+    """An on-disk, size-capped LRU cache of pipeline-transformed dataframes.
+
+    Entries are keyed by a stable hash of the parameters of the pipeline that
+    produced them and a fingerprint of the dataset it was applied to. The
+    least recently used entries are evicted whenever the total size of the
+    cache exceeds the configured cap.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory in which cached dataframes are stored. Created if
+        missing.
+    max_bytes : int, optional
+        The maximal total size, in bytes, of all cached dataframes. If not
+        given, the cache is not capped.
+    fmt : str, optional
+        The format in which dataframes are stored. Either 'parquet', which
+        requires the pyarrow package, or 'pickle'. Defaults to 'parquet' if
+        pyarrow is installed, and to 'pickle' otherwise. If 'parquet' is
+        given while pyarrow is not installed, dataframes are pickled, with a
+        warning.
+    """
+
+    _FORMATS = {
+        'parquet': '.parquet',
+        'pickle': '.pkl',
+    }
+
+    def __init__(self, cache_dir, max_bytes=None, fmt=None):
+        if fmt is not None and fmt not in TransformCache._FORMATS:
+            raise ValueError("Unsupported transform cache format {}.".format(
+                fmt))
+        if fmt in (None, 'parquet'):
+            try:
+                import_module('pyarrow')
+                fmt = 'parquet'
+            except ImportError:
+                if fmt is not None:
+                    warnings.warn(
+                        "Folk: pyarrow is not installed; transformed "
+                        "dataframes are cached with pickle instead.")
+                fmt = 'pickle'
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self._ext = TransformCache._FORMATS[fmt]
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, params, fingerprint):
+        """Returns the cache key for the given pipeline params and dataset.
+
+        Parameters
+        ----------
+        params : dict of string to any
+            The parameters of the pipeline.
+        fingerprint : str
+            A fingerprint of the dataset the pipeline is applied to, as
+            returned by folk.hashing.df_fingerprint.
+
+        Returns
+        -------
+        str
+            A cache key.
+        """
+        return params_digest({'params': params, 'dataset': fingerprint})
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self._ext)
+
+    def _entries(self):
+        entries = []
+        for fname in os.listdir(self.cache_dir):
+            if not fname.endswith(self._ext):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, fname))
+            except FileNotFoundError:  # pragma: no cover
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fname))
+        return entries
+
+    def get(self, key):
+        """Returns the dataframe cached under the given key, if any.
+
+        Parameters
+        ----------
+        key : str
+            A cache key.
+
+        Returns
+        -------
+        pandas.DataFrame or None
+            The cached dataframe, or None on a cache miss.
+        """
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        if self.fmt == 'parquet':
+            import pandas as pd
+            df = pd.read_parquet(path)
+        else:
+            with open(path, 'rb') as f:
+                df = pickle.load(f)
+        # the modification time of an entry marks its last use
+        os.utime(path, None)
+        return df
+
+    def put(self, key, df):
+        """Caches the given dataframe under the given key.
+
+        Parameters
+        ----------
+        key : str
+            A cache key.
+        df : pandas.DataFrame
+            The dataframe to cache.
+        """
+        path = self._path(key)
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            if self.fmt == 'parquet':
+                df.to_parquet(tmp_path)
+            else:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            warnings.warn(
+                "Folk: Failed to cache transformed dataframe: {}".format(e))
+            return
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, fname in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, fname))
+            except FileNotFoundError:  # pragma: no cover
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes all entries from this cache."""
+        for _, _, fname in self._entries():
+            os.remove(os.path.join(self.cache_dir, fname))
+
+    def fit_transform(
+            self, pipeline, params, df, fingerprint=None, verbose=None):
+        """Applies the given pipeline to the given dataframe, using the cache.
+
+        On a cache hit the pipeline is not applied at all.
+
+        Parameters
+        ----------
+        pipeline : callable
+            A realized pipeline, as produced by a folk.ParameterizedPipeline.
+        params : dict of string to any
+            The parameters the pipeline was realized by.
+        df : pandas.DataFrame
+            The dataframe to transform.
+        fingerprint : str, optional
+            A precomputed fingerprint of df. Computed if not given.
+        verbose : bool, optional
+            Passed to the fit_transform method of the pipeline if True.
+
+        Returns
+        -------
+        transformed_df : pandas.DataFrame
+            The transformed dataframe.
+        hit : bool
+            True if the transformed dataframe was loaded from the cache.
+        """
+        if fingerprint is None:
+            fingerprint = df_fingerprint(df)
+        key = self.key(params, fingerprint)
+        cached = self.get(key)
+        if cached is not None:
+            return cached, True
+        if verbose:
+            transformed = pipeline.fit_transform(df, verbose=True)
+        else:
+            transformed = pipeline.fit_transform(df)
+        self.put(key, transformed)
+        return transformed, False
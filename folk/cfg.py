@@ -17,3 +17,9 @@ class CfgKey(object):
     MetricDbNames = "METRIC_DB_NAMES"
     MetricDbs = "METRIC_DBS"
     DbType = "TYPE"
+    BufferSize = "BUFFER_SIZE"
+    FlushInterval = "FLUSH_INTERVAL"
+    BackgroundWriter = "BACKGROUND_WRITER"
+    SpillPath = "SPILL_PATH"
+    Path = "PATH"
+    TableName = "TABLE_NAME"
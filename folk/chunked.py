@@ -0,0 +1,346 @@
+"""Out-of-core evaluation, over datasets read in chunks."""
+
+import time
+from importlib import import_module
+
+import numpy as np
+import pandas as pd
+from joblib import (
+    Parallel,
+    delayed,
+)
+from pdutil.transform import x_y_by_col_lbl
+from sklearn.base import (
+    clone,
+    is_classifier,
+)
+from sklearn.metrics import get_scorer
+from sklearn.utils import _safe_indexing
+
+from .oof import (
+    _SAMPLE_METRICS,
+    _fold_predictions,
+)
+from .pipe import (
+    StageStatKey,
+    pipeline_stages,
+    _apply_stage,
+)
+
+
+DEF_CHUNK_SIZE = 65536
+
+
+class ChunkedSource(object):
+    """A dataset read as a sequence of dataframe chunks, for datasets larger
+    than memory.
+
+    The source is read anew on every pass over it, and every pass must yield
+    the same rows in the same order, as samples are assigned to cross
+    validation folds by their position.
+
+    Parameters
+    ----------
+    source : str, callable or iterable
+        Either the path of a Parquet file, or of a directory of Parquet
+        files, read with pyarrow in chunks of chunk_size rows; a callable
+        taking no arguments and returning a new iterator over
+        pandas.DataFrame chunks on every call; or a re-iterable collection
+        of dataframes, like a list. Iterators, which can only be read once,
+        are not accepted.
+    chunk_size : int, optional
+        The number of rows per chunk read from Parquet files. Defaults to
+        65536.
+    columns : list of str, optional
+        The columns to read from Parquet files. Defaults to all columns.
+
+    Example
+    -------
+    >>> chunks = [pd.DataFrame({'a': [1, 2]}), pd.DataFrame({'a': [3]})]
+    >>> source = ChunkedSource(lambda: iter(chunks))
+    >>> [len(chunk) for chunk in source]
+    [2, 1]
+    """
+
+    def __init__(self, source, chunk_size=None, columns=None):
+        if chunk_size is None:
+            chunk_size = DEF_CHUNK_SIZE
+        if not isinstance(source, str) and not callable(source):
+            if iter(source) is source:
+                raise TypeError(
+                    "Iterators can only be read once; pass a callable "
+                    "returning a new iterator over dataframe chunks instead.")
+        self.source = source
+        self.chunk_size = chunk_size
+        self.columns = columns
+
+    def _parquet_chunks(self):
+        ds = import_module('pyarrow.dataset')
+        dataset = ds.dataset(self.source, format='parquet')
+        for batch in dataset.to_batches(
+                columns=self.columns, batch_size=self.chunk_size):
+            yield batch.to_pandas()
+
+    def __iter__(self):
+        if isinstance(self.source, str):
+            return self._parquet_chunks()
+        if callable(self.source):
+            return iter(self.source())
+        return iter(self.source)
+
+
+def as_chunked_source(dataset):
+    """Returns the given dataset unchanged if it is a dataframe, and a
+    ChunkedSource reading it otherwise."""
+    if isinstance(dataset, (pd.DataFrame, ChunkedSource)):
+        return dataset
+    return ChunkedSource(dataset)
+
+
+class ChunkTransformer(object):
+    """Applies a pipeline to a dataset chunk by chunk.
+
+    Stages are fitted on the first chunk they are applied to, and every
+    later chunk is only transformed by them, so stages should be row-wise,
+    or have state that the first chunk determines - like the categories of
+    an encoder. Opaque stages without a transform method are called on
+    every chunk.
+
+    Parameters
+    ----------
+    pipeline : callable
+        A realized pipeline. See folk.pipe.pipeline_stages for how it is
+        broken into stages.
+    verbose : bool, optional
+        If set to True, stages are fitted verbosely.
+    """
+
+    def __init__(self, pipeline, verbose=None):
+        self.stages = pipeline_stages(pipeline)
+        self.verbose = verbose
+        self.fitted = False
+        self.stage_times = [0.0] * len(self.stages)
+
+    def transform(self, chunk):
+        """Returns the given chunk, transformed by the pipeline."""
+        for i, stage in enumerate(self.stages):
+            start = time.perf_counter()
+            if not self.fitted:
+                chunk = _apply_stage(stage, chunk, self.verbose)
+            elif hasattr(stage, 'transform'):
+                chunk = stage.transform(chunk)
+            else:
+                chunk = stage(chunk)
+            self.stage_times[i] += time.perf_counter() - start
+        self.fitted = True
+        return chunk
+
+    def stage_stats(self):
+        """Returns the statistics of every stage, as returned by
+        folk.pipe.profiled_fit_transform, over all chunks transformed so
+        far. Memory is not traced."""
+        return [
+            {
+                StageStatKey.STAGE: type(stage).__name__,
+                StageStatKey.TIME: stage_time,
+                StageStatKey.PEAK_MEM: None,
+            }
+            for stage, stage_time in zip(self.stages, self.stage_times)
+        ]
+
+
+def chunked_labels(chunk_iter, lbl_col):
+    """Returns the labels of all rows of a chunked dataset, in order, and
+    the number of its chunks.
+
+    Parameters
+    ----------
+    chunk_iter : callable
+        A callable returning a new iterator over the dataframe chunks of the
+        dataset on every call.
+    lbl_col : str
+        The label column.
+
+    Returns
+    -------
+    y : numpy.ndarray
+        The labels of all rows.
+    n_chunks : int
+        The number of chunks.
+    """
+    labels = [np.asarray(chunk[lbl_col]) for chunk in chunk_iter()]
+    if not labels:
+        raise ValueError("The chunked dataset has no rows.")
+    return np.concatenate(labels), len(labels)
+
+
+def _positioned_chunks(chunk_iter, lbl_col, assignment):
+    # yields the features, labels and fold assignment of every chunk
+    offset = 0
+    for chunk in chunk_iter():
+        X, y = x_y_by_col_lbl(chunk, lbl_col)
+        yield X, y.values, assignment[offset:offset + len(chunk)]
+        offset += len(chunk)
+    if offset != len(assignment):
+        raise ValueError(
+            "The chunked dataset yielded {} rows, rather than {}; every "
+            "pass over it must yield the same rows.".format(
+                offset, len(assignment)))
+
+
+def _run_tasks(func, tasks, n_jobs):
+    if n_jobs == 1:
+        return [func(*task) for task in tasks]
+    # estimators of different folds and experiments are independent, and
+    # mostly release the GIL while fitting and predicting
+    return Parallel(n_jobs=n_jobs, backend='threading')(
+        delayed(func)(*task) for task in tasks)
+
+
+def _partial_fit(model, X, y, fit_kwargs):
+    start = time.perf_counter()
+    model.partial_fit(X, y, **fit_kwargs)
+    return time.perf_counter() - start
+
+
+def _score_sums(model, X, y, scorers, classes):
+    """Returns the sums of the scores of the given samples by every scorer,
+    and the time it took to compute them."""
+    start = time.perf_counter()
+    sums = []
+    preds = None
+    for sample_metric, scorer in scorers:
+        if sample_metric is None or not is_classifier(model):
+            sums.append(scorer(model, X, y) * len(y))
+            continue
+        # per-sample scores are computed against all classes, so chunks
+        # missing some of them are scored exactly
+        if preds is None:
+            preds, kind = _fold_predictions(model, X, classes)
+            y_ix = np.searchsorted(classes, y)
+        sums.append(
+            _SAMPLE_METRICS[sample_metric](y_ix, preds[None], kind).sum())
+    return sums, time.perf_counter() - start
+
+
+def _chunk_scorers(scoring):
+    # pairs the name of every metric that averages per-sample scores, or
+    # None, with its scorer
+    return [
+        (
+            spec if isinstance(spec, str) and spec in _SAMPLE_METRICS
+            else None,
+            get_scorer(spec),
+        )
+        for spec in scoring.values()
+    ]
+
+
+def incremental_cross_validate(
+        estimators, chunk_iter, lbl_col, assignment, classes, scoring,
+        n_epochs=1, n_jobs=1):
+    """Cross validates estimators supporting partial_fit incrementally over
+    the chunks of a dataset, holding a single chunk in memory at a time.
+
+    A copy of every estimator is fitted per fold. Each of n_epochs passes
+    over the dataset updates all of them with the training rows of every
+    chunk, and a final pass scores them on the test rows of every chunk.
+    Classifiers scored by 'accuracy', 'neg_log_loss' or 'neg_brier_score'
+    are scored exactly, by summing the per-sample scores of test rows
+    against all classes. Other metrics, like F1 or ROC AUC, are scored on
+    the test rows of every chunk, and fold scores are the means of these
+    chunk scores, weighted by the number of test rows in each chunk; they
+    are approximate.
+
+    Parameters
+    ----------
+    estimators : list of estimators
+        The estimators to cross validate. Must support partial_fit.
+    chunk_iter : callable
+        A callable returning a new iterator over the dataframe chunks of the
+        dataset on every call, holding features and labels.
+    lbl_col : str
+        The label column.
+    assignment : numpy.ndarray
+        The fold index of every row, as returned by
+        folk.folds.fold_assignment.
+    classes : numpy.ndarray
+        All class labels, given to the first partial_fit call of
+        classifiers.
+    scoring : dict
+        Maps metric names to scikit-learn scorer names or callables.
+    n_epochs : int, optional
+        The number of passes over the dataset to fit estimators by.
+        Defaults to 1.
+    n_jobs : int, optional
+        The number of threads fitting and scoring fold estimators on every
+        chunk. Defaults to 1.
+
+    Returns
+    -------
+    list of dict
+        A dict per estimator, like the one returned by scikit-learn's
+        cross_validate, mapping 'fit_time', 'score_time' and 'test_<metric>'
+        to an array of values per fold.
+    """
+    n_folds = int(assignment.max()) + 1
+    scorers = _chunk_scorers(scoring)
+    fold_models = [
+        [clone(estimator) for _ in range(n_folds)]
+        for estimator in estimators
+    ]
+    fit_kwargs = [
+        {'classes': classes} if is_classifier(estimator) else {}
+        for estimator in estimators
+    ]
+    fit_times = np.zeros((len(estimators), n_folds))
+    for _ in range(n_epochs):
+        for X, y, folds in _positioned_chunks(chunk_iter, lbl_col, assignment):
+            pairs = []
+            tasks = []
+            for fold in range(n_folds):
+                train_ix = np.flatnonzero(folds != fold)
+                if not len(train_ix):
+                    continue
+                X_train = _safe_indexing(X, train_ix)
+                y_train = y[train_ix]
+                for i, models in enumerate(fold_models):
+                    pairs.append((i, fold))
+                    tasks.append(
+                        (models[fold], X_train, y_train, fit_kwargs[i]))
+            for (i, fold), fit_time in zip(
+                    pairs, _run_tasks(_partial_fit, tasks, n_jobs)):
+                fit_times[i, fold] += fit_time
+    score_sums = np.zeros((len(estimators), n_folds, len(scorers)))
+    score_times = np.zeros((len(estimators), n_folds))
+    n_test = np.zeros(n_folds)
+    for X, y, folds in _positioned_chunks(chunk_iter, lbl_col, assignment):
+        pairs = []
+        tasks = []
+        for fold in range(n_folds):
+            test_ix = np.flatnonzero(folds == fold)
+            if not len(test_ix):
+                continue
+            n_test[fold] += len(test_ix)
+            X_test = _safe_indexing(X, test_ix)
+            y_test = y[test_ix]
+            for i, models in enumerate(fold_models):
+                pairs.append((i, fold))
+                tasks.append(
+                    (models[fold], X_test, y_test, scorers, classes))
+        for (i, fold), (sums, score_time) in zip(
+                pairs, _run_tasks(_score_sums, tasks, n_jobs)):
+            score_sums[i, fold] += sums
+            score_times[i, fold] += score_time
+    fold_scores = score_sums / n_test[None, :, None]
+    return [
+        {
+            'fit_time': fit_times[i],
+            'score_time': score_times[i],
+            **{
+                'test_{}'.format(metric): fold_scores[i, :, k]
+                for k, metric in enumerate(scoring)
+            },
+        }
+        for i in range(len(estimators))
+    ]
@@ -1,124 +1,1172 @@
 """Evalute folk parameterized pipelines and models."""
 
+import copy
+import math
 import time
+import warnings
+import contextlib
 from datetime import datetime
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    ProcessPoolExecutor,
+    as_completed,
+)
 
-from pdutil.transform import x_y_by_col_lbl
+import numpy as np
+import pandas as pd
+from joblib import (
+    Parallel,
+    delayed,
+    parallel_backend,
+)
+from sklearn.base import (
+    clone,
+    is_classifier,
+)
+from sklearn.metrics import get_scorer
 from sklearn.model_selection import (
-    cross_val_score,
+    cross_validate,
 )
+from sklearn.utils import _safe_indexing
 
+from .oof import (
+    explicit_folds,
+    store_out_of_fold,
+)
+from .arrays import ArrayStore
+from .chunked import (
+    ChunkedSource,
+    ChunkTransformer,
+    as_chunked_source,
+    chunked_labels,
+    incremental_cross_validate,
+)
+from .budget import (
+    limit_native_threads,
+    native_thread_limits,
+    split_cpu_budget,
+)
+from .folds import (
+    fold_assignment,
+    folds_by_assignment,
+)
+from .hashing import (
+    params_digest,
+    df_fingerprint,
+)
+from .prepared import prepare_dataset
+from .pipe import (
+    StageStatKey,
+    profiled_fit_transform,
+    shared_prefix_transform_iter,
+)
+from .hooks import (
+    Event,
+    EventBus,
+)
+from .sharedmem import (
+    MemmapArrays,
+    attach,
+)
 from .metricsdb import (
     MetricKey,
+    flush_metrics_db,
     write_experiment_res,
+    completed_experiment_keys,
 )
+from .util import print_func_by_verbosity
 
 
-def _print_func_by_verbosity(verbose):
-    if verbose:
-        return print
-    return lambda x: None
+EXECUTORS = ('serial', 'thread', 'process')
+STRATEGIES = ('grid', 'halving')
 
 
-def eval_model_by_params(
-        run_id, model, model_id, df, lbl_col, params, metric_db=None,
-        n_folds=None, n_jobs=None, verbose=None):
-    _print = _print_func_by_verbosity(verbose)
-    if n_folds is None:
-        n_folds = 5
-    if n_jobs is None:
-        n_jobs = 1
-    _print("  - Testing {}...".format(model_id))
-    X, y = x_y_by_col_lbl(df, lbl_col)
+def _scoring_dict(scoring):
+    """Normalizes a scoring specification to a dict mapping metric names to
+    scikit-learn scorer names or callables. The first metric is the primary
+    one.
+
+    >>> _scoring_dict(None)
+    {'accuracy': 'accuracy'}
+    >>> _scoring_dict(['f1_macro', 'accuracy'])
+    {'f1_macro': 'f1_macro', 'accuracy': 'accuracy'}
+    """
+    if scoring is None:
+        scoring = 'accuracy'
+    if isinstance(scoring, str):
+        return {scoring: scoring}
+    if isinstance(scoring, dict):
+        scoring_dict = dict(scoring)
+    else:
+        scoring_dict = {metric: metric for metric in scoring}
+    if not scoring_dict:
+        raise ValueError("At least one scoring metric must be given.")
+    return scoring_dict
+
+
+def _cross_validate_model(
+        run_id, model, model_id, X, y, lbl_col, params, n_folds, n_jobs,
+        verbose, n_classes, pipe_id=None, cv=None, folds_key=None,
+        scoring=None, model_build_time=None, pipe_stats=None,
+        model_label=None, oof_store=None):
+    scoring = _scoring_dict(scoring)
+    _print = print_func_by_verbosity(verbose)
+    _print("  - Testing {}...".format(model_label or model_id))
     _print("    Starting cross validation at {}".format(datetime.now()))
     _print('    Performing {}-fold cross validation...'.format(n_folds))
+    if oof_store is not None:
+        # fold estimators predict their test samples after scoring, so the
+        # splits they were fitted on must be known
+        cv = explicit_folds(cv, n_folds, model, X, y)
     start = time.time()
-    scores = cross_val_score(
-        model, X=X, y=y, cv=n_folds, scoring='accuracy',
-        n_jobs=n_jobs,
+    # all metrics are scored on the same fitted fold models
+    cv_res = cross_validate(
+        model, X=X, y=y, cv=n_folds if cv is None else cv,
+        scoring=scoring, n_jobs=n_jobs,
+        return_estimator=oof_store is not None,
     )
     end = time.time()
-    total_time = end - start
-    per_fold_time = total_time / n_folds
+    return _res_doc_by_cv_res(
+        cv_res=cv_res, total_time=end - start, run_id=run_id,
+        model_id=model_id, X=X, y=y, lbl_col=lbl_col, params=params,
+        n_folds=n_folds, n_jobs=n_jobs, verbose=verbose, n_classes=n_classes,
+        pipe_id=pipe_id, cv=cv, folds_key=folds_key, scoring=scoring,
+        model_build_time=model_build_time, pipe_stats=pipe_stats,
+        model_label=model_label, oof_store=oof_store)
+
+
+def _res_doc_by_cv_res(
+        cv_res, total_time, run_id, model_id, X, y, lbl_col, params,
+        n_folds, n_jobs, verbose, n_classes, scoring, pipe_id=None, cv=None,
+        folds_key=None, model_build_time=None, pipe_stats=None,
+        model_label=None, oof_store=None):
+    """Returns the result document and per-fold scores of a cross validated
+    model by the dict returned by sklearn's cross_validate."""
+    _print = print_func_by_verbosity(verbose)
+    fit_times = cv_res['fit_time']
+    score_times = cv_res['score_time']
+    per_fold_time = (fit_times + score_times).mean()
     _print("    Finished cross validation at {}".format(datetime.now()))
     _print("    Cross validation took {:.2f} s ({:.2f} per fold)".format(
         total_time, per_fold_time))
-    acc_mean = scores.mean()
-    acc_std = scores.std()
-    _print("    Accuracy: {:.2f} (+/- {:.2f})".format(
-        scores.mean(), scores.std() * 2))
-    n_classes = len(df[lbl_col].unique())
+    scores_doc = {}
+    fold_scores = {}
+    for metric in scoring:
+        scores = cv_res['test_{}'.format(metric)]
+        fold_scores[metric] = scores.tolist()
+        scores_doc[MetricKey.mean_key(metric)] = scores.mean()
+        scores_doc[MetricKey.std_key(metric)] = scores.std()
+        _print("    {}: {:.2f} (+/- {:.2f})".format(
+            metric, scores.mean(), scores.std() * 2))
+    res_doc = {
+        MetricKey.RUN_ID: run_id,
+        MetricKey.MODEL_ID: model_id,
+        MetricKey.MODEL_LABEL: model_label,
+        MetricKey.PIPE_ID: pipe_id,
+        MetricKey.LBL_COL: lbl_col,
+        **scores_doc,
+        MetricKey.N_FOLDS: n_folds,
+        MetricKey.N_JOBS: n_jobs,
+        MetricKey.CROSS_VAL_TIME: total_time,
+        MetricKey.FOLD_TIME: per_fold_time,
+        MetricKey.FIT_TIME: fit_times.mean(),
+        MetricKey.SCORE_TIME: score_times.mean(),
+        MetricKey.FOLD_FIT_TIMES: fit_times.tolist(),
+        MetricKey.FOLD_SCORE_TIMES: score_times.tolist(),
+        MetricKey.MODEL_BUILD_TIME: model_build_time,
+        MetricKey.DATASET_SIZE: len(y),
+        MetricKey.N_CLASS: n_classes,
+        **params,
+    }
+    if folds_key is not None:
+        res_doc[MetricKey.FOLDS_KEY] = folds_key
+    if pipe_stats is not None:
+        res_doc.update(pipe_stats)
+    if oof_store is not None:
+        res_doc.update(store_out_of_fold(
+            array_store=oof_store,
+            estimators=cv_res['estimator'],
+            X=X,
+            y=y,
+            folds=cv,
+            metrics=list(scoring),
+            fold_scores=fold_scores,
+        ))
+    return res_doc, fold_scores
+
+
+# --- regularization paths ---
+
+def _fit_fold_path(
+        model, X, y, train_ix, test_ix, path_param, path_values, scorers,
+        keep_estimators):
+    """Fits a single estimator on a fold along a regularization path,
+    warm-starting every fit from the previous one if the estimator supports
+    it, and scores it at every point of the path.
+
+    Returns a (fit time, score time, scores by metric, fitted estimator)
+    4-tuple per path point; estimators are only kept if keep_estimators is
+    set, and are None for points whose fit failed.
+    """
+    X_train = _safe_indexing(X, train_ix)
+    y_train = _safe_indexing(y, train_ix)
+    X_test = _safe_indexing(X, test_ix)
+    y_test = _safe_indexing(y, test_ix)
+    estimator = clone(model)
+    if 'warm_start' in estimator.get_params(deep=False):
+        estimator.set_params(warm_start=True)
+    results = []
+    for value in path_values:
+        estimator.set_params(**{path_param: value})
+        start = time.perf_counter()
+        try:
+            estimator.fit(X_train, y_train)
+        except Exception as e:
+            warnings.warn("Folk: Fitting {} with {}={} failed: {}".format(
+                type(estimator).__name__, path_param, value, e))
+            results.append((
+                time.perf_counter() - start, 0.0,
+                {metric: np.nan for metric in scorers}, None))
+            # the next point of the path is fitted from scratch
+            estimator = clone(estimator)
+            continue
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        scores = {
+            metric: scorer(estimator, X_test, y_test)
+            for metric, scorer in scorers.items()
+        }
+        score_time = time.perf_counter() - start
+        results.append((
+            fit_time, score_time, scores,
+            copy.deepcopy(estimator) if keep_estimators else None))
+    return results
+
+
+def _cross_validate_path(X, y, cv, experiments):
+    """Cross validates experiments that differ only in the value of a path
+    parameter, ordered along the path, fitting a single estimator per fold
+    along the whole path. Returns a (result document, fold scores) pair per
+    experiment, in order."""
+    first = experiments[0]
+    path_param = first['path'][0]
+    scoring = _scoring_dict(first['scoring'])
+    scorers = {
+        metric: get_scorer(scorer) if isinstance(scorer, str) else scorer
+        for metric, scorer in scoring.items()
+    }
+    _print = print_func_by_verbosity(first['verbose'])
+    _print("  - Testing a path of {} models along {}...".format(
+        len(experiments), path_param))
+    cv = explicit_folds(cv, first['n_folds'], first['model'], X, y)
+    keep_estimators = first.get('oof_store') is not None
+    path_values = [kwargs['params'][path_param] for kwargs in experiments]
+    fold_results = Parallel(n_jobs=first['n_jobs'])(
+        delayed(_fit_fold_path)(
+            first['model'], X, y, train_ix, test_ix, path_param,
+            path_values, scorers, keep_estimators)
+        for train_ix, test_ix in cv
+    )
+    results = []
+    for i, kwargs in enumerate(experiments):
+        points = [fold_result[i] for fold_result in fold_results]
+        cv_res = {
+            'fit_time': np.array([point[0] for point in points]),
+            'score_time': np.array([point[1] for point in points]),
+            'estimator': [point[3] for point in points],
+        }
+        for metric in scoring:
+            cv_res['test_{}'.format(metric)] = np.array(
+                [point[2][metric] for point in points])
+        doc_kwargs = {
+            key: val for key, val in kwargs.items()
+            if key not in ('model', 'path')
+        }
+        doc_kwargs['scoring'] = scoring
+        if any(estimator is None for estimator in cv_res['estimator']):
+            doc_kwargs['oof_store'] = None
+        results.append(_res_doc_by_cv_res(
+            cv_res=cv_res,
+            # folds of a path are fitted together; this is the time spent on
+            # this point of the path in all folds
+            total_time=(cv_res['fit_time'] + cv_res['score_time']).sum(),
+            X=X, y=y, cv=cv, **doc_kwargs))
+    return results
+
+
+def _evaluation_units(experiments):
+    """Groups experiments into units of evaluation. Experiments of models
+    with a path parameter that differ only in its value form a single unit,
+    ordered along the path; every other experiment is a unit of its own."""
+    units = []
+    paths = {}
+    for kwargs in experiments:
+        path = kwargs.get('path')
+        if path is None:
+            units.append([kwargs])
+            continue
+        path_param = path[0]
+        key = (kwargs['pipe_id'], params_digest({
+            name: val for name, val in kwargs['params'].items()
+            if name != path_param}))
+        if key not in paths:
+            paths[key] = []
+            units.append(paths[key])
+        paths[key].append(kwargs)
+    for unit in units:
+        path = unit[0].get('path')
+        if path is not None:
+            unit.sort(
+                key=lambda kwargs: kwargs['params'][path[0]],
+                reverse=path[1])
+    return units
+
+
+def _cross_validate_unit(X, y, cv, unit):
+    if unit[0].get('path') is None:
+        return [_cross_validate_model(X=X, y=y, cv=cv, **unit[0])]
+    return _cross_validate_path(X=X, y=y, cv=cv, experiments=unit)
+
+
+def _write_res_doc(res_doc, run_id, metric_db, verbose, events=None):
     if metric_db:
+        _print = print_func_by_verbosity(verbose)
         _print("    Writing results to db...")
         write_experiment_res(
-            res_doc={
-                MetricKey.RUN_ID: run_id,
-                MetricKey.MODEL_ID: model_id,
-                MetricKey.LBL_COL: lbl_col,
-                MetricKey.ACC_MEAN: acc_mean,
-                MetricKey.ACC_STD: acc_std,
-                MetricKey.N_FOLDS: n_folds,
-                MetricKey.N_JOBS: n_jobs,
-                MetricKey.CROSS_VAL_TIME: total_time,
-                MetricKey.FOLD_TIME: per_fold_time,
-                MetricKey.DATASET_SIZE: len(df),
-                MetricKey.N_CLASS: n_classes,
-                **params,
-            },
+            res_doc=res_doc,
             db_name=metric_db,
             run_id=run_id,
         )
+        if events:
+            events.emit(
+                Event.DB_WRITE, run_id=run_id, db_name=metric_db,
+                res_doc=res_doc)
 
 
-def eval_pmodel_by_params(
-        run_id, pipeline, pmodel, raw_df, pipe_params, metric_db=None,
-        n_folds=None, n_jobs=None, verbose=None):
-    _print = _print_func_by_verbosity(verbose)
+def eval_model_by_params(
+        run_id, model, model_id, df, lbl_col, params, metric_db=None,
+        n_folds=None, n_jobs=None, verbose=None, pipe_id=None, cv=None,
+        folds_key=None, scoring=None, model_label=None):
+    if n_folds is None:
+        n_folds = 5
+    if n_jobs is None:
+        n_jobs = 1
+    # callers evaluating many models on the same dataset should prepare it
+    # once; see folk.prepared.prepare_dataset
+    data = prepare_dataset(df, lbl_col)
+    res_doc, _ = _cross_validate_model(
+        run_id=run_id,
+        model=model,
+        model_id=model_id,
+        X=data.X,
+        y=data.labels,
+        n_classes=data.n_classes,
+        lbl_col=lbl_col,
+        params=params,
+        n_folds=n_folds,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        pipe_id=pipe_id,
+        cv=cv,
+        folds_key=folds_key,
+        scoring=scoring,
+        model_label=model_label,
+    )
+    _write_res_doc(res_doc, run_id, metric_db, verbose)
+    # results are buffered by the metrics db; direct callers expect to find
+    # them there once this returns
+    if metric_db:
+        flush_metrics_db(metric_db)
+    return res_doc
+
+
+# --- process-based experiment workers ---
+
+# the features and labels of the transformed dataset a process worker
+# evaluates models on, and its cross validation folds; they are sent to each
+# worker once, when the worker starts, rather than with every task. Numeric
+# features and labels are sent as paths of memory-mapped arrays, which
+# workers attach to read-only; encoded class labels are decoded by their
+# classes, so models are fitted and scored on the original labels.
+_WORKER_X = None
+_WORKER_Y = None
+_WORKER_CV = None
+
+
+def _init_process_worker(X, y, cv, n_threads=None, classes=None):
+    global _WORKER_X, _WORKER_Y, _WORKER_CV
+    if n_threads is not None:
+        limit_native_threads(n_threads)
+    _WORKER_X = attach(X) if isinstance(X, str) else X
+    _WORKER_Y = attach(y) if isinstance(y, str) else y
+    if classes is not None:
+        _WORKER_Y = classes[_WORKER_Y]
+    _WORKER_CV = cv
+
+
+def _cross_validate_in_process_worker(unit):
+    # fold-level jobs run on threads inside worker processes; a nested pool
+    # of joblib worker processes would outlive the task and block the exit
+    # of the worker process until it times out
+    with parallel_backend('threading'):
+        return _cross_validate_unit(
+            X=_WORKER_X, y=_WORKER_Y, cv=_WORKER_CV, unit=unit)
+
+
+def _fold_jobs_backend(n_threads):
+    """Returns a context in which fold-level joblib worker processes are
+    limited to n_threads native threads each."""
+    if n_threads is None:
+        return contextlib.nullcontext()
+    return parallel_backend('loky', inner_max_num_threads=n_threads)
+
+
+def _cross_validate_in_thread_worker(n_threads, X, y, cv, unit):
+    # joblib backends are set per thread
+    with _fold_jobs_backend(n_threads):
+        return _cross_validate_unit(X=X, y=y, cv=cv, unit=unit)
+
+
+def _get_executor(
+        executor, max_workers, X, y, cv, n_threads=None, classes=None):
+    if executor == 'thread':
+        return ThreadPoolExecutor(max_workers=max_workers)
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_process_worker,
+        initargs=(X, y, cv, n_threads, classes),
+    )
+
+
+# --- run settings ---
+
+class _RunSettings(object):
+    """Run-wide evaluation settings, threaded through the evaluation flow.
+
+    See eval_param_pipeline_n_model for a description of all settings.
+    """
+
+    def __init__(
+            self, run_id, metric_db=None, n_folds=None, n_jobs=None,
+            verbose=None, executor=None, max_workers=None, strategy=None,
+            halving_factor=None, random_state=None, shuffle_folds=None,
+            array_store=None, mmap_dir=None, scoring=None,
+            trace_memory=None, listeners=None, store_predictions=None,
+            cpu_budget=None, n_epochs=None):
+        if n_folds is None:
+            n_folds = 5
+        if executor is None:
+            executor = 'serial'
+        if executor not in EXECUTORS:
+            raise ValueError("Unknown executor {}; must be one of {}.".format(
+                executor, EXECUTORS))
+        cpu_split = None
+        if cpu_budget is not None:
+            cpu_split = split_cpu_budget(
+                cpu_budget=cpu_budget,
+                n_folds=n_folds,
+                parallel_experiments=executor != 'serial',
+                n_workers=max_workers,
+                n_jobs=n_jobs,
+            )
+            max_workers = cpu_split.n_workers
+            n_jobs = cpu_split.n_jobs
+        if n_jobs is None:
+            n_jobs = 1
+        if strategy is None:
+            strategy = 'grid'
+        if strategy not in STRATEGIES:
+            raise ValueError("Unknown strategy {}; must be one of {}.".format(
+                strategy, STRATEGIES))
+        if halving_factor is None:
+            halving_factor = 3
+        if halving_factor < 2:
+            raise ValueError("halving_factor must be at least 2.")
+        if n_epochs is None:
+            n_epochs = 1
+        if n_epochs < 1:
+            raise ValueError("n_epochs must be positive.")
+        if isinstance(array_store, str):
+            array_store = ArrayStore(array_store)
+        if store_predictions and array_store is None:
+            raise ValueError("store_predictions requires an array_store.")
+        self.run_id = run_id
+        self.metric_db = metric_db
+        self.n_folds = n_folds
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.executor = executor
+        self.max_workers = max_workers
+        self.cpu_split = cpu_split
+        self.n_threads = None if cpu_split is None else cpu_split.n_threads
+        self.strategy = strategy
+        self.halving_factor = halving_factor
+        self.random_state = random_state
+        self.shuffle_folds = bool(shuffle_folds)
+        self.array_store = array_store
+        self.store_predictions = bool(store_predictions)
+        self.mmap_dir = mmap_dir
+        self.scoring = _scoring_dict(scoring)
+        # the metric successive halving ranks configurations by
+        self.primary_metric = next(iter(self.scoring))
+        self.trace_memory = bool(trace_memory)
+        self.n_epochs = n_epochs
+        self.events = EventBus(listeners)
+        self.print = print_func_by_verbosity(verbose)
+
+
+# --- experiment scheduling ---
+
+def _timed_iter(iterator):
+    """Yields each item of the given iterator together with the number of
+    seconds it took the iterator to produce it."""
+    iterator = iter(iterator)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield item, time.perf_counter() - start
+
+
+def _model_experiments(settings, pmodel, pipe_params, completed=None):
+    pipe_id = params_digest(pipe_params)
+    partial_pmodel = pmodel.partial(pipe_params)
+    experiments = []
+    model_n_params = _timed_iter(partial_pmodel.model_n_params_iter())
+    for (model, mparams), build_time in model_n_params:
+        model_id = pmodel.model_id_by_params(mparams)
+        if completed and (model_id, pipe_id) in completed:
+            continue
+        full_params = mparams.copy()
+        full_params.update(pipe_params)
+        kwargs = {
+            'run_id': settings.run_id,
+            'model': model,
+            'model_id': model_id,
+            'model_label': pmodel.model_label_by_params(mparams),
+            'pipe_id': pipe_id,
+            'lbl_col': pipe_params['lbl_col'],
+            'params': full_params,
+            'n_folds': settings.n_folds,
+            'n_jobs': settings.n_jobs,
+            'verbose': settings.verbose,
+            'scoring': settings.scoring,
+            'model_build_time': build_time,
+            'oof_store': (
+                settings.array_store if settings.store_predictions
+                else None),
+        }
+        path_param = getattr(pmodel, 'path_param', None)
+        if path_param is not None:
+            kwargs['path'] = (path_param, pmodel.path_descending)
+        experiments.append(kwargs)
+    return experiments
+
+
+def _dataset_fold_assignment(settings, y, experiments):
+    """Assigns the samples of a dataset to cross validation folds once, to
+    be shared by all models evaluated on it. Folds are stratified only if
+    all of these models are classifiers. If an array store is configured,
+    the fold assignment is persisted in it, and its key is returned."""
+    assignment = fold_assignment(
+        y=y,
+        n_folds=settings.n_folds,
+        shuffle=settings.shuffle_folds,
+        random_state=settings.random_state,
+        classifier=all(
+            is_classifier(kwargs['model']) for kwargs in experiments),
+    )
+    folds_key = None
+    if settings.array_store is not None:
+        folds_key = settings.array_store.put(assignment)
+    return assignment, folds_key
+
+
+def _dataset_folds(settings, y, experiments):
+    """Computes the cross validation folds of a dataset once; see
+    _dataset_fold_assignment."""
+    assignment, folds_key = _dataset_fold_assignment(
+        settings, y, experiments)
+    return folds_by_assignment(assignment), folds_key
+
+
+def _memmap_dataset(memmaps, data):
+    """Shares the features and labels of a prepared dataset through
+    memory-mapped files. Returns the paths of the shared features and
+    encoded labels, and the classes to decode labels by, or None if its
+    features are not a dense numeric array."""
+    if not isinstance(data.X, np.ndarray) or data.y.dtype.kind not in 'biuf':
+        return None
+    return memmaps.share(data.X), memmaps.share(data.y), data.classes
+
+
+def _run_experiments(settings, data, experiments):
+    """Evaluates the given experiments on the given prepared dataset, writes
+    their result documents to the metrics db and returns them."""
+    cv, folds_key = _dataset_folds(settings, data.y, experiments)
+    # models are fitted and scored on the original labels, so that scorers
+    # relying on a positive label score them as they would the raw dataset
+    X, y = data.X, data.labels
+    experiments = [
+        dict(kwargs, folds_key=folds_key, n_classes=data.n_classes)
+        for kwargs in experiments
+    ]
+    # with multiple worker processes, either folk's or joblib's, the dataset
+    # is memory-mapped once rather than copied into every worker
+    shared = None
+    memmaps = None
+    if settings.executor == 'process' or settings.n_jobs != 1:
+        memmaps = MemmapArrays(dir_path=settings.mmap_dir)
+        shared = _memmap_dataset(memmaps, data)
+        if shared is not None:
+            X = attach(shared[0])
+            if data.classes is None:
+                y = attach(shared[1])
+    try:
+        return _run_experiments_on_arrays(
+            settings=settings,
+            X=X,
+            y=y,
+            cv=cv,
+            shared=shared,
+            experiments=experiments,
+        )
+    finally:
+        if memmaps is not None:
+            memmaps.close()
+
+
+def _emit_model_start(events, kwargs):
+    if events:
+        events.emit(
+            Event.MODEL_START, run_id=kwargs['run_id'],
+            pipe_id=kwargs['pipe_id'], model_id=kwargs['model_id'],
+            params=kwargs['params'])
+
+
+def _emit_model_end(events, kwargs, res_doc, fold_scores):
+    if not events:
+        return
+    ids = {
+        'run_id': kwargs['run_id'],
+        'pipe_id': kwargs['pipe_id'],
+        'model_id': kwargs['model_id'],
+    }
+    fit_times = res_doc[MetricKey.FOLD_FIT_TIMES]
+    score_times = res_doc[MetricKey.FOLD_SCORE_TIMES]
+    for fold, (fit_time, score_time) in enumerate(
+            zip(fit_times, score_times)):
+        events.emit(
+            Event.FOLD_END, fold=fold, fit_time=fit_time,
+            score_time=score_time, scores={
+                metric: scores[fold]
+                for metric, scores in fold_scores.items()
+            }, **ids)
+    events.emit(
+        Event.MODEL_END, params=kwargs['params'], res_doc=res_doc, **ids)
+
+
+def _cpu_split_doc(cpu_split):
+    return {
+        MetricKey.CPU_BUDGET: cpu_split.cpu_budget,
+        MetricKey.N_WORKERS: cpu_split.n_workers,
+        MetricKey.N_THREADS: cpu_split.n_threads,
+    }
+
+
+def _record_result(settings, kwargs, res_doc, fold_scores):
+    if settings.cpu_split is not None:
+        res_doc.update(_cpu_split_doc(settings.cpu_split))
+    _emit_model_end(settings.events, kwargs, res_doc, fold_scores)
+    _write_res_doc(
+        res_doc, settings.run_id, settings.metric_db, settings.verbose,
+        settings.events)
+
+
+def _run_experiments_on_arrays(settings, X, y, cv, shared, experiments):
+    # native thread pools of this process, and of fold-level joblib worker
+    # processes, are limited by the CPU budget of the run, if one is set
+    with native_thread_limits(settings.n_threads), \
+            _fold_jobs_backend(settings.n_threads):
+        return _run_units(
+            settings, X, y, cv, shared, _evaluation_units(experiments))
+
+
+def _run_units(settings, X, y, cv, shared, units):
+    _print = settings.print
+    events = settings.events
+    res_docs = []
+    if settings.executor == 'serial':
+        j = 0
+        for unit in units:
+            for kwargs in unit:
+                j += 1
+                _print("-------- Model {} --------".format(j))
+                _print("Testing model with params: {}".format(
+                    kwargs['params']))
+                _emit_model_start(events, kwargs)
+            results = _cross_validate_unit(X=X, y=y, cv=cv, unit=unit)
+            for kwargs, (res_doc, fold_scores) in zip(unit, results):
+                _record_result(settings, kwargs, res_doc, fold_scores)
+                res_docs.append(res_doc)
+        return res_docs
+    _print("Evaluating {} models with a {} pool...".format(
+        sum(len(unit) for unit in units), settings.executor))
+    worker_X, worker_y, classes = (X, y, None) if shared is None else shared
+    with _get_executor(
+            settings.executor, settings.max_workers, worker_X, worker_y,
+            cv, settings.n_threads, classes) as pool:
+        futures = {}
+        for unit in units:
+            for kwargs in unit:
+                _emit_model_start(events, kwargs)
+            if settings.executor == 'thread':
+                future = pool.submit(
+                    _cross_validate_in_thread_worker, settings.n_threads,
+                    X=X, y=y, cv=cv, unit=unit)
+            else:
+                future = pool.submit(
+                    _cross_validate_in_process_worker, unit)
+            futures[future] = unit
+        j = 0
+        for future in as_completed(futures):
+            results = future.result()
+            for kwargs, (res_doc, fold_scores) in zip(
+                    futures[future], results):
+                j += 1
+                _print("-------- Model {} done: {} --------".format(
+                    j, kwargs['model_id']))
+                _record_result(settings, kwargs, res_doc, fold_scores)
+                res_docs.append(res_doc)
+    return res_docs
+
+
+def _halving_rung_sizes(n_candidates, n_samples, factor, min_samples):
+    n_rungs = 1
+    while factor ** (n_rungs - 1) < n_candidates:
+        n_rungs += 1
+    sizes = []
+    for rung in range(n_rungs):
+        size = int(n_samples / factor ** (n_rungs - 1 - rung))
+        sizes.append(min(n_samples, max(size, min_samples)))
+    return sizes
+
+
+def _subsample(data, n_samples, random_state):
+    """Returns a subsample of a prepared dataset, stratified on its labels.
+    """
+    if n_samples >= data.n_samples:
+        return data
+    frac = n_samples / data.n_samples
+    y = pd.Series(data.y)
+    indices = y.groupby(y, group_keys=False).sample(
+        frac=frac, random_state=random_state).index.to_numpy()
+    return data.take(indices)
+
+
+def _run_experiments_halving(settings, data, experiments):
+    """Evaluates the given experiments by successive halving: all of them
+    are first scored on a small stratified subsample of the dataset, and
+    only the top 1/halving_factor of each rung, by the primary scoring
+    metric, advance to the next one, which uses halving_factor times as many
+    samples. The last rung uses the whole dataset."""
+    _print = settings.print
+    factor = settings.halving_factor
+    rung_sizes = _halving_rung_sizes(
+        n_candidates=len(experiments),
+        n_samples=data.n_samples,
+        factor=factor,
+        min_samples=2 * settings.n_folds * data.n_classes,
+    )
+    candidates = experiments
+    res_docs = []
+    for rung, n_samples in enumerate(rung_sizes):
+        _print("-------- Rung {}: {} models on {} samples --------".format(
+            rung, len(candidates), n_samples))
+        rung_data = _subsample(data, n_samples, settings.random_state)
+        rung_experiments = [
+            dict(kwargs, params=dict(kwargs['params'], **{
+                MetricKey.RUNG: rung}))
+            for kwargs in candidates
+        ]
+        rung_docs = _run_experiments(settings, rung_data, rung_experiments)
+        res_docs.extend(rung_docs)
+        if rung == len(rung_sizes) - 1:
+            break
+        primary_key = MetricKey.mean_key(settings.primary_metric)
+        score_by_model_id = {
+            doc[MetricKey.MODEL_ID]: doc[primary_key]
+            for doc in rung_docs
+        }
+        n_keep = max(1, int(math.ceil(len(candidates) / factor)))
+        candidates = sorted(
+            candidates,
+            key=lambda kwargs: _nan_to_neg_inf(
+                score_by_model_id[kwargs['model_id']]),
+            reverse=True,
+        )[:n_keep]
+    return res_docs
+
+
+def _nan_to_neg_inf(score):
+    if score is None or score != score:
+        return float('-inf')
+    return score
+
+
+def _pipe_stats(stage_stats, pipe_time=None):
+    """Returns the result document entries describing the application of a
+    pipeline by its stage statistics."""
+    if pipe_time is None:
+        pipe_time = sum(stat[StageStatKey.TIME] for stat in stage_stats)
+    return {
+        MetricKey.PIPE_TIME: pipe_time,
+        MetricKey.PIPE_STAGES: stage_stats,
+    }
+
+
+def _eval_experiments_on_df(settings, df, experiments, pipe_stats=None):
+    _print = settings.print
+    _print("Dataset size: {}".format(len(df)))
+    _print("Number of columns: {}".format(len(df.columns)))
+    _print("Resulting dataset size: {}".format(len(df)))
+    _print("Resulting columns: {}".format(sorted(list(df.columns))))
+    # features, labels and label statistics are computed once, and shared
+    # by all models evaluated on this pipeline configuration
+    data = prepare_dataset(df, experiments[0]['lbl_col'])
+    pipe_stats = dict(pipe_stats or {}, **{
+        MetricKey.DATASET_FINGERPRINT: data.fingerprint})
+    experiments = [
+        dict(kwargs, pipe_stats=pipe_stats) for kwargs in experiments]
+    if settings.strategy == 'halving':
+        res_docs = _run_experiments_halving(settings, data, experiments)
+    else:
+        res_docs = _run_experiments(settings, data, experiments)
+    _print("=============================\n")
+    return res_docs
+
+
+# --- pipeline application ---
+
+def _n_evaluations(settings, n_experiments):
+    """Returns the number of model evaluations performed for the given
+    number of experiments on a pipeline configuration."""
+    if settings.strategy != 'halving':
+        return n_experiments
+    n_rungs = len(_halving_rung_sizes(
+        n_experiments, n_samples=1, factor=settings.halving_factor,
+        min_samples=1))
+    n_evaluations = 0
+    for _ in range(n_rungs):
+        n_evaluations += n_experiments
+        n_experiments = max(
+            1, int(math.ceil(n_experiments / settings.halving_factor)))
+    return n_evaluations
+
+
+def _emit_pipeline_start(settings, pipe_params, experiments):
+    if settings.events:
+        settings.events.emit(
+            Event.PIPELINE_START, run_id=settings.run_id,
+            pipe_id=params_digest(pipe_params), params=pipe_params,
+            n_models=_n_evaluations(settings, len(experiments)))
+
+
+def _emit_pipeline_end(settings, pipe_params):
+    if settings.events:
+        settings.events.emit(
+            Event.PIPELINE_END, run_id=settings.run_id,
+            pipe_id=params_digest(pipe_params), params=pipe_params)
+
+
+def _print_pipeline_header(pipe_params, verbose):
+    _print = print_func_by_verbosity(verbose)
     _print("=============================")
     _print("Testing parameterized model on pipeline with "
            "params {}".format(pipe_params))
+
+
+def _check_chunked_run(settings, share_prefixes=None):
+    if settings.strategy == 'halving':
+        raise ValueError(
+            "The 'halving' strategy is not supported with chunked datasets.")
+    if settings.executor != 'serial':
+        raise ValueError(
+            "Chunked datasets are evaluated with the 'serial' executor only.")
+    if settings.store_predictions:
+        raise ValueError(
+            "store_predictions is not supported with chunked datasets.")
+    if share_prefixes:
+        raise ValueError(
+            "share_prefixes is not supported with chunked datasets.")
+
+
+def _eval_pmodel_chunked(
+        settings, pipeline, pmodel, source, pipe_params, completed=None):
+    """Evaluates a parameterized model on a pipeline applied to a chunked
+    dataset, cross validating all model configurations incrementally."""
+    _print = settings.print
+    _print_pipeline_header(pipe_params, settings.verbose)
+    experiments = _model_experiments(
+        settings=settings,
+        pmodel=pmodel,
+        pipe_params=pipe_params,
+        completed=completed,
+    )
+    if not experiments:
+        _print("All models were already evaluated on this pipeline.")
+        _print("=============================\n")
+        return []
+    for kwargs in experiments:
+        if not hasattr(kwargs['model'], 'partial_fit'):
+            raise TypeError((
+                "Model {} does not support partial_fit, which evaluation on "
+                "chunked datasets requires.").format(kwargs['model_id']))
+    _emit_pipeline_start(settings, pipe_params, experiments)
+    transformer = ChunkTransformer(pipeline, verbose=settings.verbose)
+
+    def chunk_iter():
+        for chunk in source:
+            chunk = transformer.transform(chunk)
+            if len(chunk):
+                yield chunk
+
+    lbl_col = pipe_params['lbl_col']
+    # the first pass fits the pipeline and reads labels, to assign samples
+    # to stratified folds exactly as in memory
+    start = time.time()
+    y, n_chunks = chunked_labels(chunk_iter, lbl_col)
+    pipe_stats = _pipe_stats(transformer.stage_stats(), time.time() - start)
+    assignment, folds_key = _dataset_fold_assignment(
+        settings, y, experiments)
+    classes = np.unique(y)
+    _print("Dataset size: {} rows in {} chunks".format(len(y), n_chunks))
+    for kwargs in experiments:
+        _emit_model_start(settings.events, kwargs)
+    _print("Cross validating {} models incrementally...".format(
+        len(experiments)))
+    with native_thread_limits(settings.n_threads):
+        cv_results = incremental_cross_validate(
+            estimators=[kwargs['model'] for kwargs in experiments],
+            chunk_iter=chunk_iter,
+            lbl_col=lbl_col,
+            assignment=assignment,
+            classes=classes,
+            scoring=settings.scoring,
+            n_epochs=settings.n_epochs,
+            n_jobs=settings.n_jobs,
+        )
+    res_docs = []
+    for kwargs, cv_res in zip(experiments, cv_results):
+        res_doc, fold_scores = _res_doc_by_cv_res(
+            cv_res=cv_res,
+            total_time=cv_res['fit_time'].sum() + cv_res['score_time'].sum(),
+            run_id=kwargs['run_id'], model_id=kwargs['model_id'], X=None,
+            y=y, lbl_col=lbl_col, params=kwargs['params'],
+            n_folds=settings.n_folds, n_jobs=settings.n_jobs,
+            verbose=settings.verbose, n_classes=len(classes),
+            scoring=settings.scoring, pipe_id=kwargs['pipe_id'],
+            folds_key=folds_key,
+            model_build_time=kwargs['model_build_time'],
+            pipe_stats=pipe_stats, model_label=kwargs['model_label'],
+        )
+        res_doc[MetricKey.N_EPOCHS] = settings.n_epochs
+        res_doc[MetricKey.N_CHUNKS] = n_chunks
+        _record_result(settings, kwargs, res_doc, fold_scores)
+        res_docs.append(res_doc)
+    _print("=============================\n")
+    _emit_pipeline_end(settings, pipe_params)
+    return res_docs
+
+
+def _eval_pmodel(
+        settings, pipeline, pmodel, raw_df, pipe_params,
+        transform_cache=None, raw_fingerprint=None, completed=None):
+    if isinstance(raw_df, ChunkedSource):
+        return _eval_pmodel_chunked(
+            settings=settings,
+            pipeline=pipeline,
+            pmodel=pmodel,
+            source=raw_df,
+            pipe_params=pipe_params,
+            completed=completed,
+        )
+    _print = settings.print
+    verbose = settings.verbose
+    _print_pipeline_header(pipe_params, verbose)
+    experiments = _model_experiments(
+        settings=settings,
+        pmodel=pmodel,
+        pipe_params=pipe_params,
+        completed=completed,
+    )
+    if not experiments:
+        _print("All models were already evaluated on this pipeline.")
+        _print("=============================\n")
+        return []
+    _emit_pipeline_start(settings, pipe_params, experiments)
     _print("Starting to apply pipeline at {}".format(datetime.now()))
     _print("Applying pipeline...")
     start = time.time()
-    if verbose:
-        df = pipeline.fit_transform(raw_df, verbose=True)
-    else:
-        df = pipeline.fit_transform(raw_df)
+    df = None
+    stage_stats = []
+    if transform_cache is not None:
+        if raw_fingerprint is None:
+            raw_fingerprint = df_fingerprint(raw_df)
+        cache_key = transform_cache.key(pipe_params, raw_fingerprint)
+        df = transform_cache.get(cache_key)
+        if df is not None:
+            _print("Loaded transformed dataset from cache.")
+    if df is None:
+        df, stage_stats = profiled_fit_transform(
+            pipeline=pipeline,
+            df=raw_df,
+            verbose=verbose,
+            trace_memory=settings.trace_memory,
+        )
+        if transform_cache is not None:
+            transform_cache.put(cache_key, df)
     end = time.time()
     pipe_time = end - start
     _print("Finished applying pipeline at {}".format(datetime.now()))
     _print("Pipeline application took {:.2f} seconds.".format(pipe_time))
-    _print("Dataset size: {}".format(len(df)))
-    _print("Number of columns: {}".format(len(df.columns)))
-    _print("Resulting dataset size: {}".format(len(df)))
-    _print("Resulting columns: {}".format(sorted(list(df.columns))))
-    partial_pmodel = pmodel.partial(pipe_params)
-    j = 1
-    for model, mparams in partial_pmodel.model_n_params_iter():
-        model_id = pmodel.model_id_by_params(mparams)
-        _print("-------- Model {} --------".format(j))
-        _print("Testing model with params: {}".format(mparams))
-        full_params = mparams.copy()
-        full_params.update(pipe_params)
-        eval_model_by_params(
-            run_id=run_id,
-            model=model,
-            model_id=model_id,
+    res_docs = _eval_experiments_on_df(
+        settings, df, experiments, _pipe_stats(stage_stats, pipe_time))
+    _emit_pipeline_end(settings, pipe_params)
+    return res_docs
+
+
+def _flush_after_run(metric_db, error):
+    """Flushes the given metrics db, if any, at the end of a run. If the run
+    failed with the given error, a failed flush is only warned about, so the
+    error of the run propagates."""
+    if not metric_db:
+        return
+    try:
+        flush_metrics_db(metric_db)
+    except Exception as e:
+        if error is None:
+            raise
+        warnings.warn(
+            "Folk: Failed to flush metrics db {} after a failed run: {}"
+            "".format(metric_db, e))
+
+
+def eval_pmodel_by_params(
+        run_id, pipeline, pmodel, raw_df, pipe_params, metric_db=None,
+        n_folds=None, n_jobs=None, verbose=None, transform_cache=None,
+        raw_fingerprint=None, completed=None, **kwargs):
+    settings = _RunSettings(
+        run_id=run_id,
+        metric_db=metric_db,
+        n_folds=n_folds,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        **kwargs
+    )
+    raw_df = as_chunked_source(raw_df)
+    if isinstance(raw_df, ChunkedSource):
+        _check_chunked_run(settings)
+    error = None
+    try:
+        return _eval_pmodel(
+            settings=settings,
+            pipeline=pipeline,
+            pmodel=pmodel,
+            raw_df=raw_df,
+            pipe_params=pipe_params,
+            transform_cache=transform_cache,
+            raw_fingerprint=raw_fingerprint,
+            completed=completed,
+        )
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _flush_after_run(metric_db, error)
+
+
+def _shared_prefix_transforms(
+        settings, pipe_n_params, dataset, transform_cache, raw_fingerprint):
+    transforms_kwargs = {
+        'df': dataset,
+        'verbose': settings.verbose,
+        'stage_stats': True,
+        'trace_memory': settings.trace_memory,
+    }
+    if transform_cache is None:
+        yield from shared_prefix_transform_iter(
+            pipe_n_params=pipe_n_params, **transforms_kwargs)
+        return
+    # configurations with cached results are served from the cache; only the
+    # rest are arranged in a prefix tree
+    misses = []
+    for pipeline, params in pipe_n_params:
+        key = transform_cache.key(params, raw_fingerprint)
+        df = transform_cache.get(key)
+        if df is None:
+            misses.append((pipeline, params))
+        else:
+            yield params, df, []
+    for params, df, stage_stats in shared_prefix_transform_iter(
+            pipe_n_params=misses, **transforms_kwargs):
+        transform_cache.put(transform_cache.key(params, raw_fingerprint), df)
+        yield params, df, stage_stats
+
+
+def _eval_with_shared_prefixes(
+        settings, param_pipeline, param_model, dataset, transform_cache,
+        raw_fingerprint, completed):
+    _print = settings.print
+    pipe_n_params = []
+    experiments_by_pipe_id = {}
+    for pipeline, params in param_pipeline.pipe_n_params_iter():
+        experiments = _model_experiments(
+            settings=settings,
+            pmodel=param_model,
+            pipe_params=params,
+            completed=completed,
+        )
+        if experiments:
+            pipe_n_params.append((pipeline, params))
+            experiments_by_pipe_id[params_digest(params)] = experiments
+    transforms = _shared_prefix_transforms(
+        settings=settings,
+        pipe_n_params=pipe_n_params,
+        dataset=dataset,
+        transform_cache=transform_cache,
+        raw_fingerprint=raw_fingerprint,
+    )
+    for i, (params, df, stage_stats) in enumerate(transforms, 1):
+        _print("Pipeline #{}".format(i))
+        _print_pipeline_header(params, settings.verbose)
+        experiments = experiments_by_pipe_id[params_digest(params)]
+        _emit_pipeline_start(settings, params, experiments)
+        _eval_experiments_on_df(
+            settings=settings,
             df=df,
-            lbl_col=pipe_params['lbl_col'],
-            params=full_params,
-            n_folds=n_folds,
-            n_jobs=n_jobs,
-            metric_db=metric_db,
-            verbose=verbose,
+            experiments=experiments,
+            pipe_stats=_pipe_stats(stage_stats),
         )
-        j += 1
-    _print("=============================\n")
+        _emit_pipeline_end(settings, params)
+
+
+def new_run_id():
+    """Returns the id of a new run, based on the current time."""
+    run_at = datetime.utcnow()
+    return str(run_at.timestamp()).replace('.', '')
 
 
 def eval_param_pipeline_n_model(
         param_pipeline, param_model, dataset, metric_db=None, n_folds=None,
-        n_jobs=None, verbose=None):
+        n_jobs=None, verbose=None, executor=None, max_workers=None,
+        share_prefixes=None, resume_run_id=None, strategy=None,
+        halving_factor=None, random_state=None, shuffle_folds=None,
+        array_store=None, mmap_dir=None, scoring=None, trace_memory=None,
+        listeners=None, store_predictions=None, cpu_budget=None,
+        n_epochs=None):
     """Evaluates the given parameterized pipeline and model.
 
     Parameters
@@ -126,9 +1174,24 @@ def eval_param_pipeline_n_model(
     param_pipeline : folk.ParameterizedPipeline
         The parameterized pipeline to evaluate.
     param_model : folk.ParameterizedModel
-        The parameterized model to evaluate.
-    dataset : pandas.DataFrame
+        The parameterized model to evaluate. If it declares a path parameter,
+        model configurations along each of its paths are evaluated together,
+        as a single unit of work; see folk.ParameterizedModel.
+    dataset : pandas.DataFrame, folk.chunked.ChunkedSource, str or callable
         The dataset to evaluate the parameterized pipeline and model on.
+        Datasets larger than memory can be given as a
+        folk.chunked.ChunkedSource, or as the path of a Parquet file or
+        directory, or a callable returning a new iterator over dataframe
+        chunks on every call, which are read as one. Chunked datasets are
+        never materialized: every pipeline is fitted on the first chunk and
+        applied chunk by chunk, so its stages should be row-wise, and every
+        model configuration - which must support partial_fit - is cross
+        validated incrementally, over n_epochs passes over the chunks; see
+        folk.chunked.incremental_cross_validate. The dataset is read
+        n_epochs + 2 times per pipeline configuration. They are only
+        supported with the 'serial' executor and the 'grid' strategy, and
+        without share_prefixes, store_predictions or transform caching;
+        n_jobs then sets the number of threads updating fold models.
     metric_db : str, optional
         The name of the folk metrics db to write results to. Must be included
         in folk's configuration. If not given, results are not written to db.
@@ -138,22 +1201,186 @@ def eval_param_pipeline_n_model(
         The number of threads to run evaluation on. Defaults to 1.
     verbose : bool, optional
         If set to True, informative messages are _printed. Defaults to False.
+    executor : str, optional
+        How experiments - pairs of a pipeline configuration and a model
+        configuration - are scheduled. 'serial' evaluates them one after the
+        other; 'thread' and 'process' fan out all model configurations of
+        each pipeline configuration to a pool of threads or processes,
+        respectively. Each process worker receives the transformed dataset
+        once, when it starts (see mmap_dir), and all result documents are
+        written to the metrics db by the calling process. Defaults to
+        'serial'.
+    max_workers : int, optional
+        The maximum number of pool workers to use when executor is 'thread'
+        or 'process'. Defaults to the number of processors on the machine.
+    share_prefixes : bool, optional
+        If set to True, all pipelines induced by the parameterized pipeline
+        are realized up front and arranged in a prefix tree of identical
+        stage sequences, so that the output of each shared prefix of stages
+        is computed only once. Pipeline configurations are then evaluated in
+        the depth-first order of that tree. Defaults to False.
+    resume_run_id : str, optional
+        The id of a previous, interrupted run to resume. Results are then
+        recorded under this run id, and experiments whose results were
+        already written to metric_db under it are skipped; completed
+        experiments are looked up with a single query at the start of the
+        run. Pipelines all of whose models were already evaluated are not
+        applied at all. Not supported with the 'halving' strategy.
+    strategy : str, optional
+        How the model configurations of each pipeline configuration are
+        evaluated. 'grid' cross validates all of them on the whole dataset.
+        'halving' performs successive halving: all configurations are cross
+        validated on a small stratified subsample of the dataset, the top
+        1/halving_factor of them are kept, and survivors are cross validated
+        on a halving_factor times larger subsample, until the remaining
+        configurations are evaluated on the whole dataset. Every rung's
+        results are written to the metrics db with their rung index.
+        Defaults to 'grid'.
+    halving_factor : int, optional
+        The factor by which the number of configurations shrinks, and the
+        number of samples grows, on every rung of successive halving.
+        Defaults to 3.
+    random_state : int, optional
+        Seeds the subsampling of successive halving rungs and the shuffling
+        of samples into cross validation folds.
+    shuffle_folds : bool, optional
+        Cross validation folds are computed once per transformed dataset,
+        stratified on its label column, and shared by all models evaluated
+        on it. If set to True, samples are shuffled before being split into
+        folds. Defaults to False.
+    array_store : folk.arrays.ArrayStore or str, optional
+        An array store, or the path of its root directory. If given, the fold
+        assignment of every transformed dataset is persisted in it as an
+        int32 array, and its key is recorded in result documents.
+    mmap_dir : str, optional
+        When experiments run in worker processes - with the 'process'
+        executor or with n_jobs other than 1 - numeric features and labels
+        of each transformed dataset are written once to memory-mapped files
+        in a temporary directory, which all workers attach to read-only
+        instead of receiving copies. This sets the directory in which that
+        temporary directory is created; defaults to the system's default
+        temporary directory.
+    scoring : str, list or dict, optional
+        The metrics to score every model configuration by. Either the name
+        of a scikit-learn scorer, a list of such names, or a dict mapping
+        metric names to scorer names or scorer callables. All metrics are
+        computed on the same models fitted on each fold, and the mean and
+        standard deviation of each metric over folds are recorded in result
+        documents under '<metric>_mean' and '<metric>_std'. The first metric
+        ranks configurations in successive halving. Defaults to 'accuracy'.
+    trace_memory : bool, optional
+        Pipelines are applied stage by stage, and the wall time of every
+        stage is recorded in result documents, along with the total pipeline
+        time, the actual fit and score times of every fold and the time it
+        took to construct the model. If set to True, the peak memory
+        allocated by every stage is traced with tracemalloc and recorded as
+        well, which slows pipeline application down. Defaults to False.
+    listeners : list of folk.hooks.EvaluationListener, optional
+        Listeners to the events of this run - its start and end, the start
+        and end of every pipeline configuration and experiment, the end of
+        every fold and every write to the metrics db - in addition to any
+        listeners registered with folk.hooks.register_listener. See
+        folk.hooks.Event for event payloads, and folk.hooks for listeners
+        that profile experiments, export spans or report progress.
+    store_predictions : bool, optional
+        If set to True, the out-of-fold predictions of every experiment -
+        class probabilities as float32, if the model supports them - are
+        stored in array_store, which must then be given, along with the
+        class index of every sample, its fold assignment and the per-fold
+        scores of every metric. Their keys are recorded in result documents,
+        so that folk.oof.recompute_metric can score experiments by new
+        metrics without fitting any model. Defaults to False.
+    cpu_budget : int, optional
+        The total number of CPUs the run may use, or -1 for all available
+        ones. If given, it is split between experiment workers (max_workers,
+        1 with the 'serial' executor), fold jobs per experiment (n_jobs) and
+        native BLAS/OpenMP threads per fold job, so that their product never
+        exceeds it; max_workers and n_jobs are then derived from the budget
+        unless given. Native threads are limited with threadpoolctl in the
+        calling process and in every worker process. The split is recorded
+        in result documents under 'cpu_budget', 'n_workers', 'n_jobs' and
+        'n_threads'. If not given, nothing is limited.
+    n_epochs : int, optional
+        The number of passes over a chunked dataset to fit every model
+        configuration by. Ignored for in-memory datasets. Defaults to 1.
     """
-    _print = _print_func_by_verbosity(verbose)
-    run_at = datetime.utcnow()
-    run_id = str(run_at.timestamp()).replace('.', '')
-    i = 1
-    for pipeline, params in param_pipeline.pipe_n_params_iter():
-        _print("Pipeline #{}".format(i))
-        eval_pmodel_by_params(
-            run_id=run_id,
-            pipeline=pipeline,
-            pmodel=param_model,
-            raw_df=dataset,
-            pipe_params=params,
-            metric_db=metric_db,
-            n_folds=n_folds,
-            n_jobs=n_jobs,
-            verbose=verbose,
-        )
-        i += 1
+    if strategy == 'halving' and resume_run_id is not None:
+        raise ValueError(
+            "Resuming runs is not supported with the 'halving' strategy.")
+    completed = None
+    if resume_run_id is None:
+        run_id = new_run_id()
+    else:
+        run_id = resume_run_id
+    settings = _RunSettings(
+        run_id=run_id,
+        metric_db=metric_db,
+        n_folds=n_folds,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        executor=executor,
+        max_workers=max_workers,
+        strategy=strategy,
+        halving_factor=halving_factor,
+        random_state=random_state,
+        shuffle_folds=shuffle_folds,
+        array_store=array_store,
+        mmap_dir=mmap_dir,
+        scoring=scoring,
+        trace_memory=trace_memory,
+        listeners=listeners,
+        store_predictions=store_predictions,
+        cpu_budget=cpu_budget,
+        n_epochs=n_epochs,
+    )
+    _print = settings.print
+    dataset = as_chunked_source(dataset)
+    chunked = isinstance(dataset, ChunkedSource)
+    if chunked:
+        _check_chunked_run(settings, share_prefixes)
+    if resume_run_id is not None and metric_db:
+        completed = completed_experiment_keys(
+            db_name=metric_db, run_id=run_id)
+        _print("Resuming run {}; {} experiments already done.".format(
+            run_id, len(completed)))
+    settings.events.emit(Event.RUN_START, run_id=run_id)
+    error = None
+    try:
+        transform_cache = None
+        if not chunked:
+            transform_cache = getattr(
+                param_pipeline, 'transform_cache', None)
+        raw_fingerprint = None
+        if transform_cache is not None:
+            raw_fingerprint = df_fingerprint(dataset)
+        if share_prefixes:
+            _eval_with_shared_prefixes(
+                settings=settings,
+                param_pipeline=param_pipeline,
+                param_model=param_model,
+                dataset=dataset,
+                transform_cache=transform_cache,
+                raw_fingerprint=raw_fingerprint,
+                completed=completed,
+            )
+            return
+        i = 1
+        for pipeline, params in param_pipeline.pipe_n_params_iter():
+            _print("Pipeline #{}".format(i))
+            _eval_pmodel(
+                settings=settings,
+                pipeline=pipeline,
+                pmodel=param_model,
+                raw_df=dataset,
+                pipe_params=params,
+                transform_cache=transform_cache,
+                raw_fingerprint=raw_fingerprint,
+                completed=completed,
+            )
+            i += 1
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _flush_after_run(metric_db, error)
+        settings.events.emit(Event.RUN_END, run_id=run_id, error=error)
@@ -4,3 +4,23 @@
 class FolkMissingConfigurationValueError(Exception):
     """Thrown when a missing configuration value is encountered by folk."""
     pass
+
+
+class FolkRejectedDocumentsError(Exception):
+    """Thrown when a metrics db rejects some of a batch of result documents,
+    after writing all others. Writing the rejected documents again fails the
+    same way.
+
+    Parameters
+    ----------
+    docs : list of dict
+        The rejected result documents.
+    cause : Exception
+        The error the database rejected them with.
+    """
+
+    def __init__(self, docs, cause):
+        super().__init__(
+            "{} docs were rejected: {}".format(len(docs), cause))
+        self.docs = docs
+        self.cause = cause
@@ -0,0 +1,90 @@
+"""Precomputed cross validation folds."""
+
+import numpy as np
+from sklearn.model_selection import (
+    KFold,
+    StratifiedKFold,
+)
+from sklearn.utils.multiclass import type_of_target
+
+
+def fold_assignment(
+        y, n_folds, shuffle=False, random_state=None, classifier=False):
+    """Assigns each sample to a cross validation fold.
+
+    Like scikit-learn's check_cv, folds are stratified on y only if they are
+    for a classifier and y holds class labels, in which case, when shuffle
+    is False, they are identical to the folds scikit-learn uses when cross
+    validating a classifier with cv=n_folds. Otherwise, samples are split
+    into consecutive folds, as scikit-learn does for regressors.
+
+    Parameters
+    ----------
+    y : array-like
+        The target values of all samples.
+    n_folds : int
+        The number of folds.
+    shuffle : bool, optional
+        Whether to shuffle samples before splitting them into folds. Defaults
+        to False.
+    random_state : int, optional
+        Seeds the shuffling of samples. Only used if shuffle is True.
+    classifier : bool, optional
+        Whether the folds are for cross validating a classifier. Defaults to
+        False.
+
+    Returns
+    -------
+    numpy.ndarray
+        An int32 array holding the fold index of each sample.
+
+    Example
+    -------
+    >>> fold_assignment(['a', 'a', 'b', 'b'], n_folds=2, classifier=True)
+    array([0, 1, 0, 1], dtype=int32)
+    >>> fold_assignment([1, 1, 2, 2], n_folds=2)
+    array([0, 0, 1, 1], dtype=int32)
+    """
+    y = np.asarray(y)
+    if not shuffle:
+        random_state = None
+    if classifier and type_of_target(y) in ('binary', 'multiclass'):
+        splitter = StratifiedKFold(
+            n_splits=n_folds, shuffle=shuffle, random_state=random_state)
+    else:
+        splitter = KFold(
+            n_splits=n_folds, shuffle=shuffle, random_state=random_state)
+    assignment = np.empty(len(y), dtype=np.int32)
+    for fold, (_, test_ix) in enumerate(splitter.split(np.zeros(len(y)), y)):
+        assignment[test_ix] = fold
+    return assignment
+
+
+def folds_by_assignment(assignment):
+    """Returns train-test index splits by the given fold assignment.
+
+    Parameters
+    ----------
+    assignment : numpy.ndarray
+        An array holding the fold index of each sample, as returned by
+        fold_assignment.
+
+    Returns
+    -------
+    list of tuples
+        A 2-tuple of int32 train indices and int32 test indices per fold, in
+        order of fold index. Can be used as the cv parameter of scikit-learn
+        cross validation functions.
+
+    Example
+    -------
+    >>> folds = folds_by_assignment(np.array([0, 1, 0, 1]))
+    >>> folds[0]
+    (array([1, 3], dtype=int32), array([0, 2], dtype=int32))
+    """
+    assignment = np.asarray(assignment)
+    indices = np.arange(len(assignment), dtype=np.int32)
+    return [
+        (indices[assignment != fold], indices[assignment == fold])
+        for fold in range(int(assignment.max()) + 1)
+    ]
@@ -0,0 +1,215 @@
+"""Random access into parameter grids."""
+
+import itertools
+from collections.abc import Sequence
+
+
+def _product_grids(param_grid):
+    # ParameterGrid objects hold a list of dicts of string to sequence, the
+    # cartesian product of each making up the grid
+    subgrids = getattr(param_grid, 'param_grid', None)
+    if isinstance(subgrids, list) and all(
+            isinstance(subgrid, dict) for subgrid in subgrids):
+        return subgrids
+    return None
+
+
+def _subgrid_size(subgrid):
+    size = 1
+    for values in subgrid.values():
+        size *= len(values)
+    return size
+
+
+def _grid_size(param_grid):
+    """Returns the number of points in the cartesian products making up the
+    given grid, including any excluded by constraints."""
+    subgrids = _product_grids(param_grid)
+    if subgrids is not None:
+        return sum(_subgrid_size(subgrid) for subgrid in subgrids)
+    if isinstance(param_grid, Sequence):
+        return len(param_grid)
+    raise TypeError(
+        "Parameter grids of type {} do not support random access.".format(
+            type(param_grid).__name__))
+
+
+def _grid_point(param_grid, index):
+    """Decodes the index-th point of the cartesian products making up the
+    given grid, in iteration order, by mixed-radix arithmetic."""
+    subgrids = _product_grids(param_grid)
+    if subgrids is None:
+        return param_grid[index]
+    for subgrid in subgrids:
+        size = _subgrid_size(subgrid)
+        if index >= size:
+            index -= size
+            continue
+        # the last of the sorted keys varies fastest; keys are kept in
+        # iteration order, which default model ids depend on
+        items = sorted(subgrid.items())
+        digits = []
+        for key, values in reversed(items):
+            index, digit = divmod(index, len(values))
+            digits.append(digit)
+        return {
+            key: values[digit]
+            for (key, values), digit in zip(items, reversed(digits))
+        }
+    raise IndexError("Parameter grid index out of range.")
+
+
+def _bad_param_sets(param_grid):
+    # see skutil.model_selection.ConstrainedParameterGrid
+    if getattr(param_grid, 'bad_comb', None) is None:
+        return []
+    return [
+        bad_params.items()
+        for bad_grid in param_grid.bad_grids
+        for bad_params in bad_grid
+    ]
+
+
+class IndexedGrid(object):
+    """A length-aware, randomly accessible view of a parameter grid, or of
+    one of its shards.
+
+    Points of ParameterGrid-like grids, including ConstrainedParameterGrid
+    objects, are decoded from their index by mixed-radix arithmetic, in the
+    order in which the grid iterates over them, so neither the grid nor a
+    shard of it is ever materialized. Sequences of parameter dicts are
+    indexed directly.
+
+    A grid is split into n_shards contiguous, near-equal ranges of indices;
+    shards are disjoint and together cover the whole grid. Points excluded
+    by the bad combinations of a constrained grid still occupy an index,
+    and are skipped when iterating. The length of, and random access into, a
+    grid with bad combinations therefore take time linear in the size of the
+    shard; both are constant time otherwise.
+
+    Parameters
+    ----------
+    param_grid : iterable over dict of string to any
+        A ParameterGrid-like object, or a sequence of parameter dicts.
+    shard : int, optional
+        The index of the shard to view. Defaults to 0.
+    n_shards : int, optional
+        The number of shards to split the grid into. Defaults to 1.
+
+    Example
+    -------
+    >>> from sklearn.model_selection import ParameterGrid
+    >>> grid = IndexedGrid(ParameterGrid({'a': [1, 2], 'b': [3, 4, 5]}))
+    >>> len(grid)
+    6
+    >>> sorted(grid[4].items())
+    [('a', 2), ('b', 4)]
+    >>> [sorted(params.items()) for params in grid.shard(1, 2)]
+    [[('a', 2), ('b', 3)], [('a', 2), ('b', 4)], [('a', 2), ('b', 5)]]
+    """
+
+    def __init__(self, param_grid, shard=0, n_shards=1):
+        self.param_grid = param_grid
+        self._start = 0
+        self._stop = _grid_size(param_grid)
+        self._bad_param_sets = _bad_param_sets(param_grid)
+        self._len = None
+        # the (shard, n_shards) pairs this view was sharded by, in order
+        self._shard_path = []
+        self._shard_range(shard, n_shards)
+
+    def _shard_range(self, k, n):
+        if n < 1:
+            raise ValueError("The number of shards must be positive.")
+        if not 0 <= k < n:
+            raise ValueError(
+                "The shard index must be between 0 and {}.".format(n - 1))
+        size = self._stop - self._start
+        self._start, self._stop = (
+            self._start + k * size // n,
+            self._start + (k + 1) * size // n,
+        )
+        self._len = None
+        if n > 1:
+            self._shard_path.append((k, n))
+
+    def _is_excluded(self, params):
+        items = params.items()
+        return any(bad <= items for bad in self._bad_param_sets)
+
+    def __iter__(self):
+        for index in range(self._start, self._stop):
+            params = _grid_point(self.param_grid, index)
+            if not self._is_excluded(params):
+                yield params
+
+    def __len__(self):
+        if self._len is None:
+            if self._bad_param_sets:
+                self._len = sum(1 for _ in self)
+            else:
+                self._len = self._stop - self._start
+        return self._len
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError("Parameter grid index out of range.")
+        if self._bad_param_sets:
+            try:
+                return next(itertools.islice(self, index, None))
+            except StopIteration:
+                raise IndexError("Parameter grid index out of range.")
+        if index >= self._stop - self._start:
+            raise IndexError("Parameter grid index out of range.")
+        return _grid_point(self.param_grid, self._start + index)
+
+    def shard(self, k, n):
+        """Returns a view of the k-th of n shards of this grid.
+
+        Parameters
+        ----------
+        k : int
+            The index of the shard, between 0 and n - 1.
+        n : int
+            The number of shards to split this grid into.
+
+        Returns
+        -------
+        IndexedGrid
+            A view of the k-th shard.
+        """
+        return self._with_shards(self.param_grid, self._shard_path + [(k, n)])
+
+    @staticmethod
+    def _with_shards(param_grid, shard_path):
+        view = IndexedGrid(param_grid)
+        for k, n in shard_path:
+            view._shard_range(k, n)
+        return view
+
+    def partial(self, assign_grid):
+        """Returns a view of the same shard of the grid induced by the given
+        partial assignment. The underlying grid must support partial
+        assignment, like ConstrainedParameterGrid does.
+
+        Parameters
+        ----------
+        assign_grid : dict of string to object or sequence
+            A, possibly partial, assignment to the parameters of the grid.
+
+        Returns
+        -------
+        IndexedGrid
+            A view of the corresponding shard of the partial grid.
+        """
+        return self._with_shards(
+            self.param_grid.partial(assign_grid), self._shard_path)
+
+
+def as_indexed_grid(param_grid):
+    """Returns an IndexedGrid view of the given grid, unless it is one."""
+    if isinstance(param_grid, IndexedGrid):
+        return param_grid
+    return IndexedGrid(param_grid)
@@ -0,0 +1,186 @@
+"""Stable hashing of parameter assignments and datasets."""
+
+import json
+import math
+import hashlib
+
+
+# === canonical parameter encoding ===
+
+PARAMS_ID_WIDTH = 16
+
+
+def _canonical_value(val):
+    # numpy scalars and arrays are converted to native values first
+    if hasattr(val, 'tolist'):
+        val = val.tolist()
+    if val is None or isinstance(val, (bool, int, str)):
+        return val
+    if isinstance(val, float):
+        if math.isnan(val) or math.isinf(val):
+            return {'$float': repr(val)}
+        return val
+    if isinstance(val, dict):
+        return {str(key): _canonical_value(v) for key, v in val.items()}
+    if isinstance(val, (list, tuple)):
+        return [_canonical_value(v) for v in val]
+    if isinstance(val, (set, frozenset)):
+        return sorted(
+            (_canonical_value(v) for v in val), key=_canonical_dumps)
+    if hasattr(val, 'get_params'):  # scikit-learn estimators
+        return {
+            '$estimator': type(val).__name__,
+            'params': _canonical_value(val.get_params(deep=False)),
+        }
+    if isinstance(val, type) or callable(val):
+        return {'$callable': '{}.{}'.format(
+            getattr(val, '__module__', ''),
+            getattr(val, '__qualname__', repr(val)))}
+    return {'$repr': repr(val)}
+
+
+def _canonical_dumps(val):
+    return json.dumps(
+        val, sort_keys=True, separators=(',', ':'), allow_nan=False)
+
+
+def canonical_params(params):
+    """Returns a canonical string encoding of the given parameter assignment.
+
+    The encoding does not depend on the order of keys, and values are
+    normalized by type: numpy scalars and arrays are encoded as the
+    equivalent native values, tuples as lists, sets as sorted lists, floats
+    by their shortest round-tripping representation, estimators by their
+    class and parameters and callables by their qualified name. Integers and
+    floats are not merged, as 1 and 1.0 often mean different things to
+    estimators.
+
+    Parameters
+    ----------
+    params : dict of string to any
+        A parameter assignment.
+
+    Returns
+    -------
+    str
+        A compact JSON encoding of the given assignment.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> canonical_params({'C': np.float64(0.1), 'penalty': 'l1'})
+    '{"C":0.1,"penalty":"l1"}'
+    >>> canonical_params({'penalty': 'l1', 'C': 0.1})
+    '{"C":0.1,"penalty":"l1"}'
+    """
+    return _canonical_dumps(_canonical_value(params))
+
+
+def params_digest(params):
+    """Returns a stable digest string of the given parameter assignment.
+
+    The digest is a SHA-1 hex digest of the canonical encoding of the
+    assignment; see canonical_params. It identifies pipeline configurations,
+    transform cache entries and work queue tasks.
+
+    Parameters
+    ----------
+    params : dict of string to any
+        A parameter assignment.
+
+    Returns
+    -------
+    str
+        A hex digest that does not depend on the order of keys in params, or
+        on the types values are normalized by.
+
+    Example
+    -------
+    >>> import numpy as np
+    >>> params_digest({'a': 1, 'b': 'x'}) == params_digest({'b': 'x', 'a': 1})
+    True
+    >>> params_digest({'C': np.float64(0.1)}) == params_digest({'C': 0.1})
+    True
+    """
+    return hashlib.sha1(canonical_params(params).encode('utf-8')).hexdigest()
+
+
+def params_id(params):
+    """Returns a fixed-width identifier of the given parameter assignment.
+
+    The identifier is the first PARAMS_ID_WIDTH hex digits of a BLAKE2b
+    digest of the canonical encoding of the assignment; see
+    canonical_params.
+
+    Parameters
+    ----------
+    params : dict of string to any
+        A parameter assignment.
+
+    Returns
+    -------
+    str
+        A hex digest of the given assignment.
+
+    Example
+    -------
+    >>> params_id({'C': 0.1, 'penalty': 'l1'})
+    'fa85f1c7412ffac1'
+    >>> params_id({'C': 1}) == params_id({'C': 1.0})
+    False
+    """
+    return hashlib.blake2b(
+        canonical_params(params).encode('utf-8'),
+        digest_size=PARAMS_ID_WIDTH // 2,
+    ).hexdigest()
+
+
+def params_label(params):
+    """Returns a human-readable, canonical label of the given parameter
+    assignment.
+
+    Parameters
+    ----------
+    params : dict of string to any
+        A parameter assignment.
+
+    Returns
+    -------
+    str
+        Comma-separated key=value pairs, sorted by key.
+
+    Example
+    -------
+    >>> params_label({'penalty': 'l1', 'C': 0.1, 'classes': (1, 2)})
+    'C=0.1,classes=[1,2],penalty=l1'
+    """
+    canonical = _canonical_value(params)
+    return ','.join(
+        '{}={}'.format(
+            key, val if isinstance(val, str) else _canonical_dumps(val))
+        for key, val in sorted(canonical.items())
+    )
+
+
+def df_fingerprint(df):
+    """Returns a fingerprint string of the contents of the given dataframe.
+
+    The fingerprint is determined by the columns, dtypes, index and values of
+    the given dataframe.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataframe to fingerprint.
+
+    Returns
+    -------
+    str
+        A hex digest of the given dataframe.
+    """
+    import pandas as pd
+    hasher = hashlib.sha1()
+    hasher.update(repr(list(df.columns)).encode('utf-8'))
+    hasher.update(repr(list(df.dtypes.astype(str))).encode('utf-8'))
+    hasher.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return hasher.hexdigest()
@@ -0,0 +1,362 @@
+"""Hooks into the evaluation loop of folk."""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+from importlib import import_module
+
+from .hashing import params_digest
+from .metricsdb import MetricKey
+
+
+class Event(object):
+    """The events emitted during evaluation.
+
+    Every event is emitted with a payload dict, which always holds the time
+    of emission, under 'time', and the id of the run, under 'run_id'. Other
+    payload entries, by event:
+
+    RUN_START, RUN_END
+        'error' (RUN_END only): the exception that ended the run, or None.
+    PIPELINE_START, PIPELINE_END
+        'pipe_id', 'params': the id and parameters of the pipeline
+        configuration; 'n_models' (PIPELINE_START only): the number of model
+        configurations to evaluate on it.
+    MODEL_START, MODEL_END
+        'pipe_id', 'model_id', 'params': the ids of the pipeline and model
+        configurations, and their parameters; 'res_doc' (MODEL_END only):
+        the result document of the experiment.
+    FOLD_END
+        'pipe_id', 'model_id', 'fold': the index of the fold; 'fit_time',
+        'score_time': its fit and score times, in seconds; 'scores': a dict
+        mapping scoring metrics to the scores of the fold.
+    DB_WRITE
+        'db_name': the name of the metrics db; 'res_doc': the result document
+        handed to it.
+    """
+
+    RUN_START = 'run_start'
+    RUN_END = 'run_end'
+    PIPELINE_START = 'pipeline_start'
+    PIPELINE_END = 'pipeline_end'
+    MODEL_START = 'model_start'
+    MODEL_END = 'model_end'
+    FOLD_END = 'fold_end'
+    DB_WRITE = 'db_write'
+
+
+_GLOBAL_LISTENERS = []
+
+
+def register_listener(listener):
+    """Registers a listener to the events of all subsequent evaluation runs.
+
+    Parameters
+    ----------
+    listener : EvaluationListener
+        Any object with a handle(event, payload) method.
+    """
+    _GLOBAL_LISTENERS.append(listener)
+
+
+def unregister_listener(listener):
+    """Unregisters a listener registered with register_listener."""
+    _GLOBAL_LISTENERS.remove(listener)
+
+
+class EventBus(object):
+    """Dispatches evaluation events to listeners.
+
+    A bus without listeners is falsy, so call sites can skip building event
+    payloads altogether when no one is listening.
+
+    Parameters
+    ----------
+    listeners : iterable over EvaluationListener, optional
+        Listeners to events of this bus, in addition to all globally
+        registered ones.
+    """
+
+    def __init__(self, listeners=None):
+        self.listeners = list(_GLOBAL_LISTENERS)
+        if listeners:
+            self.listeners.extend(listeners)
+
+    def __bool__(self):
+        return bool(self.listeners)
+
+    def emit(self, event, **payload):
+        """Emits the given event, with the given payload, to all listeners.
+        """
+        if not self.listeners:
+            return
+        payload['time'] = time.time()
+        for listener in self.listeners:
+            listener.handle(event, payload)
+
+
+# === listeners ===
+
+class EvaluationListener(object):
+    """A base class for listeners to evaluation events.
+
+    Events are dispatched to methods named 'on_<event>', like on_model_start,
+    which receive the event payload; see Event. Events without a matching
+    method are ignored.
+
+    Events are always emitted in the process and thread that started the
+    evaluation run. With the 'thread' and 'process' executors, model start
+    events are emitted when an experiment is submitted to the pool, and model
+    end and fold end events when its result is received. The points of a
+    regularization path are evaluated together, so model start events are
+    emitted for all of them before any of their model end events.
+    """
+
+    def handle(self, event, payload):
+        method = getattr(self, 'on_' + event, None)
+        if method is not None:
+            method(payload)
+
+
+def _experiment_file_stem(payload):
+    # experiment parameters include the rung of successive halving
+    return '{}_{}'.format(
+        payload['run_id'], params_digest(payload['params'])[:16])
+
+
+class ProfilingListener(EvaluationListener):
+    """Profiles every experiment with cProfile, and optionally takes a
+    tracemalloc snapshot at its end.
+
+    A .prof file, readable by pstats, and optionally a .snapshot file,
+    readable by tracemalloc.Snapshot.load, are dumped into the output
+    directory per experiment. Experiments evaluated together, like the
+    points of a regularization path, all start before any of them ends;
+    they share a single profile, which is dumped as it stands when each of
+    them ends. Only meaningful with the 'serial' executor.
+
+    Parameters
+    ----------
+    out_dir : str
+        The directory to dump profiles into. Created if missing.
+    trace_memory : bool, optional
+        If set to True, memory allocations are traced with tracemalloc
+        during every experiment, and a snapshot is dumped at its end.
+        Defaults to False.
+    """
+
+    def __init__(self, out_dir, trace_memory=False):
+        self.out_dir = out_dir
+        self.trace_memory = trace_memory
+        self._profile = None
+        self._n_running = 0
+        self._started_tracing = False
+        os.makedirs(out_dir, exist_ok=True)
+
+    def on_model_start(self, payload):
+        self._n_running += 1
+        if self._profile is not None:
+            return
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def on_model_end(self, payload):
+        if self._profile is None:
+            return
+        self._n_running = max(self._n_running - 1, 0)
+        self._profile.disable()
+        stem = os.path.join(self.out_dir, _experiment_file_stem(payload))
+        self._profile.dump_stats(stem + '.prof')
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(stem + '.snapshot')
+        if self._n_running:
+            self._profile.enable()
+            return
+        self._profile = None
+        if self._started_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_tracing = False
+
+
+class SpanFileListener(EvaluationListener):
+    """Exports runs, pipelines, experiments and folds as spans to a local
+    JSON-lines file.
+
+    Every line is a span, modelled after OpenTelemetry spans, with the keys
+    'trace_id' (the run id), 'span_id', 'parent_id', 'name', 'start' and
+    'end' (epoch seconds) and 'attributes'. Spans are written when they end.
+    Fold spans are laid out back to back, starting at the start of their
+    experiment, by their fit and score times. Writes to the metrics db are
+    recorded as events of the span of their experiment's pipeline.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file to append spans to.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open = {}
+        self._next_id = 0
+
+    def _span_id(self):
+        self._next_id += 1
+        return '{:016x}'.format(self._next_id)
+
+    def _start(self, key, parent_key, name, payload, attributes):
+        parent = self._open.get(parent_key)
+        self._open[key] = {
+            'trace_id': payload['run_id'],
+            'span_id': self._span_id(),
+            'parent_id': parent['span_id'] if parent else None,
+            'name': name,
+            'start': payload['time'],
+            'end': None,
+            'attributes': attributes,
+            'events': [],
+        }
+
+    def _end(self, key, payload, attributes=None):
+        span = self._open.pop(key, None)
+        if span is None:
+            return
+        span['end'] = payload['time']
+        if attributes:
+            span['attributes'].update(attributes)
+        self._write([span])
+
+    def _write(self, spans):
+        with open(self.path, 'a') as f:
+            for span in spans:
+                f.write(json.dumps(span, default=repr) + '\n')
+
+    def handle(self, event, payload):
+        with self._lock:
+            super().handle(event, payload)
+
+    def on_run_start(self, payload):
+        self._start('run', None, 'run', payload, {})
+
+    def on_run_end(self, payload):
+        error = payload.get('error')
+        self._end('run', payload, {'error': repr(error) if error else None})
+
+    def on_pipeline_start(self, payload):
+        self._start(
+            ('pipe', payload['pipe_id']), 'run', 'pipeline', payload,
+            {'params': payload['params'], 'n_models': payload['n_models']})
+
+    def on_pipeline_end(self, payload):
+        self._end(('pipe', payload['pipe_id']), payload)
+
+    def on_model_start(self, payload):
+        self._start(
+            ('model', payload['pipe_id'], payload['model_id']),
+            ('pipe', payload['pipe_id']), 'experiment', payload,
+            {'model_id': payload['model_id'], 'params': payload['params']})
+
+    def on_fold_end(self, payload):
+        model_span = self._open.get(
+            ('model', payload['pipe_id'], payload['model_id']))
+        if model_span is None:
+            return
+        # folds are assumed to run one after the other
+        start = model_span.setdefault('_fold_start', model_span['start'])
+        end = start + payload['fit_time'] + payload['score_time']
+        model_span['_fold_start'] = end
+        self._write([{
+            'trace_id': payload['run_id'],
+            'span_id': self._span_id(),
+            'parent_id': model_span['span_id'],
+            'name': 'fold',
+            'start': start,
+            'end': end,
+            'attributes': {
+                'fold': payload['fold'],
+                'fit_time': payload['fit_time'],
+                'score_time': payload['score_time'],
+                'scores': payload['scores'],
+            },
+            'events': [],
+        }])
+
+    def on_model_end(self, payload):
+        key = ('model', payload['pipe_id'], payload['model_id'])
+        span = self._open.get(key)
+        if span is not None:
+            span.pop('_fold_start', None)
+        self._end(key, payload)
+
+    def on_db_write(self, payload):
+        res_doc = payload['res_doc']
+        pipe_span = self._open.get(('pipe', res_doc.get(MetricKey.PIPE_ID)))
+        if pipe_span is not None:
+            pipe_span['events'].append({
+                'name': 'db_write',
+                'time': payload['time'],
+                'attributes': {
+                    'db_name': payload['db_name'],
+                    'model_id': res_doc.get(MetricKey.MODEL_ID),
+                },
+            })
+
+
+class ProgressListener(EvaluationListener):
+    """Reports the progress of evaluation runs.
+
+    Uses a tqdm progress bar if tqdm is installed, and prints a line per
+    evaluated experiment otherwise. The total number of experiments grows as
+    pipeline configurations are reached.
+
+    Parameters
+    ----------
+    stream : file-like, optional
+        The stream to report progress to. Defaults to sys.stderr.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._bar = None
+        self._total = 0
+        self._done = 0
+
+    def _out(self):
+        return self.stream if self.stream is not None else sys.stderr
+
+    def on_run_start(self, payload):
+        self._total = 0
+        self._done = 0
+        try:
+            tqdm = import_module('tqdm')
+        except ImportError:
+            self._bar = None
+            return
+        self._bar = tqdm.tqdm(total=0, unit='model', file=self._out())
+
+    def on_pipeline_start(self, payload):
+        self._total += payload['n_models']
+        if self._bar is not None:
+            self._bar.total = self._total
+            self._bar.refresh()
+
+    def on_model_end(self, payload):
+        self._done += 1
+        if self._bar is not None:
+            self._bar.update(1)
+        else:
+            print("{}/{} models evaluated".format(
+                self._done, self._total), file=self._out())
+
+    def on_run_end(self, payload):
+        if self._bar is not None:
+            self._bar.close()
+            self._bar = None
@@ -1,7 +1,14 @@
 """Metric databases for folk."""
 
+import os
 import abc
+import json
+import time
+import queue
+import atexit
+import weakref
 import warnings
+import threading
 from datetime import datetime
 from importlib import import_module
 
@@ -14,29 +21,322 @@ from .cfg import (
 )
 from .exceptions import (
     FolkMissingConfigurationValueError,
+    FolkRejectedDocumentsError,
 )
 
 
 class MetricKey(object):
     # folk-specific parameters
     MODEL_ID = 'model_identifier'
+    MODEL_LABEL = 'model_label'
+    PIPE_ID = 'pipeline_identifier'
     RUN_ID = 'run_id'
     RUN_AT = 'run_at'
+    RUNG = 'rung'
     # general ML parameters
     LBL_COL = 'lbl_col'
     DATASET_SIZE = 'dataset_size'
+    DATASET_FINGERPRINT = 'dataset_fingerprint'
     N_FOLDS = 'n_folds'
+    FOLDS_KEY = 'folds_key'
     N_JOBS = 'n_jobs'
+    N_EPOCHS = 'n_epochs'
+    N_CHUNKS = 'n_chunks'
+    N_WORKERS = 'n_workers'
+    N_THREADS = 'n_threads'
+    CPU_BUDGET = 'cpu_budget'
     N_CLASS = 'n_classes'
     ACC_MEAN = 'accuracy_mean'
     ACC_STD = 'accuracy_std'
     FOLD_TIME = 'fold_time'
     CROSS_VAL_TIME = 'cv_time'
+    # instrumentation
+    FIT_TIME = 'fit_time'
+    SCORE_TIME = 'score_time'
+    FOLD_FIT_TIMES = 'fold_fit_times'
+    FOLD_SCORE_TIMES = 'fold_score_times'
+    MODEL_BUILD_TIME = 'model_build_time'
+    PIPE_TIME = 'pipe_time'
+    PIPE_STAGES = 'pipe_stages'
+    # stored arrays
+    OOF_KEY = 'oof_key'
+    OOF_KIND = 'oof_kind'
+    LABELS_KEY = 'labels_key'
+    METRICS = 'metrics'
+    FOLD_SCORES_KEY = 'fold_scores_key'
+
+    @classmethod
+    def all_keys(cls):
+        """Returns a list of all folk metric keys."""
+        return [
+            val for attr, val in vars(cls).items()
+            if attr.isupper() and isinstance(val, str)
+        ]
+
+    @staticmethod
+    def mean_key(metric):
+        """Returns the key of the mean score of the given metric.
+
+        >>> MetricKey.mean_key('accuracy') == MetricKey.ACC_MEAN
+        True
+        """
+        return '{}_mean'.format(metric)
+
+    @staticmethod
+    def std_key(metric):
+        """Returns the key of the standard deviation of the given metric."""
+        return '{}_std'.format(metric)
+
+
+# indexes backing resumption and the most common queries over results, by
+# name suffix; see FolkMetricsMongoDB.ensure_indexes
+_RESULT_INDEXES = [
+    ('run_model', [(MetricKey.RUN_ID, 1), (MetricKey.MODEL_ID, 1)]),
+    ('run_at', [(MetricKey.RUN_AT, -1)]),
+]
+
+
+def _score_indexes(score_key):
+    """Returns the indexes ranking the results of a run by score_key, with
+    and without the label column in between, by name suffix.
+
+    >>> [suffix for suffix, _ in _score_indexes('f1_mean')]
+    ['run_score_f1_mean', 'run_lbl_score_f1_mean']
+    """
+    # indexes on the mean accuracy keep the names they were created with
+    suffix = '' if score_key == MetricKey.ACC_MEAN else '_' + score_key
+    return [
+        ('run_score' + suffix, [(MetricKey.RUN_ID, 1), (score_key, -1)]),
+        ('run_lbl_score' + suffix, [
+            (MetricKey.RUN_ID, 1), (MetricKey.LBL_COL, 1), (score_key, -1)]),
+    ]
+
+
+def _with_run_id(query, run_id):
+    query = dict(query or {})
+    if run_id is not None:
+        query[MetricKey.RUN_ID] = run_id
+    return query
+
+
+def _sort_spec(sort):
+    """Normalizes a sort specification into a list of (key, direction)
+    pairs.
+
+    >>> _sort_spec('a')
+    [('a', 1)]
+    >>> _sort_spec([('a', -1), 'b'])
+    [('a', -1), ('b', 1)]
+    """
+    if sort is None:
+        return []
+    if isinstance(sort, str):
+        sort = [sort]
+    return [
+        (key, 1) if isinstance(key, str) else (key[0], int(key[1]))
+        for key in sort
+    ]
+
+
+def _empty_frame(columns):
+    import pandas as pd
+    return pd.DataFrame(columns=columns)
+
+
+def _missing_values(dtype, n):
+    """Returns an array of n missing values that fits the given dtype, and
+    the dtype of the returned array."""
+    import numpy as np
+    if dtype.kind in 'fc':
+        return np.full(n, np.nan, dtype=dtype), dtype
+    if dtype.kind in 'mM':
+        return np.full(n, 'NaT', dtype=dtype), dtype
+    return np.full(n, None, dtype=object), np.dtype(object)
+
+
+def _merged_dtype(dtype, other):
+    import numpy as np
+    if dtype == other:
+        return dtype
+    if dtype.kind in 'biuf' and other.kind in 'biuf':
+        return np.result_type(dtype, other)
+    return np.dtype(object)
+
+
+class _FrameAssembler(object):
+    """Assembles DataFrame chunks into a single frame by filling
+    preallocated column arrays, rather than concatenating chunks.
+
+    Arrays are allocated for n_rows rows when the first chunk arrives, and
+    grown geometrically if more rows arrive. Columns missing from some
+    chunks are filled with missing values; columns whose dtype differs
+    between chunks are upcast.
+    """
+
+    def __init__(self, n_rows=None, columns=None):
+        self.capacity = n_rows or 0
+        self.columns = list(columns) if columns is not None else []
+        self.arrays = {}
+        self.n_rows = 0
+
+    def _ensure_capacity(self, n_rows):
+        import numpy as np
+        if n_rows <= self.capacity:
+            return
+        self.capacity = max(n_rows, 2 * self.capacity)
+        for col, arr in self.arrays.items():
+            grown = np.empty(self.capacity, dtype=arr.dtype)
+            grown[:self.n_rows] = arr[:self.n_rows]
+            self.arrays[col] = grown
+
+    def _column_array(self, col, dtype):
+        import numpy as np
+        arr = self.arrays.get(col)
+        if arr is None:
+            if self.n_rows:
+                # rows added before the first chunk with this column miss it
+                missing, dtype = _missing_values(dtype, self.n_rows)
+            arr = np.empty(self.capacity, dtype=dtype)
+            if self.n_rows:
+                arr[:self.n_rows] = missing
+        elif _merged_dtype(arr.dtype, dtype) != arr.dtype:
+            arr = arr.astype(_merged_dtype(arr.dtype, dtype))
+        self.arrays[col] = arr
+        if col not in self.columns:
+            self.columns.append(col)
+        return arr
+
+    def add(self, frame):
+        import numpy as np
+        n = len(frame)
+        self._ensure_capacity(self.n_rows + n)
+        stop = self.n_rows + n
+        for col in frame.columns:
+            values = frame[col].to_numpy()
+            if not isinstance(values.dtype, np.dtype):
+                values = values.astype(object)
+            arr = self._column_array(col, values.dtype)
+            arr[self.n_rows:stop] = values
+        for col, arr in list(self.arrays.items()):
+            if col not in frame.columns:
+                missing, dtype = _missing_values(arr.dtype, n)
+                if dtype != arr.dtype:
+                    arr = self.arrays[col] = arr.astype(dtype)
+                arr[self.n_rows:stop] = missing
+        self.n_rows = stop
+
+    def frame(self):
+        import pandas as pd
+        if not self.arrays:
+            return _empty_frame(self.columns or None)
+        return pd.DataFrame({
+            col: self.arrays[col][:self.n_rows]
+            if col in self.arrays else [None] * self.n_rows
+            for col in self.columns
+        }, columns=self.columns)
+
+
+def _concat_frames(frames, columns, n_rows=None):
+    assembler = _FrameAssembler(n_rows=n_rows, columns=columns)
+    for frame in frames:
+        assembler.add(frame)
+    return assembler.frame()
+
+
+def _convert_frame(frame):
+    """Converts result columns to their natural dtypes, a column at a time.
+    """
+    import pandas as pd
+    run_at = frame.get(MetricKey.RUN_AT)
+    if run_at is not None and run_at.dtype.kind != 'M':
+        frame[MetricKey.RUN_AT] = pd.to_datetime(run_at, errors='coerce')
+    return frame
+
+
+def _doc_frames(docs, columns, chunk_size):
+    """Iterates over DataFrames of chunk_size documents each, built column
+    by column."""
+    import pandas as pd
+    chunk = []
+    for doc in docs:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield _docs_frame(pd, chunk, columns)
+            chunk = []
+    if chunk:
+        yield _docs_frame(pd, chunk, columns)
+
+
+def _docs_frame(pd, docs, columns):
+    if columns is None:
+        columns = list(dict.fromkeys(key for doc in docs for key in doc))
+    return pd.DataFrame(
+        {key: [doc.get(key) for doc in docs] for key in columns},
+        columns=columns,
+    )
 
 
 class FolkMetricsDB(object, metaclass=abc.ABCMeta):
+    """A folk metrics database.
+
+    Experiment result documents written to a folk metrics database are
+    buffered in memory and written to the underlying database in batches.
+    The buffer is flushed whenever it holds buffer_size documents, on the
+    first write after flush_interval seconds have passed since the last
+    flush, when flush() is called explicitly, when a with block using the
+    database exits and at interpreter exit. No timer flushes the buffer, so
+    documents written by a process that then stays idle remain buffered
+    until one of these happens; folk's evaluation functions flush the
+    databases they write to before returning.
+
+    Parameters
+    ----------
+    buffer_size : int, optional
+        The number of buffered documents triggering a flush. Defaults to 100.
+        Set to 1 to write every document immediately.
+    flush_interval : float, optional
+        The number of seconds after which buffered documents are flushed on
+        the next write; it is not checked between writes. Defaults to 10.
+    """
+
+    DEF_BUFFER_SIZE = 100
+    DEF_FLUSH_INTERVAL = 10
+    DEF_CHUNK_SIZE = 10000
+    DEF_METRIC = 'accuracy'
+
+    def __init__(self, buffer_size=None, flush_interval=None):
+        if buffer_size is None:
+            buffer_size = FolkMetricsDB.DEF_BUFFER_SIZE
+        if flush_interval is None:
+            flush_interval = FolkMetricsDB.DEF_FLUSH_INTERVAL
+        self.buffer_size = int(buffer_size)
+        self.flush_interval = float(flush_interval)
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._last_flush = time.time()
+        self._writer = None
+        # score keys ranked by indexes, which are created on first use
+        self._score_keys = {MetricKey.ACC_MEAN}
+        _LIVE_DBS.add(self)
+
     @abc.abstractmethod
-    def write_experiment_res(self, run_id=None, **kwargs):
+    def _write_docs(self, docs):
+        """Writes the given result documents to the database in one batch.
+
+        Parameters
+        ----------
+        docs : list of dict
+            Experiment result documents.
+
+        Raises
+        ------
+        FolkRejectedDocumentsError
+            If the database rejected some of the documents, after writing
+            all others.
+        """
+        pass  # pragma: no cover
+
+    def write_experiment_res(self, res_doc, run_id=None):
         """Writes the result of a single experiment to the database.
 
         Parameters
@@ -46,7 +346,325 @@ class FolkMetricsDB(object, metaclass=abc.ABCMeta):
         run_id : str, optional
             A string identifier for the run this experiment is part of.
         """
-        pass  # pragma: no cover
+        run_at = datetime.utcnow()
+        if run_id is None:
+            run_id = str(run_at.timestamp()).replace('.', '')
+        doc = {
+            MetricKey.RUN_ID: run_id,
+            MetricKey.RUN_AT: run_at,
+            **res_doc,
+        }
+        with self._buffer_lock:
+            self._buffer.append(doc)
+            flush_due = len(self._buffer) >= self.buffer_size or (
+                time.time() - self._last_flush >= self.flush_interval)
+        if flush_due:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered result documents to the database.
+
+        If a background writer was started for this database, the documents
+        are handed to it instead, and this call only blocks if its queue is
+        full.
+        """
+        with self._buffer_lock:
+            docs = self._buffer
+            self._buffer = []
+            self._last_flush = time.time()
+        if not docs:
+            return
+        if self._writer is not None:
+            self._writer.put_many(docs)
+            return
+        try:
+            self._write_docs(docs)
+        except FolkRejectedDocumentsError as e:
+            # all other documents were written, and rejected ones would
+            # block every later flush attempt
+            warnings.warn(
+                "Folk: Dropped {} docs rejected by metrics db: {}".format(
+                    len(e.docs), e.cause))
+        except Exception:
+            # keep unwritten documents for the next flush attempt
+            with self._buffer_lock:
+                self._buffer = docs + self._buffer
+            raise
+
+    def completed_experiment_keys(self, run_id):
+        """Returns the keys of all experiments recorded for the given run.
+
+        Buffered documents are flushed first. Databases with an active
+        background writer are waited on until all queued documents were
+        written.
+
+        Parameters
+        ----------
+        run_id : str
+            A string identifier of a run.
+
+        Returns
+        -------
+        set of tuples
+            A set of (model identifier, pipeline identifier) 2-tuples, one
+            for every experiment result recorded under the given run id.
+        """
+        self.wait()
+        return set(self._experiment_keys(run_id))
+
+    def _experiment_keys(self, run_id):
+        """Iterates over the (model identifier, pipeline identifier) pairs of
+        all result documents recorded under the given run id, using a single
+        query."""
+        raise NotImplementedError(
+            "{} does not support reading results.".format(type(self)))
+
+    def _create_indexes(self, indexes):
+        """Creates the given indexes, as (name suffix, keys) pairs, unless
+        they exist."""
+        pass
+
+    def _ensure_score_indexes(self, score_key):
+        """Creates the indexes ranking results by the given score key the
+        first time results are ranked by it."""
+        if score_key in self._score_keys:
+            return
+        self._create_indexes(_score_indexes(score_key))
+        self._score_keys.add(score_key)
+
+    def query_results(self, query=None, columns=None, sort=None, limit=None,
+                      run_id=None, chunk_size=None):
+        """Returns the result documents matching a query as a DataFrame.
+
+        Filtering, sorting, limiting and projection are all done by the
+        underlying database; results are streamed from it in chunks.
+        Buffered documents are flushed, and any background writer waited on,
+        first.
+
+        Parameters
+        ----------
+        query : dict, optional
+            A MongoDB-style query filter, mapping keys to either values or
+            dicts of operators to values. The operators $eq, $ne, $gt, $gte,
+            $lt, $lte and $in are supported by all folk metrics databases.
+            Matches all documents if not given.
+        columns : list of str, optional
+            The keys to include in the returned frame. All keys are included
+            if not given.
+        sort : str or list, optional
+            A key to sort results by in ascending order, or a list of keys
+            and/or (key, direction) pairs, where direction is 1 for ascending
+            and -1 for descending order.
+        limit : int, optional
+            The maximal number of results to return.
+        run_id : str, optional
+            If given, only results of this run are returned.
+        chunk_size : int, optional
+            The number of results streamed from the database at a time.
+            Defaults to 10000.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A frame with a row per matching result document.
+        """
+        if chunk_size is None:
+            chunk_size = FolkMetricsDB.DEF_CHUNK_SIZE
+        sort = _sort_spec(sort)
+        if sort and sort[0][0].endswith('_mean'):
+            # results are ranked by the mean score of a metric
+            self._ensure_score_indexes(sort[0][0])
+        self.wait()
+        frames = self._result_frames(
+            query=_with_run_id(query, run_id),
+            columns=columns,
+            sort=sort,
+            limit=limit,
+            chunk_size=chunk_size,
+        )
+        return _concat_frames(
+            (_convert_frame(frame) for frame in frames), columns)
+
+    def top_k(self, k, metric=None, run_id=None, group_by=None, query=None,
+              columns=None):
+        """Returns the k best results by the mean score of a metric.
+
+        Parameters
+        ----------
+        k : int
+            The number of results to return, per group if group_by is given.
+        metric : str, optional
+            The scoring metric to rank results by its mean score. Defaults to
+            'accuracy'.
+        run_id : str, optional
+            If given, only results of this run are ranked.
+        group_by : str, optional
+            If given, the k best results are returned for every distinct
+            value of this key, like MetricKey.LBL_COL. Requires MongoDB 5.2
+            or later for MongoDB-based databases.
+        query : dict, optional
+            An additional query filter; see query_results.
+        columns : list of str, optional
+            The keys to include in the returned frame. All keys are included
+            if not given.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The best results, sorted by descending mean score; sorted by
+            group first if group_by is given.
+        """
+        if metric is None:
+            metric = FolkMetricsDB.DEF_METRIC
+        score_key = MetricKey.mean_key(metric)
+        if group_by is None:
+            return self.query_results(
+                query=query, columns=columns, sort=[(score_key, -1)],
+                limit=k, run_id=run_id)
+        self._ensure_score_indexes(score_key)
+        self.wait()
+        frames = self._top_k_frames(
+            k=k,
+            score_key=score_key,
+            group_by=group_by,
+            query=_with_run_id(query, run_id),
+            columns=columns,
+            chunk_size=FolkMetricsDB.DEF_CHUNK_SIZE,
+        )
+        return _concat_frames(
+            (_convert_frame(frame) for frame in frames), columns)
+
+    def iter_results(self, run_id, columns=None, batch_size=None,
+                     query=None):
+        """Iterates over the results of a run in DataFrame chunks.
+
+        Only the requested keys are read from the database, and at most
+        batch_size result documents are held in memory at a time. The time
+        of the run is converted to datetime64 for every chunk.
+
+        Parameters
+        ----------
+        run_id : str
+            A string identifier of a run.
+        columns : list of str, optional
+            The keys to read. All keys are read if not given, in which case
+            chunks may differ in their columns.
+        batch_size : int, optional
+            The number of results in every chunk, but the last. Defaults to
+            10000.
+        query : dict, optional
+            An additional query filter; see query_results.
+
+        Yields
+        ------
+        pandas.DataFrame
+            A chunk of results, with a row per result document.
+        """
+        if batch_size is None:
+            batch_size = FolkMetricsDB.DEF_CHUNK_SIZE
+        self.wait()
+        frames = self._result_frames(
+            query=_with_run_id(query, run_id),
+            columns=columns,
+            sort=[],
+            limit=None,
+            chunk_size=batch_size,
+        )
+        for frame in frames:
+            yield _convert_frame(frame)
+
+    def to_frame(self, run_id, columns=None, batch_size=None, query=None):
+        """Loads the results of a run into a single DataFrame.
+
+        Results are counted first, and column arrays preallocated for them,
+        which chunks read by iter_results are then copied into. Peak memory
+        is thus about the size of the result frame plus a single chunk.
+
+        Parameters
+        ----------
+        run_id : str
+            A string identifier of a run.
+        columns : list of str, optional
+            The keys to read. All keys are read if not given.
+        batch_size : int, optional
+            The number of results read at a time. Defaults to 10000.
+        query : dict, optional
+            An additional query filter; see query_results.
+
+        Returns
+        -------
+        pandas.DataFrame
+            A frame with a row per result document of the run.
+        """
+        self.wait()
+        n_rows = self._count_results(_with_run_id(query, run_id))
+        frames = self.iter_results(
+            run_id, columns=columns, batch_size=batch_size, query=query)
+        return _concat_frames(frames, columns, n_rows=n_rows)
+
+    def _count_results(self, query):
+        """Returns the number of results matching a normalized query."""
+        raise NotImplementedError(
+            "{} does not support reading results.".format(type(self)))
+
+    def _result_frames(self, query, columns, sort, limit, chunk_size):
+        """Iterates over DataFrame chunks of the results of a normalized
+        query; see query_results."""
+        raise NotImplementedError(
+            "{} does not support reading results.".format(type(self)))
+
+    def _top_k_frames(self, k, score_key, group_by, query, columns,
+                      chunk_size):
+        """Iterates over DataFrame chunks of the k best results by score_key
+        per group of group_by; see top_k."""
+        raise NotImplementedError(
+            "{} does not support reading results.".format(type(self)))
+
+    def start_background_writer(self, **kwargs):
+        """Starts writing flushed documents on a background thread.
+
+        Parameters
+        ----------
+        **kwargs : extra keyword arguments
+            Passed on to the constructor of BackgroundMetricsWriter.
+
+        Returns
+        -------
+        BackgroundMetricsWriter
+            The started background writer.
+        """
+        if self._writer is None:
+            self._writer = BackgroundMetricsWriter(db=self, **kwargs)
+        return self._writer
+
+    def stop_background_writer(self):
+        """Flushes this database and waits for its background writer to write
+        all queued documents, then stops it."""
+        self.flush()
+        writer = self._writer
+        if writer is not None:
+            self._writer = None
+            writer.stop()
+
+    def wait(self):
+        """Flushes this database and, if a background writer is active, waits
+        until it has written or spilled all queued documents."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wait()
+
+
+def _is_duplicate_id_error(write_error):
+    # the document was inserted by an earlier attempt to write it
+    return write_error.get('code') == 11000 and (
+        '_id' in write_error.get('keyPattern', {})
+        or ' _id_ ' in write_error.get('errmsg', ''))
 
 
 class FolkMetricsMongoDB(FolkMetricsDB):
@@ -61,6 +679,10 @@ class FolkMetricsMongoDB(FolkMetricsDB):
         A mapping of db configuration parameters to their values.
     """
     def __init__(self, name, db_cfg):
+        super().__init__(
+            buffer_size=db_cfg.get(CfgKey.BufferSize, None),
+            flush_interval=db_cfg.get(CfgKey.FlushInterval, None),
+        )
         self.name = name
         for cfg_param in ['URI', 'DB_NAME', 'COLLECTION_NAME']:
             try:
@@ -69,6 +691,9 @@ class FolkMetricsMongoDB(FolkMetricsDB):
                 raise FolkMissingConfigurationValueError(
                     FolkMetricsMongoDB._ERR.format(cfg_param, self.name))
         self.collection = None
+        if db_cfg.get(CfgKey.BackgroundWriter, False):
+            self.start_background_writer(
+                spill_path=db_cfg.get(CfgKey.SpillPath, None))
 
     @staticmethod
     @lazy_property
@@ -83,26 +708,669 @@ class FolkMetricsMongoDB(FolkMetricsDB):
             client = MongoClient(self.uri)
             db = client[self.db_name]
             self.collection = db[self.collection_name]
+            self.ensure_indexes()
         return self.collection
 
-    def write_experiment_res(self, res_doc, run_id=None):
-        run_at = datetime.utcnow()
-        if run_id is None:
-            run_id = str(run_at.timestamp()).replace('.', '')
+    def ensure_indexes(self):
+        """Creates the indexes folk queries rely on, unless they exist.
+
+        Called on first use of the results collection. These are compound
+        indexes on the run id and the model identifier, on the run id and the
+        mean accuracy, with and without the label column in between, and an
+        index on the time of the run. Indexes ranking results by the mean
+        score of other metrics are created the first time results are ranked
+        by them.
+        """
+        self._create_indexes(
+            _RESULT_INDEXES + _score_indexes(MetricKey.ACC_MEAN))
+
+    def _create_indexes(self, indexes):
+        collection = self.get_collection()
+        for suffix, keys in indexes:
+            try:
+                # a no-op if the index already exists
+                collection.create_index(keys, name='folk_' + suffix)
+            except Exception as e:
+                warnings.warn(
+                    "Folk: Failed to create index {} on metrics db {}: {}"
+                    "".format('folk_' + suffix, self.name, e))
+
+    def _write_docs(self, docs):
+        errors = import_module('pymongo.errors')
         col_obj = self.get_collection()
-        col_obj.insert_one({
-            MetricKey.RUN_ID: run_id,
-            MetricKey.RUN_AT: run_at,
-            **res_doc,
-        })
+        try:
+            # sets the _id of all documents in place, so a batch retried
+            # after a failed write only re-inserts those that were not
+            # inserted; the others fail with a duplicate key error
+            col_obj.insert_many(docs, ordered=False)
+        except errors.BulkWriteError as e:
+            rejected = [
+                docs[err['index']]
+                for err in e.details.get('writeErrors', [])
+                if not _is_duplicate_id_error(err)
+            ]
+            if rejected:
+                raise FolkRejectedDocumentsError(rejected, e)
+
+    def _experiment_keys(self, run_id):
+        cursor = self.get_collection().find(
+            {MetricKey.RUN_ID: run_id},
+            projection={
+                '_id': False,
+                MetricKey.MODEL_ID: True,
+                MetricKey.PIPE_ID: True,
+            },
+        )
+        for doc in cursor:
+            yield doc.get(MetricKey.MODEL_ID), doc.get(MetricKey.PIPE_ID)
+
+    @staticmethod
+    def _projection(columns):
+        projection = {'_id': False}
+        if columns is not None:
+            projection.update((key, True) for key in columns)
+        return projection
+
+    def _result_frames(self, query, columns, sort, limit, chunk_size):
+        cursor = self.get_collection().find(
+            query,
+            projection=FolkMetricsMongoDB._projection(columns),
+            sort=sort or None,
+            limit=limit or 0,
+            batch_size=chunk_size,
+        )
+        return _doc_frames(cursor, columns, chunk_size)
+
+    def _count_results(self, query):
+        return self.get_collection().count_documents(query)
+
+    def _top_k_frames(self, k, score_key, group_by, query, columns,
+                      chunk_size):
+        stages = [{'$match': query}]
+        if columns is not None:
+            # keep only needed keys in the per-group arrays built below
+            stages.append({'$project': FolkMetricsMongoDB._projection(
+                list(columns) + [group_by, score_key])})
+        stages += [
+            # $topN (MongoDB 5.2+) only ever holds k documents per group,
+            # rather than all of them
+            {'$group': {'_id': '$' + group_by, 'docs': {'$topN': {
+                'n': int(k),
+                'sortBy': {score_key: -1},
+                'output': '$$ROOT',
+            }}}},
+            {'$unwind': '$docs'},
+            {'$replaceRoot': {'newRoot': '$docs'}},
+            {'$sort': {group_by: 1, score_key: -1}},
+            {'$project': FolkMetricsMongoDB._projection(columns)},
+        ]
+        cursor = self.get_collection().aggregate(
+            stages, allowDiskUse=True, batchSize=chunk_size)
+        return _doc_frames(cursor, columns, chunk_size)
+
+
+# === background writing ===
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return {'$date': obj.isoformat()}
+    if type(obj).__name__ == 'ObjectId':
+        return {'$oid': str(obj)}
+    if hasattr(obj, 'item'):  # numpy scalars
+        return obj.item()
+    return repr(obj)
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1 and '$date' in obj:
+        return datetime.fromisoformat(obj['$date'])
+    if len(obj) == 1 and '$oid' in obj:
+        return import_module('bson').ObjectId(obj['$oid'])
+    return obj
+
+
+def _spill_docs(docs, spill_path):
+    dir_path = os.path.dirname(spill_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    with open(spill_path, 'a') as f:
+        # documents keep any _id set by a failed write, so replaying them
+        # skips those that were inserted after all
+        for doc in docs:
+            f.write(json.dumps(doc, default=_json_default) + '\n')
+
+
+class BackgroundMetricsWriter(object):
+    """Writes result documents to a folk metrics database on a background
+    thread.
+
+    Documents are consumed from a bounded queue and written in batches.
+    Adding documents blocks while the queue is full. Failed writes are
+    retried with exponential backoff; batches that still fail, and documents
+    the database rejected, are appended to a local spill file, which can
+    later be replayed with replay_spill_file.
+
+    Parameters
+    ----------
+    db : FolkMetricsDB
+        The folk metrics database to write documents to.
+    max_queue_size : int, optional
+        The maximal number of queued documents. Defaults to 10000.
+    batch_size : int, optional
+        The maximal number of documents written in a single batch. Defaults
+        to 500.
+    max_retries : int, optional
+        The number of times a failed write is retried before its batch is
+        spilled. Defaults to 5.
+    backoff : float, optional
+        The number of seconds to wait before the first retry. The wait time
+        doubles on every subsequent retry. Defaults to 0.5.
+    max_backoff : float, optional
+        The maximal number of seconds to wait between retries. Defaults to 30.
+    spill_path : str, optional
+        The path of the append-only file batches that could not be written
+        are spilled to. Defaults to a file under ~/.folk/spill.
+    """
+
+    _STOP = object()
+
+    def __init__(self, db, max_queue_size=None, batch_size=None,
+                 max_retries=None, backoff=None, max_backoff=None,
+                 spill_path=None):
+        if max_queue_size is None:
+            max_queue_size = 10000
+        if batch_size is None:
+            batch_size = 500
+        if max_retries is None:
+            max_retries = 5
+        if backoff is None:
+            backoff = 0.5
+        if max_backoff is None:
+            max_backoff = 30
+        if spill_path is None:
+            spill_fname = '{}_{}.jsonl'.format(
+                getattr(db, 'name', type(db).__name__), os.getpid())
+            spill_path = os.path.join(
+                os.path.expanduser('~'), '.folk', 'spill', spill_fname)
+        self.db = db
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.spill_path = spill_path
+        self.n_spilled = 0
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name='folk-metrics-writer', daemon=True)
+        self._thread.start()
+
+    def put_many(self, docs):
+        """Queues the given documents for writing, blocking while the queue
+        is full.
+
+        Parameters
+        ----------
+        docs : list of dict
+            Experiment result documents.
+        """
+        for doc in docs:
+            self._queue.put(doc)
+
+    def join(self):
+        """Blocks until all queued documents were written or spilled."""
+        self._queue.join()
+
+    def stop(self):
+        """Writes all queued documents and stops the writer thread."""
+        self._queue.put(BackgroundMetricsWriter._STOP)
+        self._thread.join()
+
+    def _next_batch(self):
+        batch = []
+        stop = False
+        item = self._queue.get()
+        while True:
+            if item is BackgroundMetricsWriter._STOP:
+                stop = True
+            else:
+                batch.append(item)
+            if stop or len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, stop
+
+    def _write_with_retries(self, batch):
+        wait = self.backoff
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.db._write_docs(batch)
+                return
+            except FolkRejectedDocumentsError as e:
+                # all other documents were written, and rejected ones would
+                # fail again on every retry
+                batch = e.docs
+                warnings.warn((
+                    "Folk: Metrics db rejected {} docs ({}); spilling them "
+                    "to {}.").format(len(batch), e.cause, self.spill_path))
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    warnings.warn((
+                        "Folk: Failed to write {} docs to metrics db ({}); "
+                        "spilling them to {}.").format(
+                            len(batch), e, self.spill_path))
+                    break
+                time.sleep(wait)
+                wait = min(wait * 2, self.max_backoff)
+        _spill_docs(batch, self.spill_path)
+        self.n_spilled += len(batch)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            try:
+                if batch:
+                    self._write_with_retries(batch)
+            except Exception as e:  # pragma: no cover
+                warnings.warn(
+                    "Folk: Background metrics writer error: {}".format(e))
+            finally:
+                for _ in range(len(batch) + int(stop)):
+                    self._queue.task_done()
+
+
+def replay_spill_file(spill_path, db, batch_size=None):
+    """Writes all documents in a spill file to a folk metrics database.
+
+    The spill file is removed once all of its documents were written, and
+    only keeps those the database rejected otherwise. Spilled documents keep
+    the MongoDB _id of the write that failed, so those that were inserted
+    after all are not inserted twice, and a failed replay can be run again.
+
+    Parameters
+    ----------
+    spill_path : str
+        The path to a spill file written by a BackgroundMetricsWriter.
+    db : FolkMetricsDB
+        The folk metrics database to write the spilled documents to.
+    batch_size : int, optional
+        The number of documents written in each batch. Defaults to 500.
+
+    Returns
+    -------
+    int
+        The number of documents written.
+    """
+    if batch_size is None:
+        batch_size = 500
+    n_written = 0
+    rejected = []
+
+    def _write(batch):
+        try:
+            db._write_docs(batch)
+        except FolkRejectedDocumentsError as e:
+            rejected.extend(e.docs)
+            return len(batch) - len(e.docs)
+        return len(batch)
+
+    batch = []
+    with open(spill_path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            batch.append(json.loads(line, object_hook=_json_object_hook))
+            if len(batch) >= batch_size:
+                n_written += _write(batch)
+                batch = []
+    if batch:
+        n_written += _write(batch)
+    os.remove(spill_path)
+    if rejected:
+        warnings.warn((
+            "Folk: Metrics db rejected {} spilled docs; keeping them in {}."
+        ).format(len(rejected), spill_path))
+        _spill_docs(rejected, spill_path)
+    return n_written
+
+
+# all live folk metrics db objects, flushed at interpreter exit
+_LIVE_DBS = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_dbs():
+    for db_obj in list(_LIVE_DBS):
+        try:
+            db_obj.stop_background_writer()
+        except Exception as e:  # pragma: no cover
+            warnings.warn(
+                "Folk: Failed to flush metrics db at exit: {}".format(e))
+
+
+_SQL_OPS = {
+    '$eq': '=',
+    # matches rows where the key is NULL, as MongoDB does missing keys
+    '$ne': 'IS NOT',
+    '$gt': '>',
+    '$gte': '>=',
+    '$lt': '<',
+    '$lte': '<=',
+}
+
+
+def _quote_identifier(name):
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+
+def _sqlite_value(val):
+    if val is None or isinstance(val, (str, int, float, bytes)):
+        return val
+    if isinstance(val, datetime):
+        return val.isoformat(sep=' ')
+    if hasattr(val, 'item'):  # numpy scalars
+        return val.item()
+    return json.dumps(val, default=_json_default)
+
+
+class FolkMetricsSQLiteDB(FolkMetricsDB):
+    """A local, SQLite-based folk metrics database.
+
+    Result documents are stored as rows of a single table in a SQLite
+    database file in WAL mode. The table has a column for each folk metric
+    key; a column is added for any other key, like a model or pipeline
+    parameter, the first time it is written.
+
+    Parameters
+    ----------
+    db_cfg : dict
+        A mapping of db configuration parameters to their values. PATH is
+        required; TABLE_NAME defaults to 'folk_metrics'.
+    """
+
+    _ERR = "Missing config value for {} for SQLite-based {} folk metrics db."
+
+    DEF_TABLE_NAME = 'folk_metrics'
+
+    def __init__(self, name, db_cfg):
+        super().__init__(
+            buffer_size=db_cfg.get(CfgKey.BufferSize, None),
+            flush_interval=db_cfg.get(CfgKey.FlushInterval, None),
+        )
+        self.name = name
+        try:
+            self.path = os.path.expanduser(db_cfg[CfgKey.Path])
+        except KeyError:
+            raise FolkMissingConfigurationValueError(
+                FolkMetricsSQLiteDB._ERR.format(CfgKey.Path, self.name))
+        self.table_name = db_cfg.get(
+            CfgKey.TableName, FolkMetricsSQLiteDB.DEF_TABLE_NAME)
+        self._conn = None
+        self._conn_pid = None
+        self._columns = None
+        self._conn_lock = threading.RLock()
+        if db_cfg.get(CfgKey.BackgroundWriter, False):
+            self.start_background_writer(
+                spill_path=db_cfg.get(CfgKey.SpillPath, None))
+
+    def get_connection(self):
+        """Returns a connection to the underlying SQLite database, creating
+        the results table if needed."""
+        with self._conn_lock:
+            # sqlite connections must not be shared with forked processes
+            if self._conn is None or self._conn_pid != os.getpid():
+                self._connect()
+            return self._conn
+
+    def _connect(self):
+        sqlite3 = import_module('sqlite3')
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        table = _quote_identifier(self.table_name)
+        columns = ', '.join(
+            _quote_identifier(key) for key in MetricKey.all_keys())
+        conn.execute('CREATE TABLE IF NOT EXISTS {} ({})'.format(
+            table, columns))
+        self._create_indexes_on(
+            conn, _RESULT_INDEXES + _score_indexes(MetricKey.ACC_MEAN))
+        conn.commit()
+        self._refresh_columns(conn)
+        self._conn = conn
+        self._conn_pid = os.getpid()
+
+    def _create_indexes_on(self, conn, indexes):
+        table = _quote_identifier(self.table_name)
+        for suffix, keys in indexes:
+            conn.execute('CREATE INDEX IF NOT EXISTS {} ON {} ({})'.format(
+                _quote_identifier(self.table_name + '_' + suffix), table,
+                ', '.join(
+                    _quote_identifier(key) + (' DESC' if order < 0 else '')
+                    for key, order in keys)))
+
+    def _create_indexes(self, indexes):
+        with self._conn_lock:
+            conn = self.get_connection()
+            with conn:
+                self._refresh_columns(conn)
+                # scores of metrics no result was recorded for yet
+                for _, keys in indexes:
+                    for key, _ in keys:
+                        if key not in self._columns:
+                            self._add_column(conn, key)
+                self._create_indexes_on(conn, indexes)
+
+    def _refresh_columns(self, conn):
+        # other handles, possibly in other processes, add columns as well
+        self._columns = set(
+            row[1] for row in conn.execute('PRAGMA table_info({})'.format(
+                _quote_identifier(self.table_name))))
+
+    def _add_column(self, conn, key):
+        sqlite3 = import_module('sqlite3')
+        try:
+            conn.execute('ALTER TABLE {} ADD COLUMN {}'.format(
+                _quote_identifier(self.table_name), _quote_identifier(key)))
+        except sqlite3.OperationalError as e:
+            # another handle added it since columns were last read
+            if 'duplicate column' not in str(e):
+                raise
+        self._columns.add(key)
+
+    def _write_docs(self, docs):
+        keys = []
+        for doc in docs:
+            for key in doc:
+                if key != '_id' and key not in keys:
+                    keys.append(key)
+        table = _quote_identifier(self.table_name)
+        with self._conn_lock:
+            conn = self.get_connection()
+            with conn:
+                if any(key not in self._columns for key in keys):
+                    self._refresh_columns(conn)
+                for key in keys:
+                    if key not in self._columns:
+                        self._add_column(conn, key)
+                conn.executemany(
+                    'INSERT INTO {} ({}) VALUES ({})'.format(
+                        table,
+                        ', '.join(_quote_identifier(key) for key in keys),
+                        ', '.join('?' for _ in keys),
+                    ),
+                    [
+                        [_sqlite_value(doc.get(key, None)) for key in keys]
+                        for doc in docs
+                    ],
+                )
+
+    def _experiment_keys(self, run_id):
+        with self._conn_lock:
+            conn = self.get_connection()
+            self._refresh_columns(conn)
+            if MetricKey.PIPE_ID not in self._columns:
+                return []
+            return conn.execute('SELECT {}, {} FROM {} WHERE {} = ?'.format(
+                _quote_identifier(MetricKey.MODEL_ID),
+                _quote_identifier(MetricKey.PIPE_ID),
+                _quote_identifier(self.table_name),
+                _quote_identifier(MetricKey.RUN_ID),
+            ), (run_id,)).fetchall()
+
+    def _column_expr(self, key):
+        # keys never written are NULL for all rows, as they are missing from
+        # all documents
+        if key in self._columns:
+            return _quote_identifier(key)
+        return 'NULL'
+
+    def _where_clause(self, query):
+        clauses = []
+        params = []
+        for key, cond in query.items():
+            col = self._column_expr(key)
+            if not isinstance(cond, dict):
+                cond = {'$eq': cond}
+            for op, val in cond.items():
+                if op == '$in':
+                    vals = [_sqlite_value(v) for v in val]
+                    clauses.append('{} IN ({})'.format(
+                        col, ', '.join('?' for _ in vals)))
+                    params.extend(vals)
+                    continue
+                try:
+                    sql_op = _SQL_OPS[op]
+                except KeyError:
+                    raise ValueError(
+                        "Unsupported query operator {}.".format(op))
+                if val is None and op == '$eq':
+                    sql_op = 'IS'
+                clauses.append('{} {} ?'.format(col, sql_op))
+                params.append(_sqlite_value(val))
+        if not clauses:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    def _select_list(self, columns):
+        if columns is None:
+            return '*'
+        return ', '.join(
+            '{} AS {}'.format(self._column_expr(key), _quote_identifier(key))
+            for key in columns)
+
+    def _order_by_clause(self, sort):
+        if not sort:
+            return ''
+        return ' ORDER BY ' + ', '.join(
+            self._column_expr(key) + (' DESC' if direction < 0 else '')
+            for key, direction in sort)
+
+    def _frames(self, sql, params, chunk_size):
+        import pandas as pd
+        with self._conn_lock:
+            cursor = self.get_connection().execute(sql, params)
+            names = [desc[0] for desc in cursor.description]
+        while True:
+            # the connection is only locked while a chunk is fetched
+            with self._conn_lock:
+                rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=names)
+
+    def _result_frames(self, query, columns, sort, limit, chunk_size):
+        with self._conn_lock:
+            self._refresh_columns(self.get_connection())
+            where, params = self._where_clause(query)
+            sql = 'SELECT {} FROM {}{}{}'.format(
+                self._select_list(columns),
+                _quote_identifier(self.table_name),
+                where,
+                self._order_by_clause(sort),
+            )
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return self._frames(sql, params, chunk_size)
+
+    def _count_results(self, query):
+        with self._conn_lock:
+            conn = self.get_connection()
+            self._refresh_columns(conn)
+            where, params = self._where_clause(query)
+            sql = 'SELECT COUNT(*) FROM {}{}'.format(
+                _quote_identifier(self.table_name), where)
+            return conn.execute(sql, params).fetchone()[0]
+
+    def _top_k_frames(self, k, score_key, group_by, query, columns,
+                      chunk_size):
+        rank_col = _quote_identifier('_folk_rank')
+        with self._conn_lock:
+            self._refresh_columns(self.get_connection())
+            where, params = self._where_clause(query)
+            group_col = self._column_expr(group_by)
+            score_col = self._column_expr(score_key)
+            sql = (
+                'SELECT {select} FROM ('
+                'SELECT *, ROW_NUMBER() OVER ('
+                'PARTITION BY {group} ORDER BY {score} DESC) AS {rank} '
+                'FROM {table}{where}) '
+                'WHERE {rank} <= ? ORDER BY {group}, {score} DESC'
+            ).format(
+                select=self._select_list(columns),
+                group=group_col,
+                score=score_col,
+                rank=rank_col,
+                table=_quote_identifier(self.table_name),
+                where=where,
+            )
+        params.append(int(k))
+        frames = self._frames(sql, params, chunk_size)
+        if columns is not None:
+            return frames
+        return (
+            frame.drop(columns='_folk_rank') for frame in frames)
+
+    def query(self, sql, params=None):
+        """Runs the given SQL query over this database.
+
+        The results table is named by the table_name attribute of this
+        object.
+
+        Parameters
+        ----------
+        sql : str
+            An SQL query.
+        params : sequence or dict, optional
+            Parameters to bind to the query.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The query results.
+        """
+        import pandas as pd
+        with self._conn_lock:
+            return pd.read_sql_query(
+                sql, self.get_connection(), params=params)
 
 
 TYPE_TO_CLS_MAP = {
     'mongodb': FolkMetricsMongoDB,
+    'sqlite': FolkMetricsSQLiteDB,
 }
 
 
 NAME_TO_DB_MAP = {}
+_NAME_TO_DB_MAP_LOCK = threading.Lock()
+_NAME_TO_DB_MAP_POPULATED = False
 
 
 def populate_name_to_db_map():
@@ -136,7 +1404,15 @@ def populate_name_to_db_map():
         NAME_TO_DB_MAP[name] = db_instance
 
 
-populate_name_to_db_map()
+def _name_to_db_map():
+    # folk's configuration is only loaded, and db objects built, on first use
+    global _NAME_TO_DB_MAP_POPULATED
+    if not _NAME_TO_DB_MAP_POPULATED:
+        with _NAME_TO_DB_MAP_LOCK:
+            if not _NAME_TO_DB_MAP_POPULATED:
+                populate_name_to_db_map()
+                _NAME_TO_DB_MAP_POPULATED = True
+    return NAME_TO_DB_MAP
 
 
 def write_experiment_res(res_doc, db_name, run_id=None):
@@ -153,10 +1429,73 @@ def write_experiment_res(res_doc, db_name, run_id=None):
         A string identifier for the run this experiment is part of.
     """
     try:
-        db_obj = NAME_TO_DB_MAP[db_name]
+        db_obj = _name_to_db_map()[db_name]
     except KeyError:
         warnings.warn((
             "Folk: No intact configuration for db {}. "
             "Results were not written to db.").format(db_name))
         return
     db_obj.write_experiment_res(res_doc=res_doc, run_id=run_id)
+
+
+def get_metrics_db(db_name):
+    """Returns the folk metrics database object of the given name.
+
+    Parameters
+    ----------
+    db_name : str
+        The name of a folk metrics db configured for folk.
+
+    Returns
+    -------
+    FolkMetricsDB or None
+        The corresponding folk metrics database object, or None if no intact
+        configuration exists for a db of the given name.
+    """
+    return _name_to_db_map().get(db_name, None)
+
+
+def flush_metrics_db(db_name=None):
+    """Writes all buffered result documents to folk metrics databases.
+
+    Parameters
+    ----------
+    db_name : str, optional
+        The name of the folk metrics db to flush. If not given, all
+        configured folk metrics databases are flushed.
+    """
+    name_to_db_map = _name_to_db_map()
+    if db_name is None:
+        db_objs = list(name_to_db_map.values())
+    else:
+        db_objs = [name_to_db_map.get(db_name, None)]
+    for db_obj in db_objs:
+        if db_obj is not None:
+            db_obj.flush()
+
+
+def completed_experiment_keys(db_name, run_id):
+    """Returns the keys of all experiments recorded for a run in a folk
+    metrics database.
+
+    Parameters
+    ----------
+    db_name : str
+        The name of the folk metrics db to query. A db with this name must
+        be configured for folk.
+    run_id : str
+        A string identifier of a run.
+
+    Returns
+    -------
+    set of tuples
+        A set of (model identifier, pipeline identifier) 2-tuples, one for
+        every experiment result recorded under the given run id.
+    """
+    db_obj = get_metrics_db(db_name)
+    if db_obj is None:
+        warnings.warn((
+            "Folk: No intact configuration for db {}. "
+            "No completed experiments found.").format(db_name))
+        return set()
+    return db_obj.completed_experiment_keys(run_id=run_id)
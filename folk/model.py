@@ -1,5 +1,95 @@
 """Parameterized model abstraction."""
 
+import collections
+
+from .grid import as_indexed_grid
+from .hashing import (
+    params_id,
+    params_label,
+)
+
+
+def _freeze(obj):
+    """Returns a hashable representation of a parameter value or assignment.
+
+    Scalars are tagged with their type, so values that compare equal but are
+    rendered differently, like 1 and 1.0, are told apart; dict keys keep
+    their order.
+
+    >>> _freeze({'C': 1}) == _freeze({'C': 1.0})
+    False
+    >>> _freeze({'C': [1, 2]}) == _freeze({'C': [1, 2]})
+    True
+    """
+    if isinstance(obj, dict):
+        return ('dict',) + tuple(
+            (key, _freeze(val)) for key, val in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return (type(obj).__name__,) + tuple(_freeze(val) for val in obj)
+    if hasattr(obj, 'tolist'):  # numpy arrays and scalars
+        return (type(obj).__name__, _freeze(obj.tolist()))
+    try:
+        hash(obj)
+    except TypeError:
+        return ('repr', repr(obj))
+    return (type(obj), obj)
+
+
+class _LRUCache(object):
+
+    __slots__ = ['maxsize', '_data']
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+
+    def get(self, key):
+        try:
+            val = self._data[key]
+        except KeyError:
+            return None
+        self._data.move_to_end(key)
+        return val
+
+    def put(self, key, val):
+        self._data[key] = val
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class _PrototypeCloner(object):
+    """Builds estimators by cloning a prototype estimator and setting the
+    parameters it accepts.
+
+    Prototypes without nested estimators are cloned by calling their class
+    with their parameters directly, which is much cheaper than
+    sklearn.base.clone; their parameter values are shared, rather than
+    deep-copied, between clones.
+    """
+
+    def __init__(self, prototype):
+        self.prototype = prototype
+        self._cls = type(prototype)
+        self._base_params = prototype.get_params(deep=False)
+        self._param_names = frozenset(prototype.get_params(deep=True))
+        self._nested = any(
+            hasattr(val, 'get_params') for val in self._base_params.values())
+
+    def __call__(self, **kwargs):
+        params = {
+            key: val for key, val in kwargs.items()
+            if key in self._param_names
+        }
+        if not self._nested and all(
+                key in self._base_params for key in params):
+            return self._cls(**dict(self._base_params, **params))
+        from sklearn.base import clone
+        model = clone(self.prototype)
+        if params:
+            model.set_params(**params)
+        return model
+
 
 class ParameterizedModel(object):
     """A parameterized model.
@@ -12,23 +102,150 @@ class ParameterizedModel(object):
         unkown keyword arguments.
     param_grid : iterable over dict of string to any
         An iterable over parameter realizations. The ParameterGrid sklearn
-        class is a great example.
+        class is a great example. ParameterGrid-like grids and sequences of
+        parameter dicts also support len(), indexing and sharding; see
+        folk.grid.IndexedGrid.
     model_id_getter : callable, optional
         A function that returns an id string when supplied with values for its
-        required keyword arguments, ignoring any unkown keyword arguments.
+        required keyword arguments, ignoring any unkown keyword arguments. By
+        default, model ids are fixed-width digests of a canonical encoding of
+        model parameters, which do not depend on the order of parameters;
+        see folk.hashing.params_id.
+    path_param : str, optional
+        The name of a regularization path parameter, like 'C' or 'alpha',
+        which must be both a key of the parameter grid and a parameter of
+        realized estimators. If given, model configurations differing only in
+        its value are evaluated as a path: they are sorted by its value, and
+        on every cross validation fold a single estimator is fitted along
+        the path, warm-started from its fit at the previous point if it
+        supports warm_start. Every point still gets its own result document.
+    path_descending : bool, optional
+        If set to True, paths are traversed from the largest value of the
+        path parameter to the smallest. Defaults to False. Paths should go
+        from strong to weak regularization: ascending for C, descending for
+        alpha.
+
+    Model ids are memoized per parameter realization, in a cache shared by
+    all parameterized models derived from this one through partial() and
+    shard().
     """
 
+    MODEL_ID_CACHE_SIZE = 2 ** 16
+
     @staticmethod
     def _default_model_id_getter(**kwargs):
-        param_strings = ['{}={}'.format(key, kwargs[key]) for key in kwargs]
-        return '_'.join(param_strings)
+        return params_id(kwargs)
 
-    def __init__(self, model_getter, param_grid, model_id_getter=None):
+    def __init__(self, model_getter, param_grid, model_id_getter=None,
+                 path_param=None, path_descending=False):
         if model_id_getter is None:
             model_id_getter = ParameterizedModel._default_model_id_getter
         self._model_getter = model_getter
         self._param_grid = param_grid
         self._model_id_getter = model_id_getter
+        self.path_param = path_param
+        self.path_descending = bool(path_descending)
+        self._indexed_grid = None
+        self._model_id_cache = _LRUCache(
+            ParameterizedModel.MODEL_ID_CACHE_SIZE)
+
+    def _derived(self, cls, param_grid):
+        # parameterized models derived from this one share its id cache
+        pmodel = cls(
+            model_getter=self._model_getter,
+            param_grid=param_grid,
+            model_id_getter=self._model_id_getter,
+            path_param=self.path_param,
+            path_descending=self.path_descending,
+        )
+        pmodel._model_id_cache = self._model_id_cache
+        return pmodel
+
+    @classmethod
+    def from_prototype(cls, prototype, param_grid, model_id_getter=None,
+                       **kwargs):
+        """Returns a parameterized model realizing models by cloning a
+        prototype estimator, rather than by calling a getter.
+
+        Every model is a clone of the prototype - see sklearn.base.clone -
+        with the parameters of its realization that the prototype accepts set
+        on it; other parameters are ignored. This avoids repeating any
+        expensive work done by a model getter for every realization.
+
+        Parameters
+        ----------
+        prototype : sklearn.base.BaseEstimator
+            The estimator to clone.
+        param_grid : iterable over dict of string to any
+            An iterable over parameter realizations. See ParameterizedModel.
+        model_id_getter : callable, optional
+            See ParameterizedModel.
+        **kwargs : extra keyword arguments
+            Passed on to the constructor of the class, like path_param.
+
+        Returns
+        -------
+        ParameterizedModel
+            A parameterized model of the class this method is called on.
+        """
+        return cls(
+            model_getter=_PrototypeCloner(prototype),
+            param_grid=param_grid,
+            model_id_getter=model_id_getter,
+            **kwargs
+        )
+
+    def _indexed(self):
+        if self._indexed_grid is None:
+            self._indexed_grid = as_indexed_grid(self._param_grid)
+        return self._indexed_grid
+
+    def __len__(self):
+        """Returns the number of models induced by this parameterized model.
+        """
+        return len(self._indexed())
+
+    def __getitem__(self, index):
+        """Returns the realized model of the index-th parameter realization,
+        in iteration order, without iterating over the ones preceding it.
+        """
+        return self._model_getter(**self.params_by_index(index))
+
+    def params_by_index(self, index):
+        """Returns the index-th parameter realization, in iteration order.
+
+        Parameters
+        ----------
+        index : int
+            The index of the parameter realization.
+
+        Returns
+        -------
+        dict of string to any
+            The index-th parameter realization.
+        """
+        return self._indexed()[index]
+
+    def shard(self, k, n):
+        """Returns the parameterized model induced by the k-th of n disjoint,
+        contiguous shards of the parameter grid of this model.
+
+        Shards are computed by index, without iterating over the grid. See
+        folk.grid.IndexedGrid.
+
+        Parameters
+        ----------
+        k : int
+            The index of the shard, between 0 and n - 1.
+        n : int
+            The number of shards to split the parameter grid into.
+
+        Returns
+        -------
+        ParameterizedModel
+            A new parameterized model, of the same class, over the k-th shard.
+        """
+        return self._derived(type(self), self._indexed().shard(k, n))
 
     def __iter__(self):
         """Iterate on all realized models induced by this parameterized model.
@@ -53,6 +270,17 @@ class ParameterizedModel(object):
         for params in self._param_grid:
             yield self._model_getter(**params), params
 
+    def params_iter(self):
+        """Iterate on all parameter realizations of this parameterized
+        model, in the order of params_by_index, without realizing models.
+
+        Returns
+        -------
+        params : iterator over dict of string to any
+            Yields parameter realizations.
+        """
+        return iter(self._param_grid)
+
     def model_by_params(self, params):
         """Returns a realized model by the given params.
 
@@ -68,6 +296,22 @@ class ParameterizedModel(object):
         """
         return self._model_getter(**params)
 
+    def model_label_by_params(self, params):
+        """Returns a human-readable model label by the given params.
+
+        Parameters
+        ----------
+        params : dict of string to any
+            Parameter assignments by which to produce a model label.
+
+        Returns
+        -------
+        string
+            Comma-separated key=value pairs, sorted by key; see
+            folk.hashing.params_label.
+        """
+        return params_label(params)
+
     def model_id_by_params(self, params):
         """Returns a model id by the given params.
 
@@ -81,7 +325,12 @@ class ParameterizedModel(object):
         string
             A model id string.
         """
-        return self._model_id_getter(**params)
+        key = _freeze(params)
+        model_id = self._model_id_cache.get(key)
+        if model_id is None:
+            model_id = self._model_id_getter(**params)
+            self._model_id_cache.put(key, model_id)
+        return model_id
 
 
 class ConstrainedParameterizedModel(ParameterizedModel):
@@ -94,9 +343,31 @@ class ConstrainedParameterizedModel(ParameterizedModel):
         supplied with values for its required keyword arguments, ignoring any
         unkown keyword arguments.
     param_grid : skutil.model_selection.ConstrainedParameterGrid
-        A constrained grid over model parameters.
+        A constrained grid over model parameters, or a shard of one.
+    model_id_getter : callable, optional
+        See ParameterizedModel.
+    path_param : str, optional
+        See ParameterizedModel.
+    path_descending : bool, optional
+        See ParameterizedModel.
+
+    Partial parameterized models are memoized per partial assignment.
     """
 
+    PARTIAL_CACHE_SIZE = 256
+
+    def __init__(self, model_getter, param_grid, model_id_getter=None,
+                 path_param=None, path_descending=False):
+        super().__init__(
+            model_getter=model_getter,
+            param_grid=param_grid,
+            model_id_getter=model_id_getter,
+            path_param=path_param,
+            path_descending=path_descending,
+        )
+        self._partial_cache = _LRUCache(
+            ConstrainedParameterizedModel.PARTIAL_CACHE_SIZE)
+
     def partial(self, assign_grid):
         """Returns a new parameterized model by the given partial assignment.
 
@@ -109,11 +380,15 @@ class ConstrainedParameterizedModel(ParameterizedModel):
         Returns
         -------
         ConstrainedParameterizedModel
-            A new constrained parameterized model induced by the given partial
-            assignment.
+            A constrained parameterized model induced by the given partial
+            assignment. Identical assignments return the same object.
         """
-        return ConstrainedParameterizedModel(
-            model_getter=self._model_getter,
-            param_grid=self._param_grid.partial(assign_grid),
-            model_id_getter=self._model_id_getter,
-        )
+        key = _freeze(dict(sorted(assign_grid.items())))
+        pmodel = self._partial_cache.get(key)
+        if pmodel is None:
+            pmodel = self._derived(
+                ConstrainedParameterizedModel,
+                self._param_grid.partial(assign_grid),
+            )
+            self._partial_cache.put(key, pmodel)
+        return pmodel
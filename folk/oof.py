@@ -0,0 +1,290 @@
+"""Out-of-fold predictions, and metrics recomputed from them."""
+
+import numpy as np
+from sklearn.model_selection import check_cv
+from sklearn.base import is_classifier
+from sklearn.utils import _safe_indexing
+
+from .arrays import ArrayStore
+from .metricsdb import (
+    MetricKey,
+    FolkMetricsDB,
+    get_metrics_db,
+)
+
+
+class OOFKind(object):
+    """The kinds of out-of-fold predictions, by the estimator method that
+    produced them.
+
+    Class probabilities and decision values are stored as float32 arrays;
+    probability columns follow the sorted order of all class labels.
+    Predicted labels are stored as int32 indices into that order.
+    """
+
+    PROBA = 'predict_proba'
+    DECISION = 'decision_function'
+    PREDICT = 'predict'
+
+
+def explicit_folds(cv, n_folds, model, X, y):
+    """Returns the train-test splits of the given cross validation
+    specification as a list, computing them if needed."""
+    if cv is None:
+        cv = n_folds
+    if isinstance(cv, list):
+        return cv
+    return list(check_cv(cv, y, classifier=is_classifier(model)).split(X, y))
+
+
+def _fold_assignment(folds, n_samples):
+    assignment = np.full(n_samples, -1, dtype=np.int32)
+    for fold, (_, test_ix) in enumerate(folds):
+        assignment[test_ix] = fold
+    return assignment
+
+
+def _fold_predictions(estimator, X_test, classes):
+    """Returns the predictions of a fitted fold estimator and their kind."""
+    if hasattr(estimator, 'predict_proba'):
+        proba = estimator.predict_proba(X_test)
+        # classes missing from the training set of a fold get no column
+        out = np.zeros((len(proba), len(classes)), dtype=np.float32)
+        out[:, np.searchsorted(classes, estimator.classes_)] = proba
+        return out, OOFKind.PROBA
+    if hasattr(estimator, 'decision_function'):
+        decision = estimator.decision_function(X_test)
+        return np.asarray(decision, dtype=np.float32), OOFKind.DECISION
+    labels = estimator.predict(X_test)
+    return np.searchsorted(classes, labels).astype(np.int32), OOFKind.PREDICT
+
+
+def store_out_of_fold(
+        array_store, estimators, X, y, folds, metrics, fold_scores):
+    """Stores the out-of-fold predictions and per-fold scores of a cross
+    validated model in an array store.
+
+    Parameters
+    ----------
+    array_store : folk.arrays.ArrayStore
+        The array store to store arrays in.
+    estimators : list of estimators
+        The fitted estimator of every fold, in order of fold index.
+    X : array-like
+        The features of all samples.
+    y : array-like
+        The class labels of all samples.
+    folds : list of tuples
+        The (train indices, test indices) split of every fold.
+    metrics : list of str
+        The names of the metrics the model was scored by.
+    fold_scores : dict of str to list of float
+        The per-fold scores of every metric.
+
+    Returns
+    -------
+    dict
+        Result document entries holding the keys of the stored out-of-fold
+        predictions, class indices, fold assignment and fold scores.
+    """
+    y = np.asarray(y)
+    classes, labels = np.unique(y, return_inverse=True)
+    oof = None
+    kind = None
+    for estimator, (_, test_ix) in zip(estimators, folds):
+        preds, kind = _fold_predictions(
+            estimator, _safe_indexing(X, test_ix), classes)
+        if oof is None:
+            oof = np.zeros((len(y),) + preds.shape[1:], dtype=preds.dtype)
+        oof[test_ix] = preds
+    scores = np.array(
+        [fold_scores[metric] for metric in metrics], dtype=np.float64)
+    return {
+        MetricKey.OOF_KEY: array_store.put(oof),
+        MetricKey.OOF_KIND: kind,
+        MetricKey.LABELS_KEY: array_store.put(labels.astype(np.int32)),
+        MetricKey.FOLDS_KEY: array_store.put(
+            _fold_assignment(folds, len(y))),
+        MetricKey.METRICS: list(metrics),
+        MetricKey.FOLD_SCORES_KEY: array_store.put(scores),
+    }
+
+
+# === recomputing metrics ===
+
+# the functions below score stacked predictions of many experiments, of
+# shape (n_experiments, n_samples) or (n_experiments, n_samples, n_classes)
+
+def _predicted_labels(oof, kind):
+    if kind == OOFKind.PREDICT:
+        return oof
+    if oof.ndim == 3:
+        return oof.argmax(axis=-1)
+    # binary decision values
+    return (oof > 0).astype(np.int32)
+
+
+def _accuracy_losses(y, oof, kind):
+    return (_predicted_labels(oof, kind) == y).astype(np.float64)
+
+
+def _true_class_proba(y, oof, kind):
+    if kind != OOFKind.PROBA:
+        raise ValueError(
+            "Probabilistic metrics require out-of-fold probabilities.")
+    return np.take_along_axis(oof, y[None, :, None], axis=-1)[..., 0]
+
+
+def _neg_log_loss_losses(y, oof, kind):
+    proba = _true_class_proba(y, oof, kind)
+    eps = np.finfo(oof.dtype).eps
+    # as in sklearn.metrics.log_loss, rows are normalized to sum to one
+    proba = proba / oof.sum(axis=-1)
+    return np.log(np.clip(proba, eps, 1 - eps))
+
+
+def _neg_brier_score_losses(y, oof, kind):
+    if kind != OOFKind.PROBA:
+        raise ValueError(
+            "Probabilistic metrics require out-of-fold probabilities.")
+    onehot = np.arange(oof.shape[-1]) == y[:, None]
+    sq_err = ((oof - onehot) ** 2).sum(axis=-1)
+    if oof.shape[-1] == 2:
+        # scikit-learn scores binary problems by the positive class only
+        sq_err = sq_err / 2
+    return -sq_err
+
+
+# metrics that are means of per-sample scores, computed for a whole batch
+# of experiments at once from a (n_experiments, n_samples, ...) array
+_SAMPLE_METRICS = {
+    'accuracy': _accuracy_losses,
+    'neg_log_loss': _neg_log_loss_losses,
+    'neg_brier_score': _neg_brier_score_losses,
+}
+
+
+def _vectorized_fold_scores(metric, y, assignment, n_folds, oofs, kind):
+    sample_scores = _SAMPLE_METRICS[metric](y, oofs, kind)
+    fold_onehot = (
+        assignment[:, None] == np.arange(n_folds)).astype(np.float64)
+    return (sample_scores @ fold_onehot) / fold_onehot.sum(axis=0)
+
+
+def _looped_fold_scores(metric, y, assignment, n_folds, oofs):
+    test_ixs = [np.flatnonzero(assignment == fold) for fold in range(n_folds)]
+    return np.array([
+        [metric(y[test_ix], oof[test_ix]) for test_ix in test_ixs]
+        for oof in oofs
+    ])
+
+
+def _metric_name(metric):
+    if isinstance(metric, str):
+        if metric not in _SAMPLE_METRICS:
+            raise ValueError((
+                "Metric {} cannot be recomputed by name; use one of {} or a "
+                "callable.").format(metric, sorted(_SAMPLE_METRICS)))
+        return metric
+    return getattr(metric, '__name__', repr(metric))
+
+
+_RECOMPUTE_COLUMNS = [
+    MetricKey.MODEL_ID,
+    MetricKey.PIPE_ID,
+    MetricKey.RUNG,
+    MetricKey.OOF_KEY,
+    MetricKey.OOF_KIND,
+    MetricKey.LABELS_KEY,
+    MetricKey.FOLDS_KEY,
+]
+
+
+def recompute_metric(
+        run_id, metric, metric_db, array_store, query=None, batch_size=None):
+    """Scores all experiments of a run by a metric, from their stored
+    out-of-fold predictions, without fitting any model.
+
+    Only experiments evaluated with store_predictions set are scored.
+    Experiments sharing a dataset share their labels and folds, which are
+    loaded once; the predictions of up to batch_size of them are stacked and
+    scored at once for metrics that average per-sample scores.
+
+    Parameters
+    ----------
+    run_id : str
+        A string identifier of a run.
+    metric : str or callable
+        Either 'accuracy', 'neg_log_loss' or 'neg_brier_score', which are
+        scored for a batch of experiments at once, or a callable accepting
+        the true class indices and the out-of-fold predictions of a fold's
+        test samples and returning a score, called per experiment and fold.
+        Probabilities are given as an array of shape (n_samples, n_classes).
+    metric_db : str or folk.metricsdb.FolkMetricsDB
+        The metrics db, or the name of the metrics db, the run was recorded
+        in.
+    array_store : folk.arrays.ArrayStore or str
+        The array store, or the path of the array store, predictions were
+        stored in.
+    query : dict, optional
+        An additional query filter on the experiments of the run; see
+        folk.metricsdb.FolkMetricsDB.query_results.
+    batch_size : int, optional
+        The number of experiments scored at once. Defaults to 256.
+
+    Returns
+    -------
+    pandas.DataFrame
+        A frame with the model and pipeline identifiers and rung of every
+        scored experiment, the mean and standard deviation of its fold
+        scores, and its fold scores, under '<metric>_folds'.
+    """
+    import pandas as pd
+    if batch_size is None:
+        batch_size = 256
+    name = _metric_name(metric)
+    if isinstance(metric_db, str):
+        db_name = metric_db
+        metric_db = get_metrics_db(db_name)
+        if metric_db is None:
+            raise ValueError(
+                "No intact configuration for db {}.".format(db_name))
+    if not isinstance(metric_db, FolkMetricsDB):
+        raise TypeError("metric_db must be a db name or a FolkMetricsDB.")
+    if isinstance(array_store, str):
+        array_store = ArrayStore(array_store)
+    docs = metric_db.to_frame(
+        run_id, columns=_RECOMPUTE_COLUMNS, query=query)
+    docs = docs[docs[MetricKey.OOF_KEY].notnull()]
+    rows = []
+    groups = docs.groupby(
+        [MetricKey.LABELS_KEY, MetricKey.FOLDS_KEY, MetricKey.OOF_KIND],
+        sort=False)
+    for (labels_key, folds_key, kind), group in groups:
+        y = array_store.get(labels_key, mmap=False)
+        assignment = array_store.get(folds_key, mmap=False)
+        n_folds = int(assignment.max()) + 1
+        for start in range(0, len(group), batch_size):
+            batch = group.iloc[start:start + batch_size]
+            oofs = np.stack([
+                array_store.get(key) for key in batch[MetricKey.OOF_KEY]])
+            if isinstance(metric, str):
+                scores = _vectorized_fold_scores(
+                    metric, y, assignment, n_folds, oofs, kind)
+            else:
+                scores = _looped_fold_scores(
+                    metric, y, assignment, n_folds, oofs)
+            for (_, doc), fold_scores in zip(batch.iterrows(), scores):
+                rows.append({
+                    MetricKey.MODEL_ID: doc[MetricKey.MODEL_ID],
+                    MetricKey.PIPE_ID: doc[MetricKey.PIPE_ID],
+                    MetricKey.RUNG: doc[MetricKey.RUNG],
+                    MetricKey.mean_key(name): fold_scores.mean(),
+                    MetricKey.std_key(name): fold_scores.std(),
+                    '{}_folds'.format(name): fold_scores.tolist(),
+                })
+    return pd.DataFrame(rows, columns=[
+        MetricKey.MODEL_ID, MetricKey.PIPE_ID, MetricKey.RUNG,
+        MetricKey.mean_key(name), MetricKey.std_key(name),
+        '{}_folds'.format(name),
+    ])
@@ -1,5 +1,12 @@
 """Parameterized pipeline abstraction."""
 
+import time
+import pickle
+import tracemalloc
+import collections
+
+from .grid import as_indexed_grid
+
 
 class ParameterizedPipeline(object):
     """A parameterized pipeline.
@@ -15,12 +22,79 @@ class ParameterizedPipeline(object):
         unkown keyword arguments.
     param_grid : iterable over dict of string to any
         An iterable over parameter realizations. The ParameterGrid sklearn
-        class is a great example.
+        class is a great example. ParameterGrid-like grids and sequences of
+        parameter dicts also support len(), indexing and sharding; see
+        folk.grid.IndexedGrid.
+    transform_cache : folk.cache.TransformCache, optional
+        If given, dataframes transformed by pipelines induced by this
+        parameterized pipeline are cached in and loaded from this cache
+        during evaluation.
     """
 
-    def __init__(self, pipeline_getter, param_grid):
+    def __init__(self, pipeline_getter, param_grid, transform_cache=None):
         self.pipeline_getter = pipeline_getter
         self.param_grid = param_grid
+        self.transform_cache = transform_cache
+        self._indexed_grid = None
+
+    def _indexed(self):
+        indexed = self._indexed_grid
+        if indexed is None or self.param_grid not in (
+                indexed, indexed.param_grid):
+            self._indexed_grid = as_indexed_grid(self.param_grid)
+        return self._indexed_grid
+
+    def __len__(self):
+        """Returns the number of pipelines induced by this parameterized
+        pipeline."""
+        return len(self._indexed())
+
+    def __getitem__(self, index):
+        """Returns the pipeline realized by the index-th parameter
+        realization, in iteration order, without iterating over the ones
+        preceding it."""
+        return self.pipeline_getter(**self.params_by_index(index))
+
+    def params_by_index(self, index):
+        """Returns the index-th parameter realization, in iteration order.
+
+        Parameters
+        ----------
+        index : int
+            The index of the parameter realization.
+
+        Returns
+        -------
+        dict of string to any
+            The index-th parameter realization.
+        """
+        return self._indexed()[index]
+
+    def shard(self, k, n):
+        """Returns the parameterized pipeline induced by the k-th of n
+        disjoint, contiguous shards of its parameter grid.
+
+        Shards are computed by index, without iterating over the grid. See
+        folk.grid.IndexedGrid.
+
+        Parameters
+        ----------
+        k : int
+            The index of the shard, between 0 and n - 1.
+        n : int
+            The number of shards to split the parameter grid into.
+
+        Returns
+        -------
+        ParameterizedPipeline
+            A new parameterized pipeline over the k-th shard, sharing the
+            transform cache of this one.
+        """
+        return ParameterizedPipeline(
+            pipeline_getter=self.pipeline_getter,
+            param_grid=self._indexed().shard(k, n),
+            transform_cache=self.transform_cache,
+        )
 
     def __iter__(self):
         """Iterate over all pipelines induced by this parameterized pipeline.
@@ -61,3 +135,223 @@ class ParameterizedPipeline(object):
             to produce new dataframes.
         """
         return self.pipeline_getter(**params)
+
+    def shared_prefix_transform_iter(self, df, verbose=None):
+        """Iterate over all dataframes produced by applying each pipeline
+        induced by this parameterized pipeline to the given dataframe,
+        computing identical leading stage sequences only once.
+
+        See folk.pipe.shared_prefix_transform_iter for details.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            The dataframe to transform.
+        verbose : bool, optional
+            If set to True, stages are applied verbosely.
+
+        Returns
+        -------
+        transformed : iterator over tuples
+            Yields 2-tuples of a parameters dict and the dataframe produced
+            by the pipeline realized by these parameters.
+        """
+        return shared_prefix_transform_iter(
+            pipe_n_params=self.pipe_n_params_iter(),
+            df=df,
+            verbose=verbose,
+        )
+
+
+# === shared-prefix pipeline application ===
+
+def pipeline_stages(pipeline):
+    """Returns the flat sequence of stages making up the given pipeline.
+
+    Pipelines exposing their stages through a _stages attribute, like
+    pdpipe.PdPipeline objects, are flattened recursively. Any other callable
+    is considered a single opaque stage.
+
+    Parameters
+    ----------
+    pipeline : callable
+        A realized pipeline.
+
+    Returns
+    -------
+    list
+        The stages of the given pipeline, in order of application.
+    """
+    stages = getattr(pipeline, '_stages', None)
+    if stages is None:
+        return [pipeline]
+    flat = []
+    for stage in stages:
+        flat.extend(pipeline_stages(stage))
+    return flat
+
+
+def _stage_key(stage):
+    # unfitted stages with an identical configuration pickle identically;
+    # stages that cannot be pickled are never considered identical
+    try:
+        return pickle.dumps(stage)
+    except Exception:
+        return ('unpicklable', id(stage))
+
+
+class _PrefixNode(object):
+
+    __slots__ = ['stage', 'children', 'params']
+
+    def __init__(self, stage=None):
+        self.stage = stage
+        self.children = collections.OrderedDict()
+        self.params = []
+
+
+def _apply_stage(stage, df, verbose):
+    if verbose:
+        return stage.fit_transform(df, verbose=True)
+    return stage.fit_transform(df)
+
+
+# === stage profiling ===
+
+class StageStatKey(object):
+    STAGE = 'stage'
+    TIME = 'time'
+    PEAK_MEM = 'peak_mem'
+
+
+def _profile_stage(stage, df, verbose, trace_memory):
+    peak_mem = None
+    start = time.perf_counter()
+    if trace_memory:
+        # allocations are traced only while the stage is applied
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        base_mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            res_df = _apply_stage(stage, df, verbose)
+            peak_mem = max(tracemalloc.get_traced_memory()[1] - base_mem, 0)
+        finally:
+            if started:
+                tracemalloc.stop()
+    else:
+        res_df = _apply_stage(stage, df, verbose)
+    stat = {
+        StageStatKey.STAGE: type(stage).__name__,
+        StageStatKey.TIME: time.perf_counter() - start,
+        StageStatKey.PEAK_MEM: peak_mem,
+    }
+    return res_df, stat
+
+
+def profiled_fit_transform(pipeline, df, verbose=None, trace_memory=False):
+    """Applies the given pipeline to a dataframe stage by stage, measuring
+    the wall time, and optionally the peak memory, of each stage.
+
+    Parameters
+    ----------
+    pipeline : callable
+        A realized pipeline. See pipeline_stages for how it is broken into
+        stages.
+    df : pandas.DataFrame
+        The dataframe to transform.
+    verbose : bool, optional
+        If set to True, stages are applied verbosely.
+    trace_memory : bool, optional
+        If set to True, memory allocations are traced with tracemalloc while
+        each stage is applied, and the peak memory allocated by the stage
+        above what was allocated before it is measured. This slows stages
+        down considerably. Defaults to False.
+
+    Returns
+    -------
+    transformed_df : pandas.DataFrame
+        The transformed dataframe.
+    stage_stats : list of dict
+        A dict per stage, in order of application, mapping the keys of
+        StageStatKey to the name of the class of the stage, its wall time in
+        seconds and its peak memory in bytes, or None if memory was not
+        traced.
+    """
+    stage_stats = []
+    for stage in pipeline_stages(pipeline):
+        df, stat = _profile_stage(stage, df, verbose, trace_memory)
+        stage_stats.append(stat)
+    return df, stage_stats
+
+
+def _transform_prefix_tree(node, df, verbose, stats, trace_memory):
+    for params in node.params:
+        if stats is None:
+            yield params, df
+        else:
+            yield params, df, list(stats)
+    for child in node.children.values():
+        if stats is None:
+            child_df = _apply_stage(child.stage, df, verbose)
+            child_stats = None
+        else:
+            child_df, stat = _profile_stage(
+                child.stage, df, verbose, trace_memory)
+            child_stats = stats + [stat]
+        yield from _transform_prefix_tree(
+            child, child_df, verbose, child_stats, trace_memory)
+
+
+def shared_prefix_transform_iter(
+        pipe_n_params, df, verbose=None, stage_stats=False,
+        trace_memory=False):
+    """Applies the given pipelines to a dataframe, sharing common prefixes.
+
+    The given realized pipelines are broken into stages and arranged in a
+    prefix tree of identical stage sequences, so that the output of each
+    shared prefix of stages is computed only once. Two stages are identical
+    if they pickle identically before being fitted. Stages are assumed not to
+    modify their input dataframe in place.
+
+    Parameters
+    ----------
+    pipe_n_params : iterable over tuples
+        An iterable over 2-tuples of a realized pipeline and the parameters
+        dict it was realized by, like the one returned by the
+        pipe_n_params_iter method of ParameterizedPipeline.
+    df : pandas.DataFrame
+        The dataframe to transform.
+    verbose : bool, optional
+        If set to True, stages are applied verbosely.
+    stage_stats : bool, optional
+        If set to True, the wall time of each stage is measured, and the
+        stage statistics of every pipeline are yielded with its dataframe.
+        Statistics of shared stages are measured once and reported for all
+        pipelines sharing them. See profiled_fit_transform. Defaults to
+        False.
+    trace_memory : bool, optional
+        If set to True together with stage_stats, the peak memory of each
+        stage is measured as well. See profiled_fit_transform.
+
+    Returns
+    -------
+    transformed : iterator over tuples
+        Yields 2-tuples of a parameters dict and the dataframe produced by the
+        pipeline realized by these parameters, in depth-first order of the
+        prefix tree rather than in the order of the given pipelines. If
+        stage_stats is set, the stage statistics of the pipeline are yielded
+        as a third element.
+    """
+    root = _PrefixNode()
+    for pipeline, params in pipe_n_params:
+        node = root
+        for stage in pipeline_stages(pipeline):
+            key = _stage_key(stage)
+            if key not in node.children:
+                node.children[key] = _PrefixNode(stage)
+            node = node.children[key]
+        node.params.append(params)
+    return _transform_prefix_tree(
+        root, df, verbose, [] if stage_stats else None, trace_memory)
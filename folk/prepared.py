@@ -0,0 +1,177 @@
+"""Transformed datasets, prepared once for the evaluation of many models."""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+from sklearn.utils import _safe_indexing
+from sklearn.utils.multiclass import type_of_target
+
+from .hashing import df_fingerprint
+
+
+def _feature_matrix(X):
+    """Returns the given feature frame as a CSR matrix if all its columns are
+    sparse, as a C-contiguous array if all of them are numeric, and as is
+    otherwise."""
+    dtypes = list(X.dtypes)
+    if dtypes and all(isinstance(dtype, pd.SparseDtype) for dtype in dtypes):
+        return X.sparse.to_coo().tocsr()
+    if all(is_numeric_dtype(dtype) for dtype in dtypes):
+        arr = X.to_numpy()
+        # mixed boolean and numeric columns are converted to objects
+        if arr.dtype != object:
+            return np.ascontiguousarray(arr)
+    return X
+
+
+def _update_by_array(hasher, arr):
+    hasher.update(str(arr.dtype).encode('utf-8'))
+    hasher.update(repr(arr.shape).encode('utf-8'))
+    if arr.dtype == object:
+        arr = pd.util.hash_array(arr.ravel())
+    hasher.update(np.ascontiguousarray(arr).data)
+
+
+class PreparedDataset(object):
+    """The features, encoded labels and label statistics of a transformed
+    dataset, computed once and shared by all models evaluated on it.
+
+    Use prepare_dataset to build one from a dataframe.
+
+    Parameters
+    ----------
+    X : numpy.ndarray, scipy.sparse.csr_matrix or pandas.DataFrame
+        The features of all samples: a CSR matrix if all feature columns are
+        sparse, a C-contiguous array if all of them are numeric, and a
+        dataframe otherwise.
+    y : numpy.ndarray
+        The labels of all samples. Class labels are encoded as int32 indices
+        into classes; see labels for the original ones.
+    lbl_col : str
+        The label column.
+    classes : numpy.ndarray, optional
+        The sorted class labels, if labels are class labels.
+    columns : list, optional
+        The feature columns.
+    """
+
+    def __init__(self, X, y, lbl_col, classes=None, columns=None):
+        self.X = X
+        self.y = y
+        self.lbl_col = lbl_col
+        self.classes = classes
+        self.columns = columns
+        if classes is None:
+            self.class_counts = None
+            self.n_classes = len(pd.unique(y))
+        else:
+            self.class_counts = np.bincount(y, minlength=len(classes))
+            self.n_classes = int(np.count_nonzero(self.class_counts))
+        self._fingerprint = None
+
+    @property
+    def n_samples(self):
+        return len(self.y)
+
+    @property
+    def labels(self):
+        """The original labels of all samples, decoded from y. Models should
+        be fitted and scored on these, as scorers of binary classification
+        metrics depend on the positive label."""
+        if self.classes is None:
+            return self.y
+        return self.classes[self.y]
+
+    @property
+    def fingerprint(self):
+        """A hex digest of the features and labels of this dataset, computed
+        on first access."""
+        if self._fingerprint is None:
+            hasher = hashlib.sha1()
+            hasher.update(repr(self.columns).encode('utf-8'))
+            if isinstance(self.X, pd.DataFrame):
+                hasher.update(df_fingerprint(self.X).encode('utf-8'))
+            elif isinstance(self.X, np.ndarray):
+                _update_by_array(hasher, self.X)
+            else:
+                for arr in (self.X.data, self.X.indices, self.X.indptr):
+                    _update_by_array(hasher, arr)
+            _update_by_array(hasher, self.y)
+            if self.classes is not None:
+                _update_by_array(hasher, self.classes)
+            self._fingerprint = hasher.hexdigest()
+        return self._fingerprint
+
+    def take(self, indices):
+        """Returns the dataset made up of the samples at the given positions.
+
+        Parameters
+        ----------
+        indices : array-like of int
+            The positions of the samples to take.
+
+        Returns
+        -------
+        PreparedDataset
+            A new prepared dataset, sharing the classes of this one.
+        """
+        return PreparedDataset(
+            X=_safe_indexing(self.X, indices),
+            y=self.y[indices],
+            lbl_col=self.lbl_col,
+            classes=self.classes,
+            columns=self.columns,
+        )
+
+
+def prepare_dataset(df, lbl_col):
+    """Splits a transformed dataset into features and labels, once, for the
+    evaluation of many models.
+
+    Class labels - binary or multiclass targets - are encoded as int32
+    indices into their sorted values, which are compact to share with worker
+    processes and to stratify folds by; the original labels are kept as the
+    sorted classes, and can be decoded with the labels attribute.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame or PreparedDataset
+        The transformed dataset. Prepared datasets are returned as is.
+    lbl_col : str
+        The label column.
+
+    Returns
+    -------
+    PreparedDataset
+        The prepared dataset.
+
+    Example
+    -------
+    >>> df = pd.DataFrame({'a': [1, 2, 3], 'b': [.5, 0, 1], 'y': list('qpq')})
+    >>> data = prepare_dataset(df, 'y')
+    >>> data.X.flags['C_CONTIGUOUS'], data.y, data.classes
+    (True, array([1, 0, 1], dtype=int32), array(['p', 'q'], dtype=object))
+    >>> data.class_counts
+    array([1, 2])
+    """
+    if isinstance(df, PreparedDataset):
+        return df
+    columns = [col for col in df.columns if col != lbl_col]
+    y = df[lbl_col].to_numpy()
+    classes = None
+    if type_of_target(y) in ('binary', 'multiclass'):
+        codes, classes = pd.factorize(y, sort=True)
+        if (codes < 0).any():
+            raise ValueError(
+                "The label column {} has missing values.".format(lbl_col))
+        y = codes.astype(np.int32)
+        classes = np.asarray(classes)
+    return PreparedDataset(
+        X=_feature_matrix(df[columns]),
+        y=y,
+        lbl_col=lbl_col,
+        classes=classes,
+        columns=columns,
+    )
@@ -0,0 +1,72 @@
+"""Sharing numpy arrays with worker processes through memory-mapped files."""
+
+import os
+import shutil
+import tempfile
+
+
+class MemmapArrays(object):
+    """A temporary directory of numpy arrays shared through memory-mapping.
+
+    Every shared array is written to disk once; worker processes then attach
+    to it read-only by its path, so the operating system page cache backs
+    all of their views of it with the same physical memory. joblib, and thus
+    scikit-learn, also passes memory-mapped arrays to its workers by
+    reference rather than by copy.
+
+    Parameters
+    ----------
+    dir_path : str, optional
+        The directory in which the temporary directory of arrays is created.
+        Defaults to the system's default temporary directory.
+    """
+
+    def __init__(self, dir_path=None):
+        self.dir_path = tempfile.mkdtemp(prefix='folk_memmap_', dir=dir_path)
+        self._n_arrays = 0
+
+    def share(self, arr):
+        """Writes the given array to a file to be memory-mapped.
+
+        Parameters
+        ----------
+        arr : numpy.ndarray
+            The array to share. Object arrays are not supported.
+
+        Returns
+        -------
+        str
+            The path to pass to attach in order to access the array.
+        """
+        import numpy as np
+        path = os.path.join(self.dir_path, '{}.npy'.format(self._n_arrays))
+        self._n_arrays += 1
+        np.save(path, np.ascontiguousarray(arr), allow_pickle=False)
+        return path
+
+    def close(self):
+        """Removes all shared arrays."""
+        shutil.rmtree(self.dir_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def attach(path):
+    """Returns a read-only, memory-mapped view of a shared array.
+
+    Parameters
+    ----------
+    path : str
+        The path of a shared array, as returned by MemmapArrays.share.
+
+    Returns
+    -------
+    numpy.memmap
+        A read-only view of the shared array.
+    """
+    import numpy as np
+    return np.load(path, mmap_mode='r')
@@ -0,0 +1,16 @@
+"""Utilities shared by folk's modules."""
+
+
+def print_func_by_verbosity(verbose):
+    """Returns the print function if verbose is set, and a function that
+    prints nothing otherwise.
+
+    Example
+    -------
+    >>> print_func_by_verbosity(True)('hi')
+    hi
+    >>> print_func_by_verbosity(False)('hi')
+    """
+    if verbose:
+        return print
+    return lambda x: None
@@ -0,0 +1,749 @@
+"""Durable work queues distributing folk sweeps across processes and nodes.
+
+A coordinator enumerates the experiments of a sweep - pairs of a pipeline
+configuration and a model configuration - into a work queue with
+enqueue_sweep. Workers on any node then lease tasks from the queue with
+run_worker, evaluate them and acknowledge them. Leases that are not
+acknowledged in time, because a worker died or stalled, expire, and their
+tasks are leased again.
+
+Tasks are recorded by the index of their pipeline configuration in the grid
+of the parameterized pipeline, and the index of their model configuration in
+the grid of the parameterized model partially assigned by the pipeline
+configuration; see folk.grid.IndexedGrid. Coordinator and workers must thus
+construct identical parameterized pipelines and models; a digest of the
+parameters of every task is checked by workers to guarantee it.
+
+Delivery is at-least-once: a task whose lease expired while it was being
+evaluated may be evaluated again by another worker.
+"""
+
+import os
+import abc
+import time
+import socket
+import threading
+import traceback
+from importlib import import_module
+
+from sklearn.base import is_classifier
+
+from .evaluate import (
+    new_run_id,
+    eval_model_by_params,
+)
+from .folds import (
+    fold_assignment,
+    folds_by_assignment,
+)
+from .hashing import params_digest
+from .prepared import prepare_dataset
+from .metricsdb import (
+    get_metrics_db,
+    flush_metrics_db,
+)
+from .util import print_func_by_verbosity
+
+
+class TaskStatus(object):
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class Task(object):
+    """A task of a sweep, leased from a work queue.
+
+    Parameters
+    ----------
+    task_id : object
+        The id of the task in its queue.
+    run_id : str
+        The id of the run the task is part of.
+    pipe_index : int
+        The index of the pipeline configuration of the task.
+    model_index : int
+        The index of the model configuration of the task, in the grid of the
+        parameterized model partially assigned by the pipeline configuration.
+    digest : str
+        A digest of the pipeline and model parameters of the task.
+    attempts : int
+        The number of times the task was leased, including this lease.
+    """
+
+    __slots__ = [
+        'task_id', 'run_id', 'pipe_index', 'model_index', 'digest',
+        'attempts',
+    ]
+
+    def __init__(
+            self, task_id, run_id, pipe_index, model_index, digest,
+            attempts):
+        self.task_id = task_id
+        self.run_id = run_id
+        self.pipe_index = pipe_index
+        self.model_index = model_index
+        self.digest = digest
+        self.attempts = attempts
+
+    def __repr__(self):
+        return 'Task({!r}, run_id={!r}, pipe_index={}, model_index={})'.format(
+            self.task_id, self.run_id, self.pipe_index, self.model_index)
+
+
+def task_digest(pipe_params, model_params):
+    """Returns a digest of the parameters of a task."""
+    return params_digest({'pipe': pipe_params, 'model': model_params})
+
+
+class WorkQueue(object, metaclass=abc.ABCMeta):
+    """A durable queue of sweep tasks.
+
+    Parameters
+    ----------
+    lease_seconds : float, optional
+        The number of seconds a lease lasts unless renewed. Defaults to 600.
+    max_attempts : int, optional
+        The number of times a task is leased before it is marked as failed,
+        if it fails or its lease expires every time. Defaults to 3.
+    """
+
+    def __init__(self, lease_seconds=None, max_attempts=None):
+        if lease_seconds is None:
+            lease_seconds = 600
+        if max_attempts is None:
+            max_attempts = 3
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _status_after_failure(self, task):
+        if task.attempts >= self.max_attempts:
+            return TaskStatus.FAILED
+        return TaskStatus.PENDING
+
+    @abc.abstractmethod
+    def put_tasks(self, tasks):
+        """Adds the given tasks to the queue as pending tasks.
+
+        Parameters
+        ----------
+        tasks : iterable over tuples
+            An iterable over 4-tuples of run id, pipeline index, model index
+            and digest.
+        """
+        pass  # pragma: no cover
+
+    @abc.abstractmethod
+    def lease(self, worker_id, n=1, run_id=None):
+        """Leases up to n pending tasks, in the order they were added, first
+        re-queueing tasks whose leases expired.
+
+        Parameters
+        ----------
+        worker_id : str
+            The id of the leasing worker.
+        n : int, optional
+            The maximum number of tasks to lease. Defaults to 1.
+        run_id : str, optional
+            If given, only tasks of this run are leased.
+
+        Returns
+        -------
+        list of Task
+            The leased tasks; empty if no task is pending.
+        """
+        pass  # pragma: no cover
+
+    @abc.abstractmethod
+    def renew(self, tasks, worker_id):
+        """Extends the leases of the given tasks, held by the given worker,
+        by lease_seconds from now."""
+        pass  # pragma: no cover
+
+    @abc.abstractmethod
+    def ack(self, task, worker_id):
+        """Marks the given task, leased by the given worker, as done.
+
+        Returns
+        -------
+        bool
+            False if the worker no longer held the lease of the task.
+        """
+        pass  # pragma: no cover
+
+    @abc.abstractmethod
+    def fail(self, task, worker_id, error=None):
+        """Releases the given task, leased by the given worker, after its
+        evaluation failed. The task is pending again, unless it was attempted
+        max_attempts times, in which case it is marked as failed.
+
+        Returns
+        -------
+        bool
+            False if the worker no longer held the lease of the task.
+        """
+        pass  # pragma: no cover
+
+    @abc.abstractmethod
+    def status_counts(self, run_id=None):
+        """Returns a dict mapping task statuses to the number of tasks, of the
+        given run if given, in each."""
+        pass  # pragma: no cover
+
+
+# === SQLite-based queue ===
+
+class SQLiteWorkQueue(WorkQueue):
+    """A work queue stored in a SQLite database file, which can be placed on
+    storage shared by all nodes.
+
+    The database uses SQLite's default rollback journal rather than WAL
+    mode, which is not supported on network file systems. Leases are taken
+    in immediate transactions, so no two workers lease the same task.
+
+    Parameters
+    ----------
+    path : str
+        The path of the SQLite database file. Created if missing.
+    table_name : str, optional
+        The name of the tasks table. Defaults to 'folk_tasks'.
+    lease_seconds : float, optional
+        See WorkQueue.
+    max_attempts : int, optional
+        See WorkQueue.
+    timeout : float, optional
+        The number of seconds to wait for a lock held by another worker.
+        Defaults to 60.
+    """
+
+    DEF_TABLE_NAME = 'folk_tasks'
+    _INSERT_BATCH_SIZE = 1000
+
+    def __init__(
+            self, path, table_name=None, lease_seconds=None,
+            max_attempts=None, timeout=None):
+        super().__init__(
+            lease_seconds=lease_seconds, max_attempts=max_attempts)
+        if table_name is None:
+            table_name = SQLiteWorkQueue.DEF_TABLE_NAME
+        if timeout is None:
+            timeout = 60
+        self.path = os.path.expanduser(path)
+        self.table_name = table_name
+        self.timeout = timeout
+        self._conn = None
+        self._conn_pid = None
+        self._lock = threading.RLock()
+
+    def get_connection(self):
+        """Returns a connection to the underlying SQLite database, creating
+        the tasks table if needed."""
+        with self._lock:
+            # sqlite connections must not be shared with forked processes
+            if self._conn is None or self._conn_pid != os.getpid():
+                self._connect()
+            return self._conn
+
+    def _connect(self):
+        sqlite3 = import_module('sqlite3')
+        dir_path = os.path.dirname(self.path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+        # transactions are managed explicitly
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None,
+            check_same_thread=False)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS {} ('
+            'task_id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'run_id TEXT NOT NULL, '
+            'pipe_index INTEGER NOT NULL, '
+            'model_index INTEGER NOT NULL, '
+            'digest TEXT, '
+            'status TEXT NOT NULL, '
+            'lease_owner TEXT, '
+            'lease_expires REAL, '
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'error TEXT)'.format(self.table_name))
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS {0}_status ON {0} '
+            '(status, task_id)'.format(self.table_name))
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS {0}_lease ON {0} '
+            '(status, lease_expires)'.format(self.table_name))
+        self._conn = conn
+        self._conn_pid = os.getpid()
+
+    def _transaction(self, func, *args):
+        with self._lock:
+            conn = self.get_connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                res = func(conn, *args)
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return res
+
+    def put_tasks(self, tasks):
+        sql = (
+            'INSERT INTO {} (run_id, pipe_index, model_index, digest, status)'
+            ' VALUES (?, ?, ?, ?, ?)'.format(self.table_name))
+
+        def _insert(conn, rows):
+            conn.executemany(sql, rows)
+
+        batch = []
+        for run_id, pipe_index, model_index, digest in tasks:
+            batch.append(
+                (run_id, pipe_index, model_index, digest, TaskStatus.PENDING))
+            if len(batch) >= SQLiteWorkQueue._INSERT_BATCH_SIZE:
+                self._transaction(_insert, batch)
+                batch = []
+        if batch:
+            self._transaction(_insert, batch)
+
+    def _lease(self, conn, worker_id, n, run_id):
+        now = time.time()
+        table = self.table_name
+        conn.execute(
+            'UPDATE {} SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,'
+            ' lease_owner = NULL, error = ? WHERE status = ? AND '
+            'lease_expires < ?'.format(table),
+            (self.max_attempts, TaskStatus.FAILED, TaskStatus.PENDING,
+             'lease expired', TaskStatus.LEASED, now))
+        sql = (
+            'SELECT task_id, run_id, pipe_index, model_index, digest, '
+            'attempts FROM {} WHERE status = ?'.format(table))
+        params = [TaskStatus.PENDING]
+        if run_id is not None:
+            sql += ' AND run_id = ?'
+            params.append(run_id)
+        sql += ' ORDER BY task_id LIMIT ?'
+        params.append(n)
+        rows = conn.execute(sql, params).fetchall()
+        conn.executemany(
+            'UPDATE {} SET status = ?, lease_owner = ?, lease_expires = ?, '
+            'attempts = attempts + 1 WHERE task_id = ?'.format(table),
+            [(TaskStatus.LEASED, worker_id, now + self.lease_seconds,
+              row[0]) for row in rows])
+        return [
+            Task(task_id, run_id, pipe_index, model_index, digest,
+                 attempts + 1)
+            for task_id, run_id, pipe_index, model_index, digest, attempts
+            in rows
+        ]
+
+    def lease(self, worker_id, n=1, run_id=None):
+        return self._transaction(self._lease, worker_id, n, run_id)
+
+    def _release(self, task, worker_id, status, error=None):
+        with self._lock:
+            cursor = self.get_connection().execute(
+                'UPDATE {} SET status = ?, lease_owner = NULL, error = ? '
+                'WHERE task_id = ? AND lease_owner = ? AND status = ?'.format(
+                    self.table_name),
+                (status, error, task.task_id, worker_id, TaskStatus.LEASED))
+            return cursor.rowcount == 1
+
+    def renew(self, tasks, worker_id):
+        with self._lock:
+            self.get_connection().executemany(
+                'UPDATE {} SET lease_expires = ? WHERE task_id = ? AND '
+                'lease_owner = ? AND status = ?'.format(self.table_name),
+                [(time.time() + self.lease_seconds, task.task_id, worker_id,
+                  TaskStatus.LEASED) for task in tasks])
+
+    def ack(self, task, worker_id):
+        return self._release(task, worker_id, TaskStatus.DONE)
+
+    def fail(self, task, worker_id, error=None):
+        return self._release(
+            task, worker_id, self._status_after_failure(task), error)
+
+    def status_counts(self, run_id=None):
+        sql = 'SELECT status, COUNT(*) FROM {}'.format(self.table_name)
+        params = []
+        if run_id is not None:
+            sql += ' WHERE run_id = ?'
+            params.append(run_id)
+        sql += ' GROUP BY status'
+        with self._lock:
+            return dict(self.get_connection().execute(sql, params))
+
+
+# === MongoDB-based queue ===
+
+class MongoWorkQueue(WorkQueue):
+    """A work queue stored in a MongoDB collection.
+
+    Every task is leased with a single atomic find-and-modify operation, so
+    no two workers lease the same task.
+
+    Parameters
+    ----------
+    collection : pymongo.collection.Collection
+        The collection to store tasks in.
+    lease_seconds : float, optional
+        See WorkQueue.
+    max_attempts : int, optional
+        See WorkQueue.
+    """
+
+    DEF_COLLECTION_NAME = 'folk_work_queue'
+
+    def __init__(self, collection, lease_seconds=None, max_attempts=None):
+        super().__init__(
+            lease_seconds=lease_seconds, max_attempts=max_attempts)
+        self.collection = collection
+        self.collection.create_index([('status', 1), ('seq', 1)])
+        self.collection.create_index([('status', 1), ('lease_expires', 1)])
+
+    @classmethod
+    def from_metrics_db(cls, db_name, collection_name=None, **kwargs):
+        """Returns a work queue stored in a collection of the database of the
+        given MongoDB-based folk metrics db.
+
+        Parameters
+        ----------
+        db_name : str
+            The name of a MongoDB-based folk metrics db configured for folk.
+        collection_name : str, optional
+            The name of the collection to store tasks in. Defaults to
+            'folk_work_queue'.
+        **kwargs
+            Passed to the constructor of MongoWorkQueue.
+
+        Returns
+        -------
+        MongoWorkQueue
+            The work queue.
+        """
+        metrics_db = get_metrics_db(db_name)
+        if metrics_db is None or not hasattr(metrics_db, 'get_collection'):
+            raise ValueError(
+                "No MongoDB-based folk metrics db named {}.".format(db_name))
+        if collection_name is None:
+            collection_name = MongoWorkQueue.DEF_COLLECTION_NAME
+        database = metrics_db.get_collection().database
+        return cls(collection=database[collection_name], **kwargs)
+
+    def put_tasks(self, tasks):
+        # tasks are leased in the order of their sequence numbers
+        seq = time.time_ns()
+        batch = []
+        for i, (run_id, pipe_index, model_index, digest) in enumerate(tasks):
+            batch.append({
+                'seq': seq + i,
+                'run_id': run_id,
+                'pipe_index': pipe_index,
+                'model_index': model_index,
+                'digest': digest,
+                'status': TaskStatus.PENDING,
+                'lease_owner': None,
+                'lease_expires': None,
+                'attempts': 0,
+                'error': None,
+            })
+            if len(batch) >= 1000:
+                self.collection.insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            self.collection.insert_many(batch, ordered=False)
+
+    def _requeue_expired(self):
+        now = time.time()
+        expired = {'status': TaskStatus.LEASED, 'lease_expires': {'$lt': now}}
+        self.collection.update_many(
+            dict(expired, attempts={'$gte': self.max_attempts}),
+            {'$set': {
+                'status': TaskStatus.FAILED, 'lease_owner': None,
+                'error': 'lease expired'}},
+        )
+        self.collection.update_many(
+            dict(expired, attempts={'$lt': self.max_attempts}),
+            {'$set': {'status': TaskStatus.PENDING, 'lease_owner': None}},
+        )
+
+    def lease(self, worker_id, n=1, run_id=None):
+        self._requeue_expired()
+        query = {'status': TaskStatus.PENDING}
+        if run_id is not None:
+            query['run_id'] = run_id
+        tasks = []
+        for _ in range(n):
+            doc = self.collection.find_one_and_update(
+                query,
+                {
+                    '$set': {
+                        'status': TaskStatus.LEASED,
+                        'lease_owner': worker_id,
+                        'lease_expires': time.time() + self.lease_seconds,
+                    },
+                    '$inc': {'attempts': 1},
+                },
+                sort=[('seq', 1)],
+                return_document=True,  # pymongo.ReturnDocument.AFTER
+            )
+            if doc is None:
+                break
+            tasks.append(Task(
+                doc['_id'], doc['run_id'], doc['pipe_index'],
+                doc['model_index'], doc['digest'], doc['attempts']))
+        return tasks
+
+    def _release(self, task, worker_id, status, error=None):
+        res = self.collection.update_one(
+            {'_id': task.task_id, 'lease_owner': worker_id,
+             'status': TaskStatus.LEASED},
+            {'$set': {'status': status, 'lease_owner': None, 'error': error}},
+        )
+        return res.modified_count == 1
+
+    def renew(self, tasks, worker_id):
+        self.collection.update_many(
+            {'_id': {'$in': [task.task_id for task in tasks]},
+             'lease_owner': worker_id, 'status': TaskStatus.LEASED},
+            {'$set': {'lease_expires': time.time() + self.lease_seconds}},
+        )
+
+    def ack(self, task, worker_id):
+        return self._release(task, worker_id, TaskStatus.DONE)
+
+    def fail(self, task, worker_id, error=None):
+        return self._release(
+            task, worker_id, self._status_after_failure(task), error)
+
+    def status_counts(self, run_id=None):
+        pipeline = []
+        if run_id is not None:
+            pipeline.append({'$match': {'run_id': run_id}})
+        pipeline.append({'$group': {'_id': '$status', 'count': {'$sum': 1}}})
+        return {
+            doc['_id']: doc['count']
+            for doc in self.collection.aggregate(pipeline)
+        }
+
+
+# === coordinator and workers ===
+
+def enqueue_sweep(queue, param_pipeline, param_model, run_id=None):
+    """Enumerates all experiments of a sweep into the given work queue.
+
+    Parameters
+    ----------
+    queue : WorkQueue
+        The work queue to add tasks to.
+    param_pipeline : folk.ParameterizedPipeline
+        The parameterized pipeline of the sweep.
+    param_model : folk.ConstrainedParameterizedModel
+        The parameterized model of the sweep.
+    run_id : str, optional
+        The id of the run of the sweep. A new one is generated if not given.
+
+    Returns
+    -------
+    str
+        The id of the run of the sweep.
+    """
+    if run_id is None:
+        run_id = new_run_id()
+
+    def _tasks():
+        for pipe_index, pipe_params in enumerate(param_pipeline.param_grid):
+            partial_pmodel = param_model.partial(pipe_params)
+            for model_index, model_params in enumerate(
+                    partial_pmodel.params_iter()):
+                yield (run_id, pipe_index, model_index,
+                       task_digest(pipe_params, model_params))
+
+    queue.put_tasks(_tasks())
+    return run_id
+
+
+def default_worker_id():
+    """Returns an id for a worker process, unique across nodes."""
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+class _TaskEvaluator(object):
+    """Evaluates tasks, keeping the prepared dataset and cross validation
+    folds of the last pipeline configuration seen. Folds are stratified for
+    classifiers only."""
+
+    def __init__(
+            self, param_pipeline, param_model, dataset, metric_db, n_folds,
+            n_jobs, verbose, scoring):
+        self.param_pipeline = param_pipeline
+        self.param_model = param_model
+        self.dataset = dataset
+        self.metric_db = metric_db
+        self.n_folds = 5 if n_folds is None else n_folds
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+        self.scoring = scoring
+        self._pipe_index = None
+        self._pipe_state = None
+
+    def _pipe(self, pipe_index):
+        if pipe_index != self._pipe_index:
+            self._pipe_state = None
+            pipe_params = self.param_pipeline.params_by_index(pipe_index)
+            pipeline = self.param_pipeline.pipeline_by_params(pipe_params)
+            transform_cache = getattr(
+                self.param_pipeline, 'transform_cache', None)
+            if transform_cache is not None:
+                df, _ = transform_cache.fit_transform(
+                    pipeline=pipeline, params=pipe_params, df=self.dataset,
+                    verbose=self.verbose)
+            elif self.verbose:
+                df = pipeline.fit_transform(self.dataset, verbose=True)
+            else:
+                df = pipeline.fit_transform(self.dataset)
+            data = prepare_dataset(df, pipe_params['lbl_col'])
+            # folds by whether they are for classifiers, computed on demand
+            folds = {}
+            self._pipe_state = (
+                pipe_params, self.param_model.partial(pipe_params), data,
+                folds)
+            self._pipe_index = pipe_index
+        return self._pipe_state
+
+    def __call__(self, task):
+        pipe_params, partial_pmodel, data, folds = self._pipe(
+            task.pipe_index)
+        model_params = partial_pmodel.params_by_index(task.model_index)
+        if task_digest(pipe_params, model_params) != task.digest:
+            raise ValueError(
+                "The parameters of {} do not match those it was enqueued "
+                "with; the sweep grids of the worker and the coordinator "
+                "differ.".format(task))
+        params = model_params.copy()
+        params.update(pipe_params)
+        model = partial_pmodel.model_by_params(model_params)
+        classifier = is_classifier(model)
+        if classifier not in folds:
+            folds[classifier] = folds_by_assignment(fold_assignment(
+                data.y, self.n_folds, classifier=classifier))
+        cv = folds[classifier]
+        return eval_model_by_params(
+            run_id=task.run_id,
+            model=model,
+            model_id=self.param_model.model_id_by_params(model_params),
+            model_label=self.param_model.model_label_by_params(model_params),
+            df=data,
+            lbl_col=pipe_params['lbl_col'],
+            params=params,
+            metric_db=self.metric_db,
+            n_folds=self.n_folds,
+            n_jobs=self.n_jobs,
+            verbose=self.verbose,
+            pipe_id=params_digest(pipe_params),
+            cv=cv,
+            scoring=self.scoring,
+        )
+
+
+def run_worker(
+        queue, param_pipeline, param_model, dataset, run_id=None,
+        metric_db=None, n_folds=None, n_jobs=None, verbose=None,
+        scoring=None, worker_id=None, batch_size=None, poll_interval=None,
+        max_tasks=None):
+    """Evaluates tasks leased from the given work queue until none are left.
+
+    Tasks are leased in batches. The lease of every task in a batch is
+    renewed before it is evaluated, and the results of the batch are flushed
+    to the metrics db before its tasks are acknowledged. Failed tasks are
+    released back to the queue. When no task is pending but some are leased
+    by other workers, the worker waits for them to be acknowledged, or for
+    their leases to expire.
+
+    Parameters
+    ----------
+    queue : WorkQueue
+        The work queue to lease tasks from.
+    param_pipeline : folk.ParameterizedPipeline
+        The parameterized pipeline of the sweep, identical to the one tasks
+        were enqueued from.
+    param_model : folk.ConstrainedParameterizedModel
+        The parameterized model of the sweep, identical to the one tasks were
+        enqueued from.
+    dataset : pandas.DataFrame
+        The dataset to evaluate the sweep on.
+    run_id : str, optional
+        If given, only tasks of this run are leased.
+    metric_db : str, optional
+        The name of the folk metrics db to write results to.
+    n_folds : int, optional
+        The number of cross validation folds. Defaults to 5.
+    n_jobs : int, optional
+        The number of jobs to cross validate every model with. Defaults to 1.
+    verbose : bool, optional
+        If set to True, informative messages are printed.
+    scoring : str, list or dict, optional
+        The metrics to score models by. See eval_param_pipeline_n_model.
+    worker_id : str, optional
+        The id of this worker. Defaults to its host name and process id.
+    batch_size : int, optional
+        The number of tasks to lease at once. Defaults to 1.
+    poll_interval : float, optional
+        The number of seconds to wait between polls of the queue when all
+        remaining tasks are leased by other workers. Defaults to 5.
+    max_tasks : int, optional
+        If given, the worker stops after evaluating this many tasks.
+
+    Returns
+    -------
+    int
+        The number of tasks evaluated by this worker.
+    """
+    _print = print_func_by_verbosity(verbose)
+    if worker_id is None:
+        worker_id = default_worker_id()
+    if batch_size is None:
+        batch_size = 1
+    if poll_interval is None:
+        poll_interval = 5
+    evaluate_task = _TaskEvaluator(
+        param_pipeline=param_pipeline,
+        param_model=param_model,
+        dataset=dataset,
+        metric_db=metric_db,
+        n_folds=n_folds,
+        n_jobs=n_jobs,
+        verbose=verbose,
+        scoring=scoring,
+    )
+    n_done = 0
+    while max_tasks is None or n_done < max_tasks:
+        n_lease = batch_size
+        if max_tasks is not None:
+            n_lease = min(n_lease, max_tasks - n_done)
+        tasks = queue.lease(worker_id, n=n_lease, run_id=run_id)
+        if not tasks:
+            if not queue.status_counts(run_id).get(TaskStatus.LEASED):
+                break
+            time.sleep(poll_interval)
+            continue
+        evaluated = []
+        for i, task in enumerate(tasks):
+            if i > 0:
+                queue.renew(tasks[i:], worker_id)
+            _print("Worker {} evaluating {}".format(worker_id, task))
+            try:
+                evaluate_task(task)
+            except Exception:
+                _print("Evaluation of {} failed.".format(task))
+                queue.fail(task, worker_id, traceback.format_exc())
+                continue
+            evaluated.append(task)
+        if metric_db:
+            flush_metrics_db(metric_db)
+        for task in evaluated:
+            if not queue.ack(task, worker_id):
+                _print("The lease of {} expired before it was done.".format(
+                    task))
+            n_done += 1
+    return n_done
@@ -24,7 +24,7 @@ TEST_REQUIRES = [
     # testing and coverage
     'pytest', 'coverage', 'pytest-cov',
     # test dependencies
-    'pandas', 'pdpipe', 'skutil',
+    'pandas', 'pdpipe', 'skutil', 'pyarrow',
     # to be able to run `python setup.py checkdocs`
     'collective.checkdocs', 'pygments',
 ]
@@ -48,6 +48,8 @@ setuptools.setup(
     ],
     extras_require={
         'test': TEST_REQUIRES + INSTALL_REQUIRES,
+        # parquet transform caches and chunked parquet datasets
+        'parquet': ['pyarrow'],
     },
     classifiers=[
         # Trove classifiers
@@ -20,7 +20,7 @@ from folk.cfg import CfgKey
 # === Constants ===
 
 def _model_getter(penalty, C, **kwargs):
-    return LogisticRegression(penalty=penalty, C=C)
+    return LogisticRegression(penalty=penalty, C=C, solver='saga')
 
 
 MODEL_PGRID = ConstrainedParameterGrid({
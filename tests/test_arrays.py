@@ -0,0 +1,21 @@
+"""Test folk's array store."""
+
+import numpy as np
+import pytest
+
+from folk.arrays import ArrayStore
+
+
+def test_array_store(tmpdir):
+    store = ArrayStore(str(tmpdir))
+    arr = np.arange(10, dtype=np.int32)
+    key = store.put(arr)
+    assert key in store
+    assert store.put(arr.copy()) == key
+    assert store.put(arr.astype(np.int64)) != key
+    loaded = store.get(key)
+    assert isinstance(loaded, np.memmap)
+    assert (loaded == arr).all()
+    assert not isinstance(store.get(key, mmap=False), np.memmap)
+    with pytest.raises(KeyError):
+        store.get('0' * 40)
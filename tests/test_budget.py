@@ -0,0 +1,45 @@
+"""Test splitting a CPU budget between levels of parallelism."""
+
+import pytest
+import numpy as np
+
+from folk.budget import (
+    available_cpus,
+    split_cpu_budget,
+    native_thread_limits,
+)
+
+
+def test_split_cpu_budget():
+    split = split_cpu_budget(8, n_folds=5, parallel_experiments=False)
+    assert (split.n_workers, split.n_jobs, split.n_threads) == (1, 5, 1)
+    split = split_cpu_budget(8, n_folds=3, parallel_experiments=False)
+    assert (split.n_workers, split.n_jobs, split.n_threads) == (1, 3, 2)
+    split = split_cpu_budget(8, n_folds=5, n_workers=4)
+    assert (split.n_workers, split.n_jobs, split.n_threads) == (4, 2, 1)
+    split = split_cpu_budget(8, n_folds=5, n_jobs=3)
+    assert (split.n_workers, split.n_jobs, split.n_threads) == (2, 3, 1)
+    split = split_cpu_budget(-1, n_folds=5)
+    assert split.cpu_budget == available_cpus()
+    assert split.n_workers * split.n_jobs * split.n_threads <= \
+        split.cpu_budget
+    with pytest.raises(ValueError):
+        split_cpu_budget(4, n_folds=5, n_workers=4, n_jobs=2)
+    with pytest.raises(ValueError):
+        split_cpu_budget(8, n_folds=5, n_jobs=16)
+    with pytest.raises(ValueError):
+        split_cpu_budget(0, n_folds=5)
+
+
+def test_native_thread_limits():
+    threadpoolctl = pytest.importorskip('threadpoolctl')
+    np.ones((2, 2)) @ np.ones((2, 2))
+    before = [info['num_threads'] for info in threadpoolctl.threadpool_info()]
+    with native_thread_limits(1):
+        assert all(
+            info['num_threads'] == 1
+            for info in threadpoolctl.threadpool_info())
+    after = [info['num_threads'] for info in threadpoolctl.threadpool_info()]
+    assert after == before
+    with native_thread_limits(None):
+        pass
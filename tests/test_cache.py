@@ -0,0 +1,81 @@
+"""Test folk's transformed dataset cache."""
+
+import os
+import sys
+
+import pytest
+
+from folk.cache import TransformCache
+from folk.hashing import df_fingerprint
+
+from .shared import _test_df
+
+
+class _CountingPipeline(object):
+
+    def __init__(self):
+        self.n_calls = 0
+
+    def fit_transform(self, df, verbose=False):
+        self.n_calls += 1
+        return df.drop(columns='id')
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'pickle'])
+def test_cache_hit_skips_pipeline(tmpdir, fmt):
+    cache = TransformCache(cache_dir=str(tmpdir), fmt=fmt)
+    pipeline = _CountingPipeline()
+    df = _test_df()
+    res1, hit1 = cache.fit_transform(pipeline, {'lower': True}, df)
+    res2, hit2 = cache.fit_transform(pipeline, {'lower': True}, df)
+    assert not hit1
+    assert hit2
+    assert pipeline.n_calls == 1
+    assert res1.equals(res2)
+    _, hit3 = cache.fit_transform(pipeline, {'lower': False}, df)
+    assert not hit3
+    assert pipeline.n_calls == 2
+
+
+def test_pickle_without_pyarrow(tmpdir, monkeypatch):
+    assert TransformCache(cache_dir=str(tmpdir)).fmt == 'parquet'
+    with monkeypatch.context() as m:
+        # a None entry makes importing pyarrow raise ImportError
+        m.setitem(sys.modules, 'pyarrow', None)
+        assert TransformCache(cache_dir=str(tmpdir)).fmt == 'pickle'
+        with pytest.warns(UserWarning, match='pyarrow is not installed'):
+            cache = TransformCache(cache_dir=str(tmpdir), fmt='parquet')
+    assert cache.fmt == 'pickle'
+    assert not cache.fit_transform(_CountingPipeline(), {}, _test_df())[1]
+    assert cache.fit_transform(_CountingPipeline(), {}, _test_df())[1]
+
+
+def test_cache_key_by_dataset(tmpdir):
+    cache = TransformCache(cache_dir=str(tmpdir), fmt='pickle')
+    df = _test_df()
+    other_df = _test_df()
+    other_df.loc[0, 'shleem_count'] = 24
+    assert df_fingerprint(df) == df_fingerprint(_test_df())
+    assert df_fingerprint(df) != df_fingerprint(other_df)
+    params = {'lower': True}
+    assert cache.key(params, df_fingerprint(df)) != cache.key(
+        params, df_fingerprint(other_df))
+
+
+def test_cache_lru_eviction(tmpdir):
+    cache = TransformCache(cache_dir=str(tmpdir), fmt='pickle')
+    df = _test_df()
+    cache.put('a', df)
+    entry_size = os.path.getsize(os.path.join(str(tmpdir), 'a.pkl'))
+    cache.max_bytes = 2 * entry_size
+    os.utime(os.path.join(str(tmpdir), 'a.pkl'), (1, 1))
+    cache.put('b', df)
+    os.utime(os.path.join(str(tmpdir), 'b.pkl'), (2, 2))
+    # reading a makes b the least recently used entry
+    assert cache.get('a') is not None
+    cache.put('c', df)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    cache.clear()
+    assert cache.get('a') is None
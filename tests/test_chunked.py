@@ -0,0 +1,153 @@
+"""Test out-of-core evaluation over chunked datasets."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import pdpipe as pdp
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_validate
+from sklearn.naive_bayes import GaussianNB
+from skutil.model_selection import ConstrainedParameterGrid
+
+from folk import ConstrainedParameterizedModel
+from folk.chunked import (
+    ChunkedSource,
+    ChunkTransformer,
+    incremental_cross_validate,
+)
+from folk.evaluate import eval_pmodel_by_params
+from folk.folds import fold_assignment, folds_by_assignment
+from folk.metricsdb import MetricKey
+
+
+def _dataset():
+    X, y = make_classification(
+        n_samples=600, n_features=6, n_informative=4, n_classes=3,
+        random_state=0)
+    df = pd.DataFrame(X, columns=['f{}'.format(i) for i in range(6)])
+    df['y'] = y
+    df['id'] = np.arange(len(df))
+    return df
+
+
+def _chunks(df, chunk_size=128):
+    return [
+        df.iloc[start:start + chunk_size]
+        for start in range(0, len(df), chunk_size)
+    ]
+
+
+def test_chunked_source(tmpdir):
+    df = _dataset()
+    path = str(tmpdir.join('data.parquet'))
+    df.to_parquet(path)
+    source = ChunkedSource(path, chunk_size=250, columns=['f0', 'y'])
+    chunks = list(source)
+    assert [len(chunk) for chunk in chunks] == [250, 250, 100]
+    assert list(chunks[0].columns) == ['f0', 'y']
+    assert np.allclose(pd.concat(chunks)['f0'].values, df['f0'].values)
+    # sources are read anew on every pass
+    source = ChunkedSource(lambda: iter(_chunks(df)))
+    assert sum(len(chunk) for chunk in source) == len(df)
+    assert sum(len(chunk) for chunk in source) == len(df)
+    assert len(list(ChunkedSource(_chunks(df)))) == 5
+    with pytest.raises(TypeError):
+        ChunkedSource(iter(_chunks(df)))
+
+
+def test_chunk_transformer():
+    df = pd.DataFrame({'c': ['a', 'b', 'a', 'c'], 'x': [1, 2, 3, 4]})
+    transformer = ChunkTransformer(pdp.PdPipeline([
+        pdp.OneHotEncode('c', drop_first=False),
+        pdp.ColDrop('x'),
+    ]))
+    first = transformer.transform(df.iloc[:2])
+    second = transformer.transform(df.iloc[2:])
+    # encoders keep the categories of the first chunk
+    assert list(first.columns) == list(second.columns) == ['c_a', 'c_b']
+    assert second['c_a'].tolist() == [1, 0]
+    stats = transformer.stage_stats()
+    assert [stat['stage'] for stat in stats] == ['OneHotEncode', 'ColDrop']
+
+
+def test_incremental_cross_validate():
+    df = _dataset()
+    chunks = _chunks(df.drop(columns='id'))
+    assignment = fold_assignment(df['y'].values, n_folds=4, classifier=True)
+    cv_res, = incremental_cross_validate(
+        estimators=[GaussianNB()],
+        chunk_iter=lambda: iter(chunks),
+        lbl_col='y',
+        assignment=assignment,
+        classes=np.unique(df['y']),
+        scoring={'accuracy': 'accuracy'},
+        n_jobs=2,
+    )
+    # naive bayes fitted incrementally matches naive bayes fitted at once
+    expected = cross_validate(
+        GaussianNB(), df.drop(columns=['y', 'id']), df['y'],
+        cv=folds_by_assignment(assignment), scoring='accuracy')
+    assert np.allclose(cv_res['test_accuracy'], expected['test_score'])
+    assert len(cv_res['fit_time']) == len(cv_res['score_time']) == 4
+
+
+def test_incremental_cross_validate_log_loss():
+    df = _dataset().drop(columns='id')
+    # sorted by label, so most chunks miss some of the classes
+    df = df.sort_values('y', kind='stable').reset_index(drop=True)
+    chunks = _chunks(df, chunk_size=50)
+    assignment = fold_assignment(df['y'].values, n_folds=3, classifier=True)
+    scoring = {'ll': 'neg_log_loss', 'brier': 'neg_brier_score'}
+    cv_res, = incremental_cross_validate(
+        estimators=[GaussianNB()],
+        chunk_iter=lambda: iter(chunks),
+        lbl_col='y',
+        assignment=assignment,
+        classes=np.unique(df['y']),
+        scoring=scoring,
+    )
+    expected = cross_validate(
+        GaussianNB(), df.drop(columns='y'), df['y'],
+        cv=folds_by_assignment(assignment), scoring=scoring)
+    for metric in scoring:
+        key = 'test_{}'.format(metric)
+        assert np.allclose(cv_res[key], expected[key], rtol=1e-4)
+
+
+def _nb_getter(var_smoothing, **kwargs):
+    return GaussianNB(var_smoothing=var_smoothing)
+
+
+def test_chunked_eval_pmodel_by_params():
+    df = _dataset()
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_nb_getter,
+        param_grid=ConstrainedParameterGrid({
+            'var_smoothing': [1e-9, 1e-3]}),
+    )
+    res_docs = eval_pmodel_by_params(
+        run_id='r1', pipeline=pdp.ColDrop('id'), pmodel=pmodel,
+        raw_df=lambda: iter(_chunks(df)), pipe_params={'lbl_col': 'y'},
+        n_folds=3, n_epochs=2)
+    assert len(res_docs) == 2
+    for res_doc in res_docs:
+        assert res_doc[MetricKey.DATASET_SIZE] == len(df)
+        assert res_doc[MetricKey.N_CHUNKS] == 5
+        assert res_doc[MetricKey.N_EPOCHS] == 2
+        assert res_doc[MetricKey.N_CLASS] == 3
+        assert len(res_doc[MetricKey.FOLD_FIT_TIMES]) == 3
+        assert 0 < res_doc['accuracy_mean'] <= 1
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=lambda **kwargs: LogisticRegression(),
+        param_grid=ConstrainedParameterGrid({'a': [1]}),
+    )
+    with pytest.raises(TypeError):
+        eval_pmodel_by_params(
+            run_id='r1', pipeline=pdp.ColDrop('id'), pmodel=pmodel,
+            raw_df=_chunks(df), pipe_params={'lbl_col': 'y'})
+    with pytest.raises(ValueError):
+        eval_pmodel_by_params(
+            run_id='r1', pipeline=pdp.ColDrop('id'), pmodel=pmodel,
+            raw_df=_chunks(df), pipe_params={'lbl_col': 'y'},
+            strategy='halving')
@@ -1,15 +1,33 @@
 """Test folk's evaluate module."""
 
+import numpy as np
 import pytest
-
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
 
 from folk import (
+    ConstrainedParameterizedModel,
     eval_param_pipeline_n_model,
 )
+from folk import evaluate
+from folk.evaluate import (
+    eval_model_by_params,
+    eval_pmodel_by_params,
+    _halving_rung_sizes,
+    _evaluation_units,
+    _cross_validate_unit,
+)
+from folk.folds import fold_assignment, folds_by_assignment
+from folk.metricsdb import (
+    MetricKey,
+    FolkMetricsSQLiteDB,
+    _name_to_db_map,
+)
 
 from .shared import (
     MODEL_PGRID,
     PIPE_PGRID,
+    _model_getter,
     PPIPELINE,
     PMODEL,
     TEST_METRICS_DB,
@@ -19,9 +37,14 @@ from .shared import (
 )
 
 
-@pytest.fixture(scope="session", autouse=True)
+SQLITE_METRICS_DB = 'FOLK_TEST_SQLITE'
+
+N_EXPERIMENTS = len(PIPE_PGRID) * len(MODEL_PGRID)
+
+
+@pytest.fixture(scope="session")
 def prep_and_teardown(request):
-    # Will be executed before the first test
+    # Will be executed before the first test using the MongoDB test db
     _clean_db()
 
     yield
@@ -30,7 +53,55 @@ def prep_and_teardown(request):
     _clean_db()
 
 
-def test_base_eval():
+@pytest.fixture
+def sqlite_db(tmpdir, monkeypatch):
+    db = FolkMetricsSQLiteDB(name=SQLITE_METRICS_DB, db_cfg={
+        'TYPE': 'sqlite', 'PATH': str(tmpdir.join('metrics.db'))})
+    monkeypatch.setitem(_name_to_db_map(), SQLITE_METRICS_DB, db)
+    return db
+
+
+def _recorded_docs(db):
+    # a second handle on the same file only sees flushed documents
+    return FolkMetricsSQLiteDB(name='reader', db_cfg={
+        'TYPE': 'sqlite', 'PATH': db.path}).query_results()
+
+
+def test_single_evaluations_flush(sqlite_db):
+    pipeline, pipe_params = next(iter(PPIPELINE.pipe_n_params_iter()))
+    df = pipeline.fit_transform(_test_df())
+    eval_model_by_params(
+        run_id='r1', model=_model_getter('l2', 1.0), model_id='m1', df=df,
+        lbl_col='rank', params={'C': 1.0}, metric_db=SQLITE_METRICS_DB,
+        n_folds=2)
+    assert len(_recorded_docs(sqlite_db)) == 1
+    eval_pmodel_by_params(
+        run_id='r2', pipeline=pipeline, pmodel=PMODEL, raw_df=_test_df(),
+        pipe_params=pipe_params, metric_db=SQLITE_METRICS_DB, n_folds=2)
+    assert len(_recorded_docs(sqlite_db)) == 1 + len(MODEL_PGRID)
+
+
+def test_failed_flush_keeps_run_error(monkeypatch):
+    def _failing_flush(db_name=None):
+        raise IOError('db is down')
+
+    class _FailingPipeline(object):
+
+        def fit_transform(self, df, verbose=False):
+            raise RuntimeError('pipeline failed')
+
+    monkeypatch.setattr(evaluate, 'flush_metrics_db', _failing_flush)
+    with pytest.warns(UserWarning, match='Failed to flush'):
+        with pytest.raises(RuntimeError, match='pipeline failed'):
+            eval_pmodel_by_params(
+                run_id='r1', pipeline=_FailingPipeline(), pmodel=PMODEL,
+                raw_df=_test_df(), pipe_params={'lbl_col': 'rank'},
+                metric_db=SQLITE_METRICS_DB, n_folds=2)
+    with pytest.raises(IOError):
+        evaluate._flush_after_run(SQLITE_METRICS_DB, None)
+
+
+def test_base_eval(prep_and_teardown):
     eval_param_pipeline_n_model(
         param_pipeline=PPIPELINE,
         param_model=PMODEL,
@@ -40,6 +111,166 @@ def test_base_eval():
     )
 
 
+def test_process_executor_eval(sqlite_db):
+    eval_param_pipeline_n_model(
+        param_pipeline=PPIPELINE,
+        param_model=PMODEL,
+        dataset=_test_df(),
+        metric_db=SQLITE_METRICS_DB,
+        n_folds=2,
+        executor='process',
+        max_workers=2,
+    )
+    df = sqlite_db.query_results()
+    assert len(df) == N_EXPERIMENTS
+    assert len(df.groupby([MetricKey.PIPE_ID, MetricKey.MODEL_ID])) == len(df)
+    assert df[MetricKey.ACC_MEAN].notnull().all()
+    assert (df[MetricKey.N_FOLDS] == 2).all()
+
+
+def test_unknown_executor():
+    with pytest.raises(ValueError):
+        eval_param_pipeline_n_model(
+            param_pipeline=PPIPELINE,
+            param_model=PMODEL,
+            dataset=_test_df(),
+            executor='gpu',
+        )
+
+
+def test_halving_eval(sqlite_db):
+    eval_param_pipeline_n_model(
+        param_pipeline=PPIPELINE,
+        param_model=PMODEL,
+        dataset=_test_df(),
+        metric_db=SQLITE_METRICS_DB,
+        n_folds=2,
+        strategy='halving',
+        halving_factor=2,
+        random_state=0,
+    )
+    df = sqlite_db.query_results()
+    # 6 models per pipeline, of which 3, 2 and then 1 advance
+    n_pipes = len(PIPE_PGRID)
+    assert df.groupby(MetricKey.RUNG).size().tolist() == [
+        6 * n_pipes, 3 * n_pipes, 2 * n_pipes, n_pipes]
+    for _, pipe_df in df.groupby(MetricKey.PIPE_ID):
+        rungs = [
+            set(pipe_df[pipe_df[MetricKey.RUNG] == rung][MetricKey.MODEL_ID])
+            for rung in range(4)
+        ]
+        assert all(
+            later <= earlier for earlier, later in zip(rungs, rungs[1:]))
+
+
+def test_multi_metric_eval(sqlite_db):
+    eval_param_pipeline_n_model(
+        param_pipeline=PPIPELINE,
+        param_model=PMODEL,
+        dataset=_test_df(),
+        metric_db=SQLITE_METRICS_DB,
+        n_folds=2,
+        scoring=['accuracy', 'f1_macro'],
+    )
+    df = sqlite_db.query_results()
+    assert len(df) == N_EXPERIMENTS
+    for key in [MetricKey.ACC_MEAN, 'f1_macro_mean', 'f1_macro_std']:
+        assert df[key].notnull().all()
+
+
+def test_empty_scoring():
+    with pytest.raises(ValueError):
+        eval_param_pipeline_n_model(
+            param_pipeline=PPIPELINE,
+            param_model=PMODEL,
+            dataset=_test_df(),
+            scoring=[],
+        )
+
+
+def test_path_eval(sqlite_db):
+    eval_param_pipeline_n_model(
+        param_pipeline=PPIPELINE,
+        param_model=ConstrainedParameterizedModel(
+            model_getter=_model_getter,
+            param_grid=MODEL_PGRID,
+            path_param='C',
+        ),
+        dataset=_test_df(),
+        metric_db=SQLITE_METRICS_DB,
+        n_folds=2,
+    )
+    df = sqlite_db.query_results()
+    # one record per point of every path
+    assert len(df) == N_EXPERIMENTS
+    for _, path_df in df.groupby([MetricKey.PIPE_ID, 'penalty']):
+        assert sorted(path_df['C']) == [0.3, 0.6, 0.9]
+    assert df[MetricKey.ACC_MEAN].notnull().all()
+
+
+def _path_experiments(path, n_folds):
+    experiments = []
+    for penalty in ['l2', None]:
+        for C in [1.0, 0.01, 0.1]:
+            kwargs = {
+                'run_id': 'r1',
+                'model': LogisticRegression(penalty=penalty, C=C),
+                'model_id': '{}_{}'.format(penalty, C),
+                'pipe_id': 'p1',
+                'lbl_col': 'y',
+                'params': {'penalty': penalty, 'C': C},
+                'n_folds': n_folds,
+                'n_jobs': 1,
+                'verbose': False,
+                'n_classes': 3,
+                'scoring': ['accuracy', 'neg_log_loss'],
+            }
+            if path:
+                kwargs['path'] = ('C', False)
+            experiments.append(kwargs)
+    return experiments
+
+
+def test_cross_validate_path():
+    X, y = make_classification(
+        n_samples=300, n_classes=3, n_informative=4, random_state=0)
+    cv = folds_by_assignment(fold_assignment(y, n_folds=3, classifier=True))
+    units = _evaluation_units(_path_experiments(path=False, n_folds=3))
+    assert [len(unit) for unit in units] == [1] * 6
+    expected = {
+        res_doc[MetricKey.MODEL_ID]: res_doc
+        for unit in units
+        for res_doc, _ in _cross_validate_unit(X, y, cv, unit)
+    }
+    units = _evaluation_units(_path_experiments(path=True, n_folds=3))
+    assert [len(unit) for unit in units] == [3, 3]
+    assert [kwargs['params']['C'] for kwargs in units[0]] == [0.01, 0.1, 1.0]
+    for unit in units:
+        results = _cross_validate_unit(X, y, cv, unit)
+        assert len(results) == len(unit)
+        for kwargs, (res_doc, fold_scores) in zip(unit, results):
+            assert res_doc[MetricKey.MODEL_ID] == kwargs['model_id']
+            assert res_doc['C'] == kwargs['params']['C']
+            assert len(fold_scores['accuracy']) == 3
+            assert len(res_doc[MetricKey.FOLD_FIT_TIMES]) == 3
+            for key in [MetricKey.ACC_MEAN, 'neg_log_loss_mean']:
+                assert np.isclose(
+                    res_doc[key], expected[kwargs['model_id']][key],
+                    atol=0.01)
+
+
+def test_halving_rung_sizes():
+    assert _halving_rung_sizes(
+        n_candidates=6, n_samples=900, factor=3, min_samples=10,
+    ) == [100, 300, 900]
+    assert _halving_rung_sizes(
+        n_candidates=6, n_samples=900, factor=3, min_samples=200,
+    ) == [200, 300, 900]
+    assert _halving_rung_sizes(
+        n_candidates=1, n_samples=900, factor=3, min_samples=10,
+    ) == [900]
+
+
 if __name__ == "__main__":
     test_base_eval()
     model_permutations = len(MODEL_PGRID)
@@ -0,0 +1,56 @@
+"""Test folk's precomputed cross validation folds."""
+
+import numpy as np
+from sklearn.model_selection import (
+    KFold,
+    StratifiedKFold,
+)
+
+from folk.folds import (
+    fold_assignment,
+    folds_by_assignment,
+)
+
+from .shared import _test_df
+
+
+def test_folds_match_sklearn():
+    y = _test_df()['rank'].values
+    assignment = fold_assignment(y, n_folds=2, classifier=True)
+    assert assignment.dtype == np.int32
+    folds = folds_by_assignment(assignment)
+    expected = StratifiedKFold(n_splits=2).split(np.zeros(len(y)), y)
+    for (train, test), (exp_train, exp_test) in zip(folds, expected):
+        assert train.dtype == np.int32
+        assert list(train) == list(exp_train)
+        assert list(test) == list(exp_test)
+
+
+def test_shuffled_folds():
+    y = np.array([0, 1] * 50)
+    kwargs = {'shuffle': True, 'random_state': 3, 'classifier': True}
+    assignment = fold_assignment(y, n_folds=5, **kwargs)
+    same = fold_assignment(y, n_folds=5, **kwargs)
+    assert (assignment == same).all()
+    assert not (
+        assignment == fold_assignment(y, n_folds=5, classifier=True)).all()
+    for fold in range(5):
+        # stratified: each fold holds 10 samples of each class
+        assert (y[assignment == fold] == 0).sum() == 10
+
+
+def test_continuous_target_folds():
+    y = np.linspace(0, 1, 10)
+    assignment = fold_assignment(y, n_folds=5)
+    assert sorted(np.bincount(assignment)) == [2] * 5
+
+
+def test_regression_folds_not_stratified():
+    # integer-valued regression targets, like counts, look like classes
+    y = np.repeat([0, 1, 2], 4)
+    folds = folds_by_assignment(fold_assignment(y, n_folds=3))
+    expected = KFold(n_splits=3).split(np.zeros(len(y)), y)
+    for (_, test), (_, exp_test) in zip(folds, expected):
+        assert list(test) == list(exp_test)
+    stratified = fold_assignment(y, n_folds=3, classifier=True)
+    assert not (stratified == fold_assignment(y, n_folds=3)).all()
@@ -0,0 +1,99 @@
+"""Test random access into parameter grids."""
+
+import pytest
+from sklearn.model_selection import ParameterGrid
+from skutil.model_selection import ConstrainedParameterGrid
+
+from folk import (
+    ConstrainedParameterizedModel,
+    ParameterizedPipeline,
+)
+from folk.grid import IndexedGrid
+
+from .shared import (
+    PIPE_PGRID,
+    _model_getter,
+)
+
+
+GRIDS = [
+    ParameterGrid({'a': [1, 2], 'b': [3, 4, 5], 'c': ['x', 'y']}),
+    ParameterGrid([{'a': [1, 2], 'b': [3]}, {}, {'c': ['x', 'y', 'z']}]),
+    ConstrainedParameterGrid({'a': [1, 2], 'b': [3, 4, 5]}),
+    ConstrainedParameterGrid(
+        {'a': [1, 2], 'b': [3, 4, 5]}, [{'a': [1], 'b': [4, 5]}]),
+    [{'a': 1}, {'a': 2}, {'b': 3}],
+]
+
+
+@pytest.mark.parametrize('grid', GRIDS)
+def test_indexed_grid(grid):
+    expected = list(grid)
+    indexed = IndexedGrid(grid)
+    assert len(indexed) == len(expected)
+    assert [indexed[i] for i in range(len(indexed))] == expected
+    assert [list(indexed[i]) for i in range(len(indexed))] == [
+        list(params) for params in expected]
+    assert indexed[-1] == expected[-1]
+    with pytest.raises(IndexError):
+        indexed[len(expected)]
+
+
+@pytest.mark.parametrize('grid', GRIDS)
+@pytest.mark.parametrize('n', [1, 2, 4, 7])
+def test_grid_shards(grid, n):
+    expected = list(grid)
+    shards = [IndexedGrid(grid).shard(k, n) for k in range(n)]
+    assert [params for shard in shards for params in shard] == expected
+    assert sum(len(shard) for shard in shards) == len(expected)
+    # nested shards partition their parent shard
+    nested = [shards[0].shard(k, 2) for k in range(2)]
+    assert [params for shard in nested for params in shard] == list(
+        shards[0])
+
+
+def test_bad_shard():
+    with pytest.raises(ValueError):
+        IndexedGrid(GRIDS[0]).shard(3, 3)
+    with pytest.raises(ValueError):
+        IndexedGrid(GRIDS[0], n_shards=0)
+
+
+def test_unindexable_grid():
+    with pytest.raises(TypeError):
+        IndexedGrid(params for params in GRIDS[0])
+
+
+def test_model_shards():
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_model_getter,
+        param_grid=ConstrainedParameterGrid({
+            'penalty': ['l1', 'l2'],
+            'C': [0.3, 0.6, 0.9],
+            'lbl_col': ['rank', 'other'],
+        }),
+    )
+    assert len(pmodel) == 12
+    assert pmodel[5].C == pmodel.params_by_index(5)['C']
+    shards = [pmodel.shard(k, 3) for k in range(3)]
+    assert [len(shard) for shard in shards] == [4, 4, 4]
+    partials = [shard.partial({'lbl_col': 'rank'}) for shard in shards]
+    params = [mparams for shard in partials
+              for _, mparams in shard.model_n_params_iter()]
+    assert params == list(pmodel.partial({'lbl_col': 'rank'})._param_grid)
+
+
+def _params_pipeline_getter(**kwargs):
+    return kwargs
+
+
+def test_pipeline_shards():
+    ppipeline = ParameterizedPipeline(
+        pipeline_getter=_params_pipeline_getter,
+        param_grid=PIPE_PGRID,
+    )
+    assert len(ppipeline) == len(PIPE_PGRID)
+    shards = [ppipeline.shard(k, 2) for k in range(2)]
+    assert [params for shard in shards
+            for _, params in shard.pipe_n_params_iter()] == list(PIPE_PGRID)
+    assert ppipeline[1] == list(PIPE_PGRID)[1]
@@ -0,0 +1,52 @@
+"""Test stable hashing of parameter assignments."""
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+from folk.hashing import (
+    PARAMS_ID_WIDTH,
+    canonical_params,
+    params_digest,
+    params_id,
+    params_label,
+)
+
+
+def test_canonical_params_normalization():
+    assert canonical_params({'a': np.int64(3), 'b': (1, 2)}) == \
+        canonical_params({'b': [1, 2], 'a': 3})
+    assert canonical_params({'s': {3, 1, 2}}) == '{"s":[1,2,3]}'
+    assert canonical_params({'x': float('nan')}) == \
+        '{"x":{"$float":"nan"}}'
+    assert canonical_params({'e': LogisticRegression(C=2.0)}) == \
+        canonical_params({'e': LogisticRegression(C=2.0)})
+    assert canonical_params({'e': LogisticRegression(C=2.0)}) != \
+        canonical_params({'e': LogisticRegression(C=3.0)})
+    assert canonical_params({'f': np.mean}) == canonical_params({'f': np.mean})
+
+
+def test_params_id():
+    ids = {
+        params_id({'C': c, 'penalty': penalty})
+        for c in [0.1, 0.2, 1, 1.0]
+        for penalty in ['l1', 'l2']
+    }
+    assert len(ids) == 8
+    assert all(len(model_id) == PARAMS_ID_WIDTH for model_id in ids)
+    assert params_id({'C': 0.1, 'penalty': 'l1'}) == params_id(
+        {'penalty': 'l1', 'C': np.float64(0.1)})
+
+
+def test_params_digest():
+    assert params_digest({'C': np.float64(0.1), 'layers': (3, 4)}) == \
+        params_digest({'layers': [3, 4], 'C': 0.1})
+    assert params_digest({'C': 1}) != params_digest({'C': 1.0})
+    # callables are digested by name, not by their address-bearing repr
+    assert params_digest({'f': lambda x: x}) == \
+        params_digest({'f': lambda x: x})
+    assert len(params_digest({})) == 40
+
+
+def test_params_label():
+    assert params_label({'penalty': 'l1', 'C': 0.1}) == 'C=0.1,penalty=l1'
+    assert params_label({'n': None, 'b': True}) == 'b=true,n=null'
@@ -0,0 +1,130 @@
+"""Test folk's evaluation hooks."""
+
+import io
+import os
+import json
+
+import pandas as pd
+import pdpipe as pdp
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+from skutil.model_selection import ConstrainedParameterGrid
+
+from folk import ConstrainedParameterizedModel
+from folk.evaluate import eval_pmodel_by_params
+from folk.hooks import (
+    Event,
+    EventBus,
+    EvaluationListener,
+    ProfilingListener,
+    ProgressListener,
+    SpanFileListener,
+    register_listener,
+    unregister_listener,
+)
+
+
+class _RecordingListener(EvaluationListener):
+
+    def __init__(self):
+        self.events = []
+
+    def on_model_start(self, payload):
+        self.events.append((Event.MODEL_START, payload))
+
+    def on_model_end(self, payload):
+        self.events.append((Event.MODEL_END, payload))
+
+
+def _emit_experiment(bus, model_id='m1'):
+    ids = {'run_id': 'r1', 'pipe_id': 'p1', 'model_id': model_id}
+    bus.emit(Event.MODEL_START, params={'C': 1}, **ids)
+    for fold in range(2):
+        bus.emit(
+            Event.FOLD_END, fold=fold, fit_time=0.1, score_time=0.01,
+            scores={'accuracy': 0.5}, **ids)
+    bus.emit(Event.MODEL_END, params={'C': 1}, res_doc={}, **ids)
+
+
+def test_event_bus():
+    bus = EventBus()
+    assert not bus
+    bus.emit(Event.RUN_START, run_id='r1')
+    listener = _RecordingListener()
+    register_listener(listener)
+    try:
+        bus = EventBus()
+        assert bus
+        _emit_experiment(bus)
+    finally:
+        unregister_listener(listener)
+    assert not EventBus()
+    assert len(listener.events) == 2
+    event, payload = listener.events[0]
+    assert payload['model_id'] == 'm1'
+    assert 'time' in payload
+
+
+def test_span_file_listener(tmpdir):
+    path = os.path.join(str(tmpdir), 'spans.jsonl')
+    bus = EventBus([SpanFileListener(path)])
+    bus.emit(Event.RUN_START, run_id='r1')
+    bus.emit(
+        Event.PIPELINE_START, run_id='r1', pipe_id='p1', params={},
+        n_models=1)
+    _emit_experiment(bus)
+    bus.emit(Event.PIPELINE_END, run_id='r1', pipe_id='p1', params={})
+    bus.emit(Event.RUN_END, run_id='r1', error=None)
+    with open(path) as f:
+        spans = [json.loads(line) for line in f]
+    assert [span['name'] for span in spans] == [
+        'fold', 'fold', 'experiment', 'pipeline', 'run']
+    span_ids = {span['name']: span['span_id'] for span in spans}
+    assert spans[0]['parent_id'] == span_ids['experiment']
+    assert spans[2]['parent_id'] == span_ids['pipeline']
+    assert spans[3]['parent_id'] == span_ids['run']
+    assert spans[1]['start'] == spans[0]['end']
+
+
+def test_progress_listener():
+    stream = io.StringIO()
+    bus = EventBus([ProgressListener(stream=stream)])
+    bus.emit(Event.RUN_START, run_id='r1')
+    bus.emit(
+        Event.PIPELINE_START, run_id='r1', pipe_id='p1', params={},
+        n_models=2)
+    _emit_experiment(bus, 'm1')
+    _emit_experiment(bus, 'm2')
+    bus.emit(Event.RUN_END, run_id='r1', error=None)
+    assert '2/2' in stream.getvalue()
+
+
+def _lr_getter(C, **kwargs):
+    return LogisticRegression(C=C)
+
+
+def test_listeners_on_path(tmpdir):
+    X, y = make_classification(n_samples=60, random_state=0)
+    df = pd.DataFrame(X[:, :4], columns=list('abcd'))
+    df['lbl'] = y
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_lr_getter,
+        param_grid=ConstrainedParameterGrid({'C': [0.1, 1.0, 10.0]}),
+        path_param='C',
+    )
+    recorder = _RecordingListener()
+    prof_dir = os.path.join(str(tmpdir), 'prof')
+    res_docs = eval_pmodel_by_params(
+        run_id='r1', pipeline=pdp.ColDrop([]), pmodel=pmodel, raw_df=df,
+        pipe_params={'lbl_col': 'lbl'}, n_folds=2, listeners=[
+            recorder, ProfilingListener(prof_dir),
+            SpanFileListener(os.path.join(str(tmpdir), 'spans.jsonl'))])
+    assert len(res_docs) == 3
+    events = [event for event, _ in recorder.events]
+    assert events == [Event.MODEL_START] * 3 + [Event.MODEL_END] * 3
+    assert len([
+        fname for fname in os.listdir(prof_dir) if fname.endswith('.prof')
+    ]) == 3
+    with open(os.path.join(str(tmpdir), 'spans.jsonl')) as f:
+        spans = [json.loads(line) for line in f]
+    assert [span['name'] for span in spans].count('experiment') == 3
@@ -0,0 +1,522 @@
+"""Test folk's metrics db module."""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import (
+    AutoReconnect,
+    BulkWriteError,
+)
+
+from folk.exceptions import FolkMissingConfigurationValueError
+from folk.metricsdb import (
+    MetricKey,
+    FolkMetricsDB,
+    FolkMetricsMongoDB,
+    FolkMetricsSQLiteDB,
+    replay_spill_file,
+)
+
+
+class _ListMetricsDB(FolkMetricsDB):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+
+    def _write_docs(self, docs):
+        self.batches.append(docs)
+
+
+class _FakeCollection(object):
+
+    def __init__(self):
+        self.calls = []
+        self.indexes = []
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        self.calls.append((list(docs), ordered))
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append(keys)
+
+    def find(self, query, **kwargs):
+        self.calls.append(('find', query, kwargs))
+        return iter(self.docs)
+
+    def count_documents(self, query):
+        return len(self.docs)
+
+    def aggregate(self, stages, **kwargs):
+        self.calls.append(('aggregate', stages, kwargs))
+        return iter(self.docs)
+
+
+class _FakeMongoClient(object):
+
+    collection = None
+
+    def __init__(self, uri):
+        self.uri = uri
+
+    def __getitem__(self, name):
+        return {'c': _FakeMongoClient.collection}
+
+
+def test_buffer_size_flush():
+    db = _ListMetricsDB(buffer_size=3, flush_interval=1000)
+    for i in range(7):
+        db.write_experiment_res({'i': i}, run_id='r1')
+    assert [len(batch) for batch in db.batches] == [3, 3]
+    db.flush()
+    assert [len(batch) for batch in db.batches] == [3, 3, 1]
+    assert db.batches[0][0][MetricKey.RUN_ID] == 'r1'
+    assert MetricKey.RUN_AT in db.batches[0][0]
+    db.flush()
+    assert len(db.batches) == 3
+
+
+def test_flush_interval():
+    db = _ListMetricsDB(buffer_size=1000, flush_interval=0)
+    db.write_experiment_res({'i': 0})
+    assert len(db.batches) == 1
+
+
+def test_context_manager_flush():
+    with _ListMetricsDB(buffer_size=1000, flush_interval=1000) as db:
+        db.write_experiment_res({'i': 0})
+        db.write_experiment_res({'i': 1})
+        assert not db.batches
+    assert len(db.batches) == 1
+    assert [doc['i'] for doc in db.batches[0]] == [0, 1]
+
+
+def test_failed_flush_keeps_docs():
+    class _FailingDB(_ListMetricsDB):
+        fail = True
+
+        def _write_docs(self, docs):
+            if self.fail:
+                raise IOError('db is down')
+            super()._write_docs(docs)
+
+    db = _FailingDB(buffer_size=1000, flush_interval=1000)
+    db.write_experiment_res({'i': 0})
+    try:
+        db.flush()
+    except IOError:
+        pass
+    db.fail = False
+    db.flush()
+    assert len(db.batches[0]) == 1
+
+
+def test_mongo_insert_many():
+    db = FolkMetricsMongoDB(name='test', db_cfg={
+        'URI': 'mongodb://localhost', 'DB_NAME': 'd', 'COLLECTION_NAME': 'c',
+        'BUFFER_SIZE': 2,
+    })
+    db.collection = _FakeCollection()
+    for i in range(4):
+        db.write_experiment_res({'i': i})
+    assert len(db.collection.calls) == 2
+    docs, ordered = db.collection.calls[0]
+    assert len(docs) == 2
+    assert not ordered
+
+
+class _ServerCollection(_FakeCollection):
+    """Inserts documents like a MongoDB server would, rejecting those with a
+    'bad' key and dropping the connection after n_before_drop inserts."""
+
+    def __init__(self, n_before_drop=None):
+        super().__init__()
+        self.n_before_drop = n_before_drop
+
+    def insert_many(self, docs, ordered=True):
+        self.calls.append((list(docs), ordered))
+        for doc in docs:
+            doc.setdefault('_id', ObjectId())
+        errors = []
+        for i, doc in enumerate(docs):
+            if self.n_before_drop is not None:
+                if self.n_before_drop == 0:
+                    self.n_before_drop = None
+                    raise AutoReconnect('connection dropped')
+                self.n_before_drop -= 1
+            if 'bad' in doc:
+                errors.append({'index': i, 'code': 121, 'errmsg': 'invalid'})
+            elif any(doc['_id'] == stored['_id'] for stored in self.docs):
+                errors.append({
+                    'index': i, 'code': 11000, 'keyPattern': {'_id': 1},
+                    'errmsg': 'E11000 duplicate key error index: _id_ dup'})
+            else:
+                self.docs.append(dict(doc))
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': 0})
+
+
+def _mongo_db(collection, **kwargs):
+    db_cfg = {
+        'URI': 'mongodb://localhost', 'DB_NAME': 'd', 'COLLECTION_NAME': 'c'}
+    db_cfg.update(kwargs)
+    db = FolkMetricsMongoDB(name='test', db_cfg=db_cfg)
+    db.collection = collection
+    return db
+
+
+def test_mongo_drops_rejected_docs():
+    collection = _ServerCollection()
+    db = _mongo_db(collection, BUFFER_SIZE=1000)
+    for i in range(4):
+        db.write_experiment_res({'i': i, 'bad': 1} if i == 2 else {'i': i})
+    with pytest.warns(UserWarning, match='Dropped 1 docs'):
+        db.flush()
+    assert [doc['i'] for doc in collection.docs] == [0, 1, 3]
+    db.write_experiment_res({'i': 4})
+    db.flush()
+    assert [doc['i'] for doc in collection.docs] == [0, 1, 3, 4]
+    assert len(collection.calls[-1][0]) == 1
+
+
+def test_mongo_retry_after_partial_insert():
+    collection = _ServerCollection(n_before_drop=2)
+    db = _mongo_db(collection, BUFFER_SIZE=1000)
+    for i in range(4):
+        db.write_experiment_res({'i': i})
+    with pytest.raises(AutoReconnect):
+        db.flush()
+    assert len(collection.docs) == 2
+    db.flush()
+    assert [doc['i'] for doc in collection.docs] == [0, 1, 2, 3]
+    db.flush()
+    assert len(collection.calls) == 2
+
+
+def test_mongo_index(monkeypatch):
+    _FakeMongoClient.collection = _FakeCollection()
+    monkeypatch.setattr(
+        FolkMetricsMongoDB, '_mongo_client_cls',
+        staticmethod(lambda: _FakeMongoClient))
+    db = FolkMetricsMongoDB(name='test', db_cfg={
+        'URI': 'mongodb://localhost', 'DB_NAME': 'd', 'COLLECTION_NAME': 'c',
+    })
+    assert db.get_collection() is _FakeMongoClient.collection
+    db.get_collection()
+    indexes = _FakeMongoClient.collection.indexes
+    assert len(indexes) == 4
+    assert [(MetricKey.RUN_ID, 1), (MetricKey.MODEL_ID, 1)] in indexes
+    assert [(MetricKey.RUN_ID, 1), (MetricKey.ACC_MEAN, -1)] in indexes
+
+
+def test_mongo_query_results(monkeypatch):
+    collection = _FakeCollection()
+    collection.docs = [
+        {MetricKey.MODEL_ID: 'm{}'.format(i), MetricKey.ACC_MEAN: i / 10}
+        for i in range(5)
+    ]
+    _FakeMongoClient.collection = collection
+    monkeypatch.setattr(
+        FolkMetricsMongoDB, '_mongo_client_cls',
+        staticmethod(lambda: _FakeMongoClient))
+    db = FolkMetricsMongoDB(name='test', db_cfg={
+        'URI': 'mongodb://localhost', 'DB_NAME': 'd', 'COLLECTION_NAME': 'c',
+    })
+    columns = [MetricKey.MODEL_ID, MetricKey.ACC_MEAN]
+    df = db.query_results(
+        query={MetricKey.ACC_MEAN: {'$gt': 0.1}}, columns=columns,
+        sort=[(MetricKey.ACC_MEAN, -1)], limit=3, run_id='r1', chunk_size=2)
+    assert list(df.columns) == columns
+    assert len(df) == 5
+    _, query, kwargs = collection.calls[-1]
+    assert query == {MetricKey.ACC_MEAN: {'$gt': 0.1}, MetricKey.RUN_ID: 'r1'}
+    assert kwargs['sort'] == [(MetricKey.ACC_MEAN, -1)]
+    assert kwargs['limit'] == 3
+    assert kwargs['projection'] == {
+        '_id': False, MetricKey.MODEL_ID: True, MetricKey.ACC_MEAN: True}
+    db.top_k(2, run_id='r1', group_by=MetricKey.LBL_COL, columns=columns)
+    db.top_k(2, metric='f1', run_id='r1', group_by=MetricKey.LBL_COL)
+    assert [(MetricKey.RUN_ID, 1), ('f1_mean', -1)] in collection.indexes
+    method, stages, kwargs = collection.calls[-2]
+    assert method == 'aggregate'
+    assert stages[0] == {'$match': {MetricKey.RUN_ID: 'r1'}}
+    group = stages[2]['$group']
+    assert group['_id'] == '$' + MetricKey.LBL_COL
+    assert group['docs']['$topN'] == {
+        'n': 2, 'sortBy': {MetricKey.ACC_MEAN: -1}, 'output': '$$ROOT'}
+    assert not any('$push' in str(stage) for stage in stages)
+
+
+def test_mongo_to_frame(monkeypatch):
+    collection = _FakeCollection()
+    collection.docs = [
+        {MetricKey.MODEL_ID: 'm0', 'C': 1, 'penalty': 'l1'},
+        {MetricKey.MODEL_ID: 'm1', 'C': 2},
+        {MetricKey.MODEL_ID: 'm2', 'C': 0.5, 'tol': 0.1},
+        {MetricKey.MODEL_ID: 'm3', 'C': 3, 'penalty': 'l2'},
+        {MetricKey.MODEL_ID: 'm4', 'C': 4, 'tol': 0.2},
+    ]
+    _FakeMongoClient.collection = collection
+    monkeypatch.setattr(
+        FolkMetricsMongoDB, '_mongo_client_cls',
+        staticmethod(lambda: _FakeMongoClient))
+    db = FolkMetricsMongoDB(name='test', db_cfg={
+        'URI': 'mongodb://localhost', 'DB_NAME': 'd', 'COLLECTION_NAME': 'c',
+    })
+    chunks = list(db.iter_results('r1', batch_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    df = db.to_frame('r1', batch_size=2)
+    assert list(df.columns) == [MetricKey.MODEL_ID, 'C', 'penalty', 'tol']
+    assert list(df['C']) == [1, 2, 0.5, 3, 4]
+    assert df['C'].dtype.kind == 'f'
+    assert list(df['penalty'])[::3] == ['l1', 'l2']
+    assert df['penalty'].isnull().tolist() == [False, True, True, False, True]
+    assert df['tol'].isnull().tolist() == [True, True, False, True, False]
+    _, query, kwargs = collection.calls[-1]
+    assert query == {MetricKey.RUN_ID: 'r1'}
+    assert kwargs['batch_size'] == 2
+
+
+class _FlakyDB(_ListMetricsDB):
+
+    def __init__(self, n_failures, **kwargs):
+        super().__init__(**kwargs)
+        self.n_failures = n_failures
+
+    def _write_docs(self, docs):
+        if self.n_failures > 0:
+            self.n_failures -= 1
+            raise IOError('db is down')
+        super()._write_docs(docs)
+
+
+def test_background_writer_retries():
+    db = _FlakyDB(n_failures=2, buffer_size=2, flush_interval=1000)
+    db.start_background_writer(backoff=0.001, max_retries=3)
+    for i in range(5):
+        db.write_experiment_res({'i': i})
+    db.stop_background_writer()
+    written = [doc['i'] for batch in db.batches for doc in batch]
+    assert sorted(written) == list(range(5))
+
+
+def test_background_writer_spill_and_replay(tmpdir):
+    spill_path = str(tmpdir.join('spill.jsonl'))
+    db = _FlakyDB(n_failures=1000, buffer_size=1, flush_interval=1000)
+    writer = db.start_background_writer(
+        backoff=0.001, max_retries=1, spill_path=spill_path)
+    with db:
+        for i in range(3):
+            db.write_experiment_res({'i': i, 'acc': 0.5}, run_id='r1')
+    assert writer.n_spilled == 3
+    assert not db.batches
+    db.stop_background_writer()
+    target = _ListMetricsDB()
+    assert replay_spill_file(spill_path, target) == 3
+    docs = target.batches[0]
+    assert sorted(doc['i'] for doc in docs) == [0, 1, 2]
+    assert isinstance(docs[0][MetricKey.RUN_AT], datetime)
+    assert docs[0][MetricKey.RUN_ID] == 'r1'
+    assert not tmpdir.join('spill.jsonl').check()
+
+
+def test_background_writer_spills_rejected_docs(tmpdir):
+    spill_path = str(tmpdir.join('spill.jsonl'))
+    collection = _ServerCollection()
+    db = _mongo_db(collection, BUFFER_SIZE=1000)
+    writer = db.start_background_writer(
+        backoff=0.001, max_retries=3, spill_path=spill_path)
+    for i in range(4):
+        db.write_experiment_res({'i': i, 'bad': 1} if i == 2 else {'i': i})
+    with pytest.warns(UserWarning, match='rejected 1 docs'):
+        db.stop_background_writer()
+    assert writer.n_spilled == 1
+    assert len(collection.calls) == 1
+    assert [doc['i'] for doc in collection.docs] == [0, 1, 3]
+    with pytest.warns(UserWarning, match='rejected 1 spilled docs'):
+        assert replay_spill_file(spill_path, db) == 0
+    assert len(tmpdir.join('spill.jsonl').readlines()) == 1
+
+
+def test_replay_skips_inserted_docs(tmpdir):
+    spill_path = str(tmpdir.join('spill.jsonl'))
+    collection = _ServerCollection(n_before_drop=2)
+    db = _mongo_db(collection, BUFFER_SIZE=1000)
+    writer = db.start_background_writer(
+        backoff=0.001, max_retries=0, spill_path=spill_path)
+    for i in range(4):
+        db.write_experiment_res({'i': i})
+    with pytest.warns(UserWarning, match='Failed to write 4 docs'):
+        db.stop_background_writer()
+    assert writer.n_spilled == 4
+    assert len(collection.docs) == 2
+    assert replay_spill_file(spill_path, db) == 4
+    assert [doc['i'] for doc in collection.docs] == [0, 1, 2, 3]
+    assert isinstance(collection.docs[0]['_id'], ObjectId)
+    assert not tmpdir.join('spill.jsonl').check()
+
+
+def _sqlite_db(tmpdir, **kwargs):
+    db_cfg = {'TYPE': 'sqlite', 'PATH': str(tmpdir.join('metrics.db'))}
+    db_cfg.update(kwargs)
+    return FolkMetricsSQLiteDB(name='test_sqlite', db_cfg=db_cfg)
+
+
+def test_sqlite_db(tmpdir):
+    with _sqlite_db(tmpdir, BUFFER_SIZE=2) as db:
+        for i, penalty in enumerate(['l1', 'l2', 'l1']):
+            db.write_experiment_res({
+                MetricKey.MODEL_ID: 'm{}'.format(i),
+                MetricKey.ACC_MEAN: 0.5 + i / 10,
+                'penalty': penalty,
+                'C': 0.3 * (i + 1),
+            }, run_id='r1')
+    db.write_experiment_res({
+        MetricKey.MODEL_ID: 'm3', 'hidden_layers': [3, 4]}, run_id='r2')
+    db.flush()
+    df = db.query(
+        'SELECT * FROM folk_metrics WHERE run_id = ? ORDER BY accuracy_mean',
+        params=('r1',),
+    )
+    assert list(df['model_identifier']) == ['m0', 'm1', 'm2']
+    assert list(df['penalty']) == ['l1', 'l2', 'l1']
+    assert df['accuracy_mean'].iloc[2] == 0.7
+    df = db.query("SELECT hidden_layers FROM folk_metrics WHERE run_id='r2'")
+    assert df['hidden_layers'].iloc[0] == '[3, 4]'
+    # a new db object over the same file sees existing columns
+    db2 = _sqlite_db(tmpdir, BUFFER_SIZE=1)
+    db2.write_experiment_res({MetricKey.MODEL_ID: 'm4', 'C': 1.0})
+    assert len(db2.query('SELECT * FROM folk_metrics')) == 5
+
+
+def test_sqlite_two_handles(tmpdir):
+    db1 = _sqlite_db(tmpdir, BUFFER_SIZE=10)
+    db2 = _sqlite_db(tmpdir, BUFFER_SIZE=10)
+    db1.get_connection()
+    db2.get_connection()
+    db1.write_experiment_res({MetricKey.MODEL_ID: 'm1', 'alpha': 1.0})
+    db1.flush()
+    # db2 read the columns of the table before db1 added 'alpha'
+    db2.write_experiment_res({MetricKey.MODEL_ID: 'm2', 'alpha': 2.0})
+    db2.flush()
+    db2.write_experiment_res({MetricKey.MODEL_ID: 'm3', 'beta': 3})
+    db2.flush()
+    df = db1.query_results(
+        query={'alpha': {'$gte': 1.0}},
+        columns=[MetricKey.MODEL_ID, 'alpha', 'beta'])
+    assert sorted(df[MetricKey.MODEL_ID]) == ['m1', 'm2']
+    assert len(db1.query_results(query={'beta': 3})) == 1
+
+
+def test_sqlite_query_results(tmpdir):
+    db = _sqlite_db(tmpdir)
+    for i in range(6):
+        db.write_experiment_res({
+            MetricKey.MODEL_ID: 'm{}'.format(i),
+            MetricKey.LBL_COL: 'y{}'.format(i % 2),
+            MetricKey.ACC_MEAN: i / 10,
+            'penalty': 'l1' if i < 3 else None,
+        }, run_id='r1' if i < 5 else 'r2')
+    columns = [MetricKey.MODEL_ID, MetricKey.ACC_MEAN]
+    df = db.query_results(
+        query={MetricKey.ACC_MEAN: {'$gte': 0.1, '$lt': 0.4}},
+        columns=columns, sort=[(MetricKey.ACC_MEAN, -1)], run_id='r1',
+        chunk_size=2)
+    assert list(df.columns) == columns
+    assert list(df[MetricKey.MODEL_ID]) == ['m3', 'm2', 'm1']
+    df = db.query_results(
+        query={MetricKey.MODEL_ID: {'$in': ['m0', 'm4', 'm5']}},
+        columns=[MetricKey.MODEL_ID, 'never_written'],
+        sort=MetricKey.MODEL_ID, limit=2)
+    assert list(df[MetricKey.MODEL_ID]) == ['m0', 'm4']
+    assert df['never_written'].isnull().all()
+    df = db.query_results(query={'penalty': None}, run_id='r1')
+    assert sorted(df[MetricKey.MODEL_ID]) == ['m3', 'm4']
+    df = db.query_results(query={'penalty': {'$ne': 'l1'}}, run_id='r1')
+    assert sorted(df[MetricKey.MODEL_ID]) == ['m3', 'm4']
+    assert len(db.query_results(query={'never_written': 1})) == 0
+    with pytest.raises(ValueError):
+        db.query_results(query={'penalty': {'$regex': 'l'}})
+
+
+def test_sqlite_top_k(tmpdir):
+    db = _sqlite_db(tmpdir)
+    for i in range(6):
+        db.write_experiment_res({
+            MetricKey.MODEL_ID: 'm{}'.format(i),
+            MetricKey.LBL_COL: 'y{}'.format(i % 2),
+            MetricKey.ACC_MEAN: i / 10,
+        }, run_id='r1')
+    df = db.top_k(2, run_id='r1')
+    assert list(df[MetricKey.MODEL_ID]) == ['m5', 'm4']
+    df = db.top_k(2, group_by=MetricKey.LBL_COL)
+    assert list(df[MetricKey.MODEL_ID]) == ['m4', 'm2', 'm5', 'm3']
+    assert '_folk_rank' not in df.columns
+    df = db.top_k(
+        1, group_by=MetricKey.LBL_COL,
+        columns=[MetricKey.LBL_COL, MetricKey.ACC_MEAN])
+    assert list(df.columns) == [MetricKey.LBL_COL, MetricKey.ACC_MEAN]
+    assert list(df[MetricKey.ACC_MEAN]) == [0.4, 0.5]
+
+
+def test_sqlite_score_indexes(tmpdir):
+    db = _sqlite_db(tmpdir)
+
+    def _index_names():
+        return set(db.query(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")['name'])
+
+    assert 'folk_metrics_run_score' in _index_names()
+    # ranking by a metric no result was recorded for yet
+    assert db.top_k(2, metric='f1').empty
+    assert {
+        'folk_metrics_run_score_f1_mean', 'folk_metrics_run_lbl_score_f1_mean',
+    } <= _index_names()
+    db.write_experiment_res({'r2_mean': 0.5}, run_id='r1')
+    df = db.query_results(sort=[('r2_mean', -1)], run_id='r1')
+    assert list(df['r2_mean']) == [0.5]
+    assert 'folk_metrics_run_score_r2_mean' in _index_names()
+
+
+def test_sqlite_iter_results(tmpdir):
+    db = _sqlite_db(tmpdir)
+    for i in range(7):
+        db.write_experiment_res({
+            MetricKey.MODEL_ID: 'm{}'.format(i),
+            MetricKey.ACC_MEAN: i / 10,
+            'C': i,
+        }, run_id='r1')
+    db.write_experiment_res({MetricKey.MODEL_ID: 'm7'}, run_id='r2')
+    columns = [MetricKey.MODEL_ID, MetricKey.RUN_AT, 'C']
+    chunks = list(db.iter_results('r1', columns=columns, batch_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert all(list(chunk.columns) == columns for chunk in chunks)
+    assert chunks[0][MetricKey.RUN_AT].dtype.kind == 'M'
+    df = db.to_frame('r1', columns=columns, batch_size=3)
+    assert list(df.columns) == columns
+    assert sorted(df[MetricKey.MODEL_ID]) == [
+        'm{}'.format(i) for i in range(7)]
+    assert df['C'].dtype.kind == 'i'
+    assert df[MetricKey.RUN_AT].dtype.kind == 'M'
+    assert len(db.to_frame('r3')) == 0
+
+
+def test_sqlite_db_missing_path():
+    with pytest.raises(FolkMissingConfigurationValueError):
+        FolkMetricsSQLiteDB(name='bad', db_cfg={'TYPE': 'sqlite'})
+
+
+def test_sqlite_completed_experiment_keys(tmpdir):
+    db = _sqlite_db(tmpdir)
+    assert db.completed_experiment_keys('r1') == set()
+    for model_id, pipe_id, run_id in [
+            ('m1', 'p1', 'r1'), ('m2', 'p1', 'r1'), ('m1', 'p2', 'r2')]:
+        db.write_experiment_res({
+            MetricKey.MODEL_ID: model_id,
+            MetricKey.PIPE_ID: pipe_id,
+        }, run_id=run_id)
+    # buffered documents are flushed before querying
+    assert db.completed_experiment_keys('r1') == {('m1', 'p1'), ('m2', 'p1')}
+    assert db.completed_experiment_keys('r2') == {('m1', 'p2')}
@@ -1,8 +1,15 @@
 """Test model-related folk stuff."""
 
+from folk import (
+    ParameterizedModel,
+    ConstrainedParameterizedModel,
+)
+
 from .shared import (
     LogisticRegression,
+    MODEL_PGRID,
     PMODEL,
+    _model_getter,
 )
 
 
@@ -11,3 +18,78 @@ def test_model_base():
         assert isinstance(model, LogisticRegression)
     model = PMODEL.model_by_params({'penalty': 'l1', 'C': 0.3})
     assert isinstance(model, LogisticRegression)
+
+
+def test_partial_memoized():
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_model_getter,
+        param_grid=MODEL_PGRID,
+    )
+    partial = pmodel.partial({'C': 0.3, 'lbl_col': 'rank'})
+    assert pmodel.partial({'lbl_col': 'rank', 'C': 0.3}) is partial
+    assert pmodel.partial({'C': 0.6}) is not partial
+    assert len(partial) == 2
+    assert partial._model_id_cache is pmodel._model_id_cache
+
+
+def test_model_ids_memoized():
+    calls = []
+
+    def _model_id_getter(**kwargs):
+        calls.append(kwargs)
+        return str(sorted(kwargs.items()))
+
+    pmodel = ParameterizedModel(
+        model_getter=_model_getter,
+        param_grid=MODEL_PGRID,
+        model_id_getter=_model_id_getter,
+    )
+    ids = [pmodel.model_id_by_params(params) for params in MODEL_PGRID]
+    assert ids == [pmodel.model_id_by_params(params) for params in MODEL_PGRID]
+    assert len(calls) == len(MODEL_PGRID)
+    assert pmodel.model_id_by_params({'C': 1}) != pmodel.model_id_by_params(
+        {'C': 1.0})
+
+
+def test_model_from_prototype():
+    pmodel = ConstrainedParameterizedModel.from_prototype(
+        prototype=LogisticRegression(solver='liblinear'),
+        param_grid=MODEL_PGRID,
+    )
+    models = list(pmodel)
+    assert len(models) == len(MODEL_PGRID)
+    for model, params in zip(models, MODEL_PGRID):
+        assert model.C == params['C']
+        assert model.penalty == params['penalty']
+        assert model.solver == 'liblinear'
+    partial = pmodel.partial({'penalty': 'l2', 'lbl_col': 'rank'})
+    model, params = next(partial.model_n_params_iter())
+    assert model.penalty == 'l2'
+
+
+def test_default_model_ids():
+    pmodel = ParameterizedModel(
+        model_getter=_model_getter,
+        param_grid=MODEL_PGRID,
+    )
+    model_id = pmodel.model_id_by_params({'penalty': 'l1', 'C': 0.3})
+    assert model_id == pmodel.model_id_by_params({'C': 0.3, 'penalty': 'l1'})
+    assert len(model_id) == 16
+    assert pmodel.model_label_by_params(
+        {'penalty': 'l1', 'C': 0.3}) == 'C=0.3,penalty=l1'
+
+
+def test_path_param_propagation():
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_model_getter,
+        param_grid=MODEL_PGRID,
+        path_param='C',
+    )
+    partial = pmodel.partial({'penalty': 'l1'})
+    assert partial.path_param == 'C'
+    assert not partial.path_descending
+    assert pmodel.shard(0, 2).path_param == 'C'
+    pmodel = ConstrainedParameterizedModel.from_prototype(
+        LogisticRegression(), MODEL_PGRID, path_param='C',
+        path_descending=True)
+    assert pmodel.partial({'penalty': 'l2'}).path_descending
@@ -0,0 +1,84 @@
+"""Test storing out-of-fold predictions and recomputing metrics."""
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import f1_score
+from sklearn.svm import LinearSVC
+
+from folk.arrays import ArrayStore
+from folk.evaluate import _cross_validate_model
+from folk.metricsdb import MetricKey, FolkMetricsSQLiteDB
+from folk.oof import OOFKind, recompute_metric
+
+
+METRICS = ['accuracy', 'neg_log_loss', 'neg_brier_score']
+
+
+def _experiments(tmpdir, n_classes, models):
+    X, y = make_classification(
+        n_samples=240, n_classes=n_classes, n_informative=4,
+        random_state=0)
+    store = ArrayStore(str(tmpdir.join('arrays')))
+    db = FolkMetricsSQLiteDB(name='test_oof', db_cfg={
+        'PATH': str(tmpdir.join('metrics.db'))})
+    res_docs = []
+    for i, (model, scoring) in enumerate(models):
+        res_doc, _ = _cross_validate_model(
+            run_id='r1', model=model, model_id='m{}'.format(i), X=X, y=y,
+            lbl_col='y', params={}, n_folds=4, n_jobs=1, verbose=False,
+            n_classes=n_classes, pipe_id='p1', scoring=scoring,
+            oof_store=store)
+        db.write_experiment_res(res_doc, run_id='r1')
+        res_docs.append(res_doc)
+    return store, db, res_docs
+
+
+@pytest.mark.parametrize('n_classes', [2, 3])
+def test_recompute_metric(tmpdir, n_classes):
+    models = [
+        (LogisticRegression(C=C), METRICS) for C in [0.01, 0.1, 1.0]]
+    store, db, res_docs = _experiments(tmpdir, n_classes, models)
+    oof = store.get(res_docs[0][MetricKey.OOF_KEY])
+    assert oof.dtype == np.float32
+    assert oof.shape == (240, n_classes)
+    assert res_docs[0][MetricKey.OOF_KIND] == OOFKind.PROBA
+    fold_scores = store.get(res_docs[0][MetricKey.FOLD_SCORES_KEY])
+    assert fold_scores.shape == (len(METRICS), 4)
+    for metric in METRICS:
+        df = recompute_metric('r1', metric, db, store, batch_size=2)
+        df = df.sort_values(MetricKey.MODEL_ID)
+        assert list(df[MetricKey.MODEL_ID]) == ['m0', 'm1', 'm2']
+        expected = [doc[MetricKey.mean_key(metric)] for doc in res_docs]
+        assert np.allclose(df[MetricKey.mean_key(metric)], expected)
+        expected = [doc[MetricKey.std_key(metric)] for doc in res_docs]
+        assert np.allclose(df[MetricKey.std_key(metric)], expected)
+
+
+def test_recompute_callable_metric(tmpdir):
+    models = [
+        (LogisticRegression(), ['accuracy', 'f1_macro']),
+        (LinearSVC(), ['accuracy', 'f1_macro']),
+    ]
+    store, db, res_docs = _experiments(tmpdir, 2, models)
+    assert res_docs[1][MetricKey.OOF_KIND] == OOFKind.DECISION
+    df = recompute_metric('r1', 'accuracy', db, store)
+    df = df.sort_values(MetricKey.MODEL_ID)
+    assert np.allclose(
+        df[MetricKey.ACC_MEAN],
+        [doc[MetricKey.ACC_MEAN] for doc in res_docs])
+
+    def f1_macro(y, oof):
+        pred = oof.argmax(axis=1) if oof.ndim == 2 else oof > 0
+        return f1_score(y, pred, average='macro')
+
+    df = recompute_metric('r1', f1_macro, db, str(tmpdir.join('arrays')))
+    df = df.sort_values(MetricKey.MODEL_ID)
+    assert np.allclose(
+        df['f1_macro_mean'], [doc['f1_macro_mean'] for doc in res_docs])
+    assert len(df['f1_macro_folds'].iloc[0]) == 4
+    with pytest.raises(ValueError):
+        recompute_metric('r1', 'roc_auc', db, store)
+    with pytest.raises(ValueError):
+        recompute_metric('r1', 'neg_log_loss', db, store)
@@ -1,8 +1,20 @@
 """Test pipeline-related folk stuff."""
 
 import pdpipe as pdp
+from sklearn.model_selection import ParameterGrid
 
-from .shared import PPIPELINE
+from folk import ParameterizedPipeline
+from folk.pipe import (
+    StageStatKey,
+    profiled_fit_transform,
+    shared_prefix_transform_iter,
+)
+
+from .shared import (
+    PIPE_PGRID,
+    PPIPELINE,
+    _test_df,
+)
 
 
 def test_pipe_base():
@@ -10,3 +22,74 @@ def test_pipe_base():
         assert isinstance(pipe, pdp.Pipeline)
     pipe = PPIPELINE.pipeline_by_params({'lower': True})
     assert isinstance(pipe, pdp.Pipeline)
+
+
+class _AddCol(object):
+
+    applications = []
+
+    def __init__(self, col, val):
+        self.col = col
+        self.val = val
+
+    def fit_transform(self, df, verbose=False):
+        _AddCol.applications.append((self.col, self.val))
+        return df.assign(**{self.col: self.val})
+
+
+class _StubPipeline(object):
+
+    def __init__(self, stages):
+        self._stages = stages
+
+
+def _stub_pipeline_getter(a, b, **kwargs):
+    return _StubPipeline([_AddCol('a', a), _AddCol('b', b)])
+
+
+def test_shared_prefix_transform():
+    _AddCol.applications = []
+    ppipeline = ParameterizedPipeline(
+        pipeline_getter=_stub_pipeline_getter,
+        param_grid=ParameterGrid({'a': [1, 2], 'b': [3, 4, 5]}),
+    )
+    res = list(ppipeline.shared_prefix_transform_iter(_test_df()))
+    assert len(res) == 6
+    for params, df in res:
+        assert (df['a'] == params['a']).all()
+        assert (df['b'] == params['b']).all()
+    # 2 distinct 'a' stages and 6 distinct 'a'-'b' stage sequences
+    assert len(_AddCol.applications) == 2 + 6
+
+
+def test_shared_prefix_pdpipe():
+    res = list(PPIPELINE.shared_prefix_transform_iter(_test_df()))
+    assert len(res) == len(PIPE_PGRID)
+    for params, df in res:
+        expected = PPIPELINE.pipeline_by_params(params)(_test_df())
+        assert df.equals(expected)
+
+
+def test_profiled_fit_transform():
+    pipeline = _stub_pipeline_getter(a=1, b=2)
+    df, stage_stats = profiled_fit_transform(pipeline, _test_df())
+    assert (df['a'] == 1).all() and (df['b'] == 2).all()
+    assert [stat[StageStatKey.STAGE] for stat in stage_stats] == [
+        '_AddCol', '_AddCol']
+    assert all(stat[StageStatKey.TIME] >= 0 for stat in stage_stats)
+    assert all(stat[StageStatKey.PEAK_MEM] is None for stat in stage_stats)
+    df, stage_stats = profiled_fit_transform(
+        pipeline, _test_df(), trace_memory=True)
+    assert all(stat[StageStatKey.PEAK_MEM] > 0 for stat in stage_stats)
+
+
+def test_shared_prefix_stage_stats():
+    pipe_n_params = [
+        (_stub_pipeline_getter(**params), params)
+        for params in ParameterGrid({'a': [1, 2], 'b': [3, 4]})
+    ]
+    res = list(shared_prefix_transform_iter(
+        pipe_n_params, _test_df(), stage_stats=True))
+    assert len(res) == 4
+    for params, df, stage_stats in res:
+        assert len(stage_stats) == 2
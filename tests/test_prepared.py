@@ -0,0 +1,131 @@
+"""Test datasets prepared once for the evaluation of many models."""
+
+import numpy as np
+import pandas as pd
+import pdpipe as pdp
+import pytest
+import scipy.sparse as sp
+from sklearn.datasets import make_classification
+from sklearn.linear_model import (
+    LogisticRegression,
+    Ridge,
+)
+from sklearn.model_selection import cross_validate
+from skutil.model_selection import ConstrainedParameterGrid
+
+from folk import ConstrainedParameterizedModel
+from folk.evaluate import eval_model_by_params, eval_pmodel_by_params
+from folk.folds import fold_assignment, folds_by_assignment
+from folk.prepared import prepare_dataset
+
+
+def _df():
+    return pd.DataFrame({
+        'a': [1, 2, 3, 4, 5, 6],
+        'b': [.5, .1, .2, .3, .4, .6],
+        'lbl': ['x', 'z', 'x', 'z', 'x', 'x'],
+    })
+
+
+def test_prepare_dataset():
+    df = _df()
+    data = prepare_dataset(df, 'lbl')
+    assert isinstance(data.X, np.ndarray)
+    assert data.X.flags['C_CONTIGUOUS']
+    assert np.allclose(data.X, df[['a', 'b']].values)
+    assert data.columns == ['a', 'b']
+    assert data.y.dtype == np.int32
+    assert data.y.tolist() == [0, 1, 0, 1, 0, 0]
+    assert data.classes.tolist() == ['x', 'z']
+    assert data.class_counts.tolist() == [4, 2]
+    assert data.n_classes == 2
+    assert data.n_samples == 6
+    assert prepare_dataset(data, 'lbl') is data
+    # regression targets are not encoded
+    data = prepare_dataset(df.assign(lbl=df['b'] * 2), 'lbl')
+    assert data.classes is None and data.class_counts is None
+    assert np.allclose(data.y, df['b'] * 2)
+    with pytest.raises(ValueError):
+        prepare_dataset(df.assign(lbl=[1, 2, None, 1, 2, 1]), 'lbl')
+
+
+def test_prepare_dataset_features():
+    df = _df()
+    sparse = df.assign(
+        a=pd.arrays.SparseArray([0, 0, 1, 0, 0, 2]),
+        b=pd.arrays.SparseArray([0., .5, 0, 0, 0, 0], fill_value=0.))
+    data = prepare_dataset(sparse, 'lbl')
+    assert sp.issparse(data.X) and data.X.format == 'csr'
+    assert data.X.nnz == 3
+    data = prepare_dataset(df.assign(c=list('pqrstu')), 'lbl')
+    assert isinstance(data.X, pd.DataFrame)
+    assert list(data.X.columns) == ['a', 'b', 'c']
+    assert len(data.take(np.array([0, 2])).X) == 2
+
+
+def test_prepared_fingerprint_and_take():
+    data = prepare_dataset(_df(), 'lbl')
+    assert data.fingerprint == prepare_dataset(_df(), 'lbl').fingerprint
+    other = prepare_dataset(_df().assign(a=[1, 2, 3, 4, 5, 7]), 'lbl')
+    assert data.fingerprint != other.fingerprint
+    subset = data.take(np.array([0, 2, 4]))
+    assert subset.X.tolist() == data.X[[0, 2, 4]].tolist()
+    # classes of the full dataset are kept, but only present ones counted
+    assert subset.classes.tolist() == ['x', 'z']
+    assert subset.class_counts.tolist() == [3, 0]
+    assert subset.n_classes == 1
+    assert subset.fingerprint != data.fingerprint
+
+
+def _lr_getter(C, **kwargs):
+    return LogisticRegression(C=C)
+
+
+@pytest.mark.parametrize('executor', ['serial', 'process'])
+def test_scores_by_original_labels(executor):
+    X, y = make_classification(n_samples=120, weights=[.7], random_state=0)
+    df = pd.DataFrame(X[:, :4], columns=list('abcd'))
+    # f1 treats label 1 as positive; encoding the labels as 0 and 1 would
+    # turn 2 into the positive label
+    df['lbl'] = y + 1
+    cv = folds_by_assignment(
+        fold_assignment(df['lbl'].values, 3, classifier=True))
+    expected = cross_validate(
+        LogisticRegression(C=1.0), df[list('abcd')], df['lbl'], cv=cv,
+        scoring='f1')['test_score'].mean()
+    res_doc = eval_model_by_params(
+        run_id='r1', model=LogisticRegression(C=1.0), model_id='m1', df=df,
+        lbl_col='lbl', params={}, n_folds=3, cv=cv, scoring=['f1'])
+    assert np.isclose(res_doc['f1_mean'], expected)
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_lr_getter,
+        param_grid=ConstrainedParameterGrid({'C': [1.0]}),
+    )
+    res_doc, = eval_pmodel_by_params(
+        run_id='r1', pipeline=pdp.ColDrop([]), pmodel=pmodel, raw_df=df,
+        pipe_params={'lbl_col': 'lbl'}, n_folds=3, scoring=['f1'],
+        executor=executor, max_workers=1)
+    assert np.isclose(res_doc['f1_mean'], expected)
+
+
+def _ridge_getter(alpha, **kwargs):
+    return Ridge(alpha=alpha)
+
+
+def test_regressors_on_integer_targets():
+    X, _ = make_classification(n_samples=90, random_state=0)
+    df = pd.DataFrame(X[:, :4], columns=list('abcd'))
+    # a count-like target, sorted, so stratified folds would differ from
+    # the consecutive folds scikit-learn uses for regressors
+    df['lbl'] = np.repeat([0, 1, 2], 30)
+    expected = cross_validate(
+        Ridge(alpha=1.0), df[list('abcd')], df['lbl'], cv=3,
+        scoring='r2')['test_score'].mean()
+    pmodel = ConstrainedParameterizedModel(
+        model_getter=_ridge_getter,
+        param_grid=ConstrainedParameterGrid({'alpha': [1.0]}),
+    )
+    res_doc, = eval_pmodel_by_params(
+        run_id='r1', pipeline=pdp.ColDrop([]), pmodel=pmodel, raw_df=df,
+        pipe_params={'lbl_col': 'lbl'}, n_folds=3, scoring=['r2'])
+    assert np.isclose(res_doc['r2_mean'], expected)
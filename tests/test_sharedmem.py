@@ -0,0 +1,26 @@
+"""Test sharing arrays through memory-mapped files."""
+
+import os
+
+import numpy as np
+import pytest
+
+from folk.sharedmem import (
+    MemmapArrays,
+    attach,
+)
+
+
+def test_memmap_arrays(tmpdir):
+    arr = np.arange(12, dtype=np.float64).reshape(3, 4)
+    with MemmapArrays(dir_path=str(tmpdir)) as memmaps:
+        path = memmaps.share(arr)
+        other_path = memmaps.share(np.array([1, 0, 1], dtype=np.int32))
+        assert path != other_path
+        view = attach(path)
+        assert isinstance(view, np.memmap)
+        assert (view == arr).all()
+        with pytest.raises(ValueError):
+            view[0, 0] = 7
+        del view
+    assert not os.path.exists(memmaps.dir_path)
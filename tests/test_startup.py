@@ -0,0 +1,48 @@
+"""Guard the import time of folk against regressions."""
+
+import sys
+import json
+import subprocess
+
+
+_HEAVY_MODULES = [
+    'sklearn', 'pandas', 'pdutil', 'pymongo', 'birch', 'folk.metricsdb',
+    'folk.evaluate',
+]
+
+_SCRIPT = """
+import sys
+import json
+import time
+start = time.perf_counter()
+import folk
+folk.ParameterizedModel
+folk.ParameterizedPipeline
+duration = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'duration': duration, 'heavy': heavy}}))
+"""
+
+# importing folk should take milliseconds; this is a generous upper bound
+MAX_IMPORT_SECONDS = 1.0
+
+
+def _import_stats():
+    output = subprocess.check_output(
+        [sys.executable, '-c', _SCRIPT.format(heavy=_HEAVY_MODULES)])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def test_import_is_lazy():
+    stats = _import_stats()
+    assert stats['heavy'] == []
+    assert stats['duration'] < MAX_IMPORT_SECONDS
+
+
+def test_lazy_attributes():
+    import folk
+    from folk import MetricKey
+    assert MetricKey.RUN_ID == 'run_id'
+    assert callable(folk.eval_param_pipeline_n_model)
+    assert isinstance(folk.__version__, str)
+    assert 'eval_param_pipeline_n_model' in dir(folk)
@@ -0,0 +1,113 @@
+"""Test distributing sweeps through work queues."""
+
+import os
+import multiprocessing
+
+from sklearn.tree import DecisionTreeClassifier
+from skutil.model_selection import ConstrainedParameterGrid
+
+from folk import (
+    ConstrainedParameterizedModel,
+    ParameterizedPipeline,
+)
+from folk.workqueue import (
+    SQLiteWorkQueue,
+    TaskStatus,
+    enqueue_sweep,
+    run_worker,
+)
+
+from .shared import _test_df
+
+
+class _DropIdPipeline(object):
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def fit_transform(self, df, verbose=False):
+        df = df.drop(columns=['id'])
+        df['hizzard_ratio'] = df['hizzard_ratio'] * self.scale
+        return df
+
+
+def _pipeline_getter(scale, **kwargs):
+    return _DropIdPipeline(scale)
+
+
+def _model_getter(max_depth, **kwargs):
+    return DecisionTreeClassifier(max_depth=max_depth, random_state=0)
+
+
+PPIPELINE = ParameterizedPipeline(
+    pipeline_getter=_pipeline_getter,
+    param_grid=ConstrainedParameterGrid({
+        'scale': [1, 2, 3],
+        'lbl_col': ['rank'],
+    }),
+)
+
+PMODEL = ConstrainedParameterizedModel(
+    model_getter=_model_getter,
+    param_grid=ConstrainedParameterGrid({
+        'max_depth': [1, 2, 3, 4],
+        'lbl_col': ['rank'],
+    }),
+)
+
+
+def _queue(tmpdir, **kwargs):
+    return SQLiteWorkQueue(os.path.join(str(tmpdir), 'queue.db'), **kwargs)
+
+
+def test_lease_ack_fail(tmpdir):
+    queue = _queue(tmpdir, max_attempts=2)
+    queue.put_tasks([('r1', 0, i, 'd{}'.format(i)) for i in range(3)])
+    first = queue.lease('w1', n=2)
+    assert [task.model_index for task in first] == [0, 1]
+    second = queue.lease('w2', n=2)
+    assert [task.model_index for task in second] == [2]
+    assert queue.lease('w3') == []
+    assert queue.ack(first[0], 'w1')
+    assert not queue.ack(first[1], 'w2')
+    assert queue.fail(first[1], 'w1', 'boom')
+    retried = queue.lease('w3')
+    assert retried[0].model_index == 1 and retried[0].attempts == 2
+    assert queue.fail(retried[0], 'w3', 'boom')
+    assert queue.status_counts('r1') == {
+        TaskStatus.DONE: 1, TaskStatus.FAILED: 1, TaskStatus.LEASED: 1}
+
+
+def test_expired_leases_requeued(tmpdir):
+    queue = _queue(tmpdir, lease_seconds=-1)
+    queue.put_tasks([('r1', 0, 0, 'd')])
+    stale = queue.lease('w1')
+    fresh = queue.lease('w2')
+    assert [task.task_id for task in fresh] == [stale[0].task_id]
+    assert not queue.ack(stale[0], 'w1')
+    assert queue.ack(fresh[0], 'w2')
+
+
+def _worker(queue_path, run_id):
+    queue = SQLiteWorkQueue(queue_path)
+    return run_worker(
+        queue=queue,
+        param_pipeline=PPIPELINE,
+        param_model=PMODEL,
+        dataset=_test_df(),
+        run_id=run_id,
+        n_folds=2,
+        batch_size=2,
+        poll_interval=0.1,
+    )
+
+
+def test_local_multiprocess_sweep(tmpdir):
+    queue = _queue(tmpdir)
+    run_id = enqueue_sweep(queue, PPIPELINE, PMODEL)
+    n_tasks = len(PPIPELINE) * len(PMODEL)
+    assert queue.status_counts(run_id) == {TaskStatus.PENDING: n_tasks}
+    with multiprocessing.Pool(3) as pool:
+        n_done = pool.starmap(_worker, [(queue.path, run_id)] * 3)
+    assert sum(n_done) == n_tasks
+    assert queue.status_counts(run_id) == {TaskStatus.DONE: n_tasks}